@@ -0,0 +1,33 @@
+-- Migration script for live catalogue statistics
+-- Aggregates published, non-expired listings in a single round-trip:
+-- total count, count per category and number of distinct countries.
+-- Called from the app with: supabase.rpc("listing_catalogue_stats")
+
+CREATE OR REPLACE FUNCTION listing_catalogue_stats()
+RETURNS JSON AS $$
+    WITH live AS (
+        SELECT category, location
+        FROM listings
+        WHERE status = 'published'
+          AND expires_at >= NOW()
+    )
+    SELECT json_build_object(
+        'total', (SELECT COUNT(*) FROM live),
+        'categories', COALESCE(
+            (SELECT json_object_agg(category, n)
+             FROM (SELECT category, COUNT(*) AS n FROM live GROUP BY category) AS per_category),
+            '{}'::json
+        ),
+        -- Locations are stored as "Région, CC": the country is the part after the last comma
+        'countries', (
+            SELECT COUNT(DISTINCT NULLIF(UPPER(TRIM(regexp_replace(location, '^.*,', ''))), ''))
+            FROM live
+            WHERE position(',' IN location) > 0
+        )
+    );
+$$ LANGUAGE sql STABLE;
+
+-- Index supporting the per-category aggregate
+CREATE INDEX IF NOT EXISTS idx_listings_published_category
+    ON listings (category)
+    WHERE status = 'published';
@@ -0,0 +1,11 @@
+-- Migration script for image derivatives
+-- Each photo is stored with resized WebP/JPEG copies (used in srcset on listing
+-- cards and the detail page) and a tiny blurred placeholder shown while it loads.
+-- variants: [{"width": 640, "type": "image/webp", "url": "https://..."}, ...]
+-- placeholder: "data:image/jpeg;base64,..." (a few hundred bytes)
+
+ALTER TABLE media ADD COLUMN IF NOT EXISTS variants JSONB NOT NULL DEFAULT '[]'::jsonb;
+ALTER TABLE media ADD COLUMN IF NOT EXISTS placeholder TEXT;
+
+-- Photos uploaded before this migration keep an empty variants list:
+-- pages fall back to the original photo until the listing's photo is re-uploaded.
@@ -0,0 +1,8 @@
+-- Migration script for keyset (cursor) pagination on /annonces
+-- Pages are read in (published_at DESC, id DESC) order, filtered on published listings.
+-- This composite partial index lets every page be served by a single index range scan,
+-- whatever the depth of the page.
+
+CREATE INDEX IF NOT EXISTS idx_listings_published_keyset
+    ON listings (published_at DESC, id DESC)
+    WHERE status = 'published';
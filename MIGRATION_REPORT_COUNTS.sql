@@ -0,0 +1,11 @@
+-- Migration script for the admin reports dashboard counters
+-- Returns the number of reports per status in a single GROUP BY query,
+-- served by idx_reports_status (see MIGRATION_REPORTS.sql).
+-- Called from the app with: supabase.rpc("report_status_counts")
+
+CREATE OR REPLACE FUNCTION report_status_counts()
+RETURNS TABLE (status TEXT, count BIGINT) AS $$
+    SELECT status, COUNT(*) AS count
+    FROM reports
+    GROUP BY status;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,16 @@
+-- Migration script for deduplicated Stripe webhook processing
+-- Every verified webhook event is recorded by its Stripe event ID before being
+-- acknowledged; the insert is ignored for retries and duplicate deliveries.
+-- Events with processed_at still NULL are re-queued when the app starts.
+
+CREATE TABLE IF NOT EXISTS stripe_events (
+    id VARCHAR(255) PRIMARY KEY, -- Stripe event ID (evt_...)
+    type VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL,
+    received_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    processed_at TIMESTAMP WITH TIME ZONE,
+    last_error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_stripe_events_pending
+    ON stripe_events(received_at) WHERE processed_at IS NULL;
@@ -0,0 +1,201 @@
+"""
+Fingerprinted static assets with immutable caching and precompressed variants
+
+At startup every file under app/static is content-hashed and kept in memory;
+its gzip (and, when the brotli package is installed, brotli) encoding is
+computed on the first request for it and kept too, so cold starts only pay for
+hashing. Templates link to assets through static_url(), which returns
+"/static/css/styles.<hash>.css": since the URL changes whenever the file does,
+browsers can cache it forever without revalidating.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unfingerprinted URLs (e.g. linked from old pages or emails) are still served, briefly cached
+DEFAULT_CACHE_CONTROL = "public, max-age=300"
+
+# Hex characters of the SHA-256 content hash kept in fingerprinted file names
+HASH_LENGTH = 12
+
+# Encoded variants must be smaller than this fraction of the original to be kept
+_MIN_COMPRESSION_GAIN = 0.9
+_COMPRESSIBLE_PREFIXES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+@dataclass
+class Asset:
+    """A static file held in memory with its compressed encodings, built on first use"""
+    path: str
+    fingerprinted_path: str
+    media_type: str
+    etag: str
+    content: bytes
+    _encodings: Optional[Dict[str, bytes]] = field(default=None, repr=False)
+
+    @property
+    def compressed(self) -> bool:
+        return self._encodings is not None
+
+    @property
+    def encodings(self) -> Dict[str, bytes]:
+        # Two concurrent first requests may both compress; the result is identical
+        if self._encodings is None:
+            self._encodings = _compress(self.content, self.media_type)
+        return self._encodings
+
+
+def fingerprint(path: str, digest: str) -> str:
+    """Insert a content hash into a file name ("css/styles.css" -> "css/styles.<hash>.css")"""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.{digest}{extension}"
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> set:
+    """Parse an Accept-Encoding header into the set of encodings with a non-zero quality"""
+    encodings = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def _compress(content: bytes, media_type: str) -> Dict[str, bytes]:
+    if not media_type.startswith(_COMPRESSIBLE_PREFIXES):
+        return {}
+    variants = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(content, quality=11)
+    return {
+        encoding: data
+        for encoding, data in variants.items()
+        if len(data) < len(content) * _MIN_COMPRESSION_GAIN
+    }
+
+
+class AssetManifest:
+    """Content-hashed index of the files under a static directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._by_path: Dict[str, Asset] = {}
+        self._by_fingerprint: Dict[str, Asset] = {}
+
+    def build(self) -> "AssetManifest":
+        """Hash every file of the directory (encodings are compressed on first request)"""
+        by_path: Dict[str, Asset] = {}
+        for root, _dirs, files in os.walk(self.directory):
+            for filename in files:
+                full_path = os.path.join(root, filename)
+                path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    content = f.read()
+                digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+                media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                by_path[path] = Asset(
+                    path=path,
+                    fingerprinted_path=fingerprint(path, digest),
+                    media_type=media_type,
+                    etag=f'"{digest}"',
+                    content=content,
+                )
+
+        self._by_path = by_path
+        self._by_fingerprint = {asset.fingerprinted_path: asset for asset in by_path.values()}
+        logger.info(f"Fingerprinted {len(by_path)} static assets")
+        return self
+
+    def get(self, path: str) -> Optional[Asset]:
+        """Look up an asset by its plain path"""
+        return self._by_path.get(path)
+
+    def get_fingerprinted(self, fingerprinted_path: str) -> Optional[Asset]:
+        """Look up an asset by its fingerprinted path"""
+        return self._by_fingerprint.get(fingerprinted_path)
+
+    def __len__(self) -> int:
+        return len(self._by_path)
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    StaticFiles serving fingerprinted URLs from memory
+
+    Fingerprinted paths get Cache-Control: immutable and the best compressed
+    encoding the client accepts; any other path falls back to StaticFiles.
+    """
+
+    def __init__(self, *, directory: str, manifest: AssetManifest, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        asset = self.manifest.get_fingerprinted(path.replace(os.sep, "/"))
+        if asset is None:
+            response = await super().get_response(path, scope)
+            response.headers.setdefault("Cache-Control", DEFAULT_CACHE_CONTROL)
+            return response
+
+        headers = {
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+            "ETag": asset.etag,
+            "Vary": "Accept-Encoding",
+        }
+        request_headers = dict(scope["headers"])
+        if request_headers.get(b"if-none-match", b"").decode("latin-1") == asset.etag:
+            return Response(status_code=304, headers=headers)
+
+        body = asset.content
+        if not asset.compressed:
+            # brotli at quality 11 is slow: keep it off the event loop
+            await run_in_threadpool(lambda: asset.encodings)
+        accepted = accepted_encodings(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        for encoding in ("br", "gzip"):
+            if encoding in asset.encodings and encoding in accepted:
+                body = asset.encodings[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+
+        if scope["method"] == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            return Response(status_code=200, headers=headers, media_type=asset.media_type)
+        return Response(body, headers=headers, media_type=asset.media_type)
+
+
+STATIC_DIRECTORY = "app/static"
+
+manifest = AssetManifest(STATIC_DIRECTORY)
+
+
+def static_url(path: str) -> str:
+    """Template helper: fingerprinted URL of a static file ("css/styles.css")"""
+    asset = manifest.get(path.lstrip("/"))
+    if asset is None:
+        return f"/static/{path.lstrip('/')}"
+    return f"/static/{asset.fingerprinted_path}"
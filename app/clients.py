@@ -0,0 +1,304 @@
+"""
+Shared outbound clients for Supabase, Stripe and SMTP
+
+Every outbound connection of the app is built here with explicit connect/read
+timeouts and keep-alive pools, and can be warmed up at startup so the first
+request after a Render spin-up doesn't pay the TLS handshakes.
+
+The Supabase and Stripe SDKs (and their httpx/requests stacks) account for most
+of the app's import time, so they are only imported when a client is first
+built: a process that has not talked to them yet, such as one waking up on
+Render, starts without paying for them.
+"""
+import asyncio
+import logging
+import smtplib
+import ssl
+import threading
+import time
+from email.message import Message
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from . import config
+from . import metrics
+
+if TYPE_CHECKING:
+    import httpx
+    import requests
+    from supabase import Client
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+# ==================== HTTP (Supabase) ====================
+
+def _start_timer(request: "httpx.Request") -> None:
+    request.extensions["metrics_start"] = time.perf_counter()
+
+
+def _record_round_trip(response: "httpx.Response") -> None:
+    # Read the body here so the measurement covers the whole round-trip
+    response.read()
+    service = "storage" if "/storage/v1/" in response.request.url.path else "db"
+    metrics.record(service, time.perf_counter() - response.request.extensions["metrics_start"])
+
+
+def create_http_client() -> "httpx.Client":
+    """Create a pooled httpx client with explicit timeouts (shared by PostgREST and Storage)"""
+    import httpx
+
+    return httpx.Client(
+        event_hooks={"request": [_start_timer], "response": [_record_round_trip]},
+        timeout=httpx.Timeout(config.HTTP_READ_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=config.HTTP_POOL_SIZE,
+            max_keepalive_connections=config.HTTP_POOL_SIZE,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        follow_redirects=True,
+        http2=True,
+    )
+
+
+def create_supabase_client(url: str, key: str) -> "Client":
+    """Create the Supabase client on top of a single pooled httpx client"""
+    from supabase import create_client
+    from supabase.lib.client_options import SyncClientOptions
+
+    options = SyncClientOptions(httpx_client=create_http_client())
+    return create_client(url, key, options=options)
+
+
+class LazySupabaseClient:
+    """
+    Supabase client built on first use
+
+    Attribute access (table(), rpc(), storage...) is forwarded to the real
+    client, which is imported and created by the first caller. The object is
+    truthy as soon as credentials are configured, so mock-mode checks never
+    build it.
+    """
+
+    def __init__(self, url: str, key: str):
+        self.url = url
+        self.key = key
+        self._client: Optional["Client"] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> "Client":
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    started = time.perf_counter()
+                    self._client = create_supabase_client(self.url, self.key)
+                    logger.info(f"Supabase client created in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return self._client
+
+    @property
+    def created(self) -> bool:
+        return self._client is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def close(self) -> None:
+        """Close the pooled connections, if the client was ever created"""
+        if self._client is not None:
+            self._client.options.httpx_client.close()
+
+
+# ==================== Stripe ====================
+
+_stripe_session: Optional["requests.Session"] = None
+_stripe_lock = threading.Lock()
+_stripe_configured = False
+
+
+def configure_stripe() -> None:
+    """Make the Stripe SDK reuse one keep-alive session with explicit timeouts"""
+    global _stripe_session
+    import requests
+    import stripe
+
+    stripe.api_key = config.STRIPE_SECRET_KEY
+    _stripe_session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=config.HTTP_POOL_SIZE)
+    _stripe_session.mount("https://", adapter)
+    _stripe_session.hooks["response"].append(
+        lambda response, *args, **kwargs: metrics.record("stripe", response.elapsed.total_seconds())
+    )
+    stripe.default_http_client = stripe.RequestsClient(
+        session=_stripe_session,
+        timeout=(config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT),
+    )
+
+
+def get_stripe():
+    """The stripe module, imported and configured on first use"""
+    global _stripe_configured
+    import stripe
+
+    if not _stripe_configured:
+        with _stripe_lock:
+            if not _stripe_configured:
+                if config.STRIPE_SECRET_KEY:
+                    configure_stripe()
+                _stripe_configured = True
+    return stripe
+
+
+def create_checkout_session(**params: Any) -> Any:
+    """Create a Stripe Checkout session (blocking: run it off the event loop)"""
+    return get_stripe().checkout.Session.create(**params)
+
+
+# ==================== SMTP ====================
+
+class SMTPSession:
+    """
+    A reusable, authenticated SMTP connection
+
+    The connection (connect + STARTTLS + login) is opened on first use and kept
+    for the following messages. If the server dropped it while idle, it is
+    reopened once transparently.
+    """
+
+    def __init__(self, host: str, port: int, user: str, password: str, timeout: float):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self._server: Optional[smtplib.SMTP] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        logger.info(f"🔌 Connecting to SMTP server {self.host}:{self.port}")
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            logger.debug("Starting TLS encryption")
+            server.starttls(context=ssl.create_default_context())
+            logger.debug(f"Authenticating as {self.user}")
+            server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def send_message(self, msg: Message) -> None:
+        """Send a message on the shared connection, reconnecting once if it went stale"""
+        with self._lock, metrics.timed("smtp"):
+            try:
+                self._connection().send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                logger.info("SMTP connection was closed by the server, reconnecting")
+                self._server = None
+                self._connection().send_message(msg)
+            except Exception:
+                self._close_locked()
+                raise
+
+    def warm_up(self) -> None:
+        """Open and authenticate the connection ahead of the first message"""
+        with self._lock:
+            try:
+                self._connection()
+            except Exception:
+                self._close_locked()
+                raise
+
+    def close(self) -> None:
+        """Close the connection (it will be reopened on next use)"""
+        with self._lock:
+            self._close_locked()
+
+    def _close_locked(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+
+_smtp_sessions: Dict[Tuple[str, int, str], SMTPSession] = {}
+_smtp_sessions_lock = threading.Lock()
+
+
+def get_smtp_session(host: str, port: int, user: str, password: str) -> SMTPSession:
+    """Get the shared SMTP session for a server/account, creating it on first use"""
+    key = (host, port, user)
+    with _smtp_sessions_lock:
+        session = _smtp_sessions.get(key)
+        if session is None or session.password != password:
+            session = SMTPSession(host, port, user, password, timeout=config.SMTP_TIMEOUT)
+            _smtp_sessions[key] = session
+        return session
+
+
+def close_smtp_sessions() -> None:
+    """Close and forget every shared SMTP session"""
+    with _smtp_sessions_lock:
+        sessions = list(_smtp_sessions.values())
+        _smtp_sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+# ==================== Warm-up ====================
+
+def _warm_up_supabase(supabase: Any) -> None:
+    # One tiny query opens the pooled TLS connection used by both PostgREST and Storage
+    supabase.table("listings").select("id").limit(1).execute()
+
+
+def _warm_up_stripe() -> None:
+    stripe = get_stripe()
+    if _stripe_session is None:
+        return
+    _stripe_session.head(stripe.api_base, timeout=(config.HTTP_CONNECT_TIMEOUT, config.HTTP_READ_TIMEOUT))
+
+
+def _warm_up_smtp() -> None:
+    get_smtp_session(config.SMTP_HOST, config.SMTP_PORT, config.SMTP_USER, config.SMTP_PASSWORD).warm_up()
+
+
+async def warm_up(supabase: Any) -> None:
+    """
+    Create the Supabase and Stripe clients and open their connections (and SMTP's) concurrently
+
+    Failures are logged and never prevent startup; the connection will simply be
+    opened by the first request instead.
+    """
+    tasks = {}
+    if supabase is not None:
+        tasks["supabase"] = asyncio.to_thread(_warm_up_supabase, supabase)
+    if config.STRIPE_SECRET_KEY:
+        tasks["stripe"] = asyncio.to_thread(_warm_up_stripe)
+    if config.SMTP_HOST:
+        tasks["smtp"] = asyncio.to_thread(_warm_up_smtp)
+    if not tasks:
+        return
+
+    results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    for name, result in zip(tasks, results):
+        if isinstance(result, Exception):
+            logger.warning(f"⚠️  Warm-up of {name} connection failed: {result}")
+        else:
+            logger.info(f"✅ {name} connection warmed up")
+
+
+def close(supabase: Any) -> None:
+    """Release pooled connections at shutdown"""
+    close_smtp_sessions()
+    if _stripe_session is not None:
+        _stripe_session.close()
+    if supabase is not None:
+        supabase.close()
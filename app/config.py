@@ -2,15 +2,26 @@
 Application configuration
 """
 import os
+import tempfile
 import logging
-from dotenv import load_dotenv
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables from .env file
-load_dotenv()
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Load environment variables from the project's .env file, if any (none in production)
+_ENV_FILE = os.path.join(_PROJECT_DIR, ".env")
+if os.path.exists(_ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(_ENV_FILE)
+
+# Database backend: "supabase", or "sqlite" to run fully offline on a local file
+# (schema created on startup, photos stored in SQLITE_STORAGE_DIR)
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(_PROJECT_DIR, "var", "pieces.db"))
+SQLITE_STORAGE_DIR = os.getenv("SQLITE_STORAGE_DIR", os.path.join(_PROJECT_DIR, "var", "storage"))
 
 # Supabase Configuration
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
@@ -22,11 +33,49 @@ STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY", "")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
 STRIPE_LISTING_PRICE_ID = os.getenv("STRIPE_LISTING_PRICE_ID", "")
+# Webhook events: attempts and first retry delay (doubled at each attempt), dedupe window in seconds
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+WEBHOOK_RETRY_BASE_SECONDS = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "2"))
+STRIPE_EVENT_DEDUPE_TTL = int(os.getenv("STRIPE_EVENT_DEDUPE_TTL", "86400"))
+
+# Secret used to sign client-side state (wizard draft cookies)
+SECRET_KEY = os.getenv("SECRET_KEY", "")
+
+# Outbound HTTP clients (Supabase, Stripe): timeouts in seconds and keep-alive pool size
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
 
 # Application Configuration
 APP_URL = os.getenv("APP_URL", "http://localhost:8000")
 LISTING_PRICE_AMOUNT = int(os.getenv("LISTING_PRICE_AMOUNT", "2900"))  # 29.00 EUR in cents
 
+# Number of listings per page on /annonces
+LISTINGS_PAGE_SIZE = int(os.getenv("LISTINGS_PAGE_SIZE", "24"))
+
+# Full-text search: max results per query and full index refresh interval (seconds)
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "100"))
+SEARCH_INDEX_REFRESH_SECONDS = int(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "300"))
+
+# Size of the thread pool running blocking database calls for async routes
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "16"))
+
+# Cache for public listing reads (seconds / max entries)
+LISTINGS_CACHE_TTL = int(os.getenv("LISTINGS_CACHE_TTL", "60"))
+LISTINGS_CACHE_MAXSIZE = int(os.getenv("LISTINGS_CACHE_MAXSIZE", "256"))
+# Users resolved by email (seconds / max entries)
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "3600"))
+USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", "1024"))
+# Rendered listing-card HTML (keyed on listing version, so the TTL only bounds memory)
+CARD_CACHE_TTL = int(os.getenv("CARD_CACHE_TTL", "3600"))
+CARD_CACHE_MAXSIZE = int(os.getenv("CARD_CACHE_MAXSIZE", "2000"))
+
+# Response compression (bodies smaller than COMPRESSION_MIN_SIZE bytes are sent as-is)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
 # Categories for listings
 CATEGORIES = [
     "Agitation",
@@ -60,10 +109,25 @@ LISTING_TYPES = [
     {"value": "part", "label": "Pièce détachée"},
 ]
 
+# Listing wizard drafts (signed cookie): lifetime in seconds and maximum total size in bytes
+DRAFT_MAX_AGE = int(os.getenv("DRAFT_MAX_AGE", "86400"))
+DRAFT_MAX_BYTES = int(os.getenv("DRAFT_MAX_BYTES", "15000"))
+
 # Photo upload configuration
 MAX_PHOTOS_PER_LISTING = 1
 ALLOWED_PHOTO_TYPES = ["image/jpeg", "image/jpg", "image/png", "image/webp", "image/gif"]
 ALLOWED_PHOTO_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp", ".gif"]
+MAX_PHOTO_SIZE_BYTES = int(os.getenv("MAX_PHOTO_SIZE_BYTES", str(10 * 1024 * 1024)))  # 10 MB
+# Photos larger than this are streamed to storage from disk instead of memory
+UPLOAD_SPOOL_THRESHOLD = int(os.getenv("UPLOAD_SPOOL_THRESHOLD", str(1024 * 1024)))  # 1 MB
+# Whole step-3 request body limit: the photos plus room for the multipart envelope
+MAX_UPLOAD_REQUEST_BYTES = MAX_PHOTO_SIZE_BYTES * MAX_PHOTOS_PER_LISTING + 64 * 1024
+# Resized WebP/JPEG derivatives generated for each photo (pixel widths), and a tiny blurred placeholder
+IMAGE_DERIVATIVE_WIDTHS = [int(w) for w in os.getenv("IMAGE_DERIVATIVE_WIDTHS", "320,640,1200").split(",")]
+IMAGE_DERIVATIVE_QUALITY = int(os.getenv("IMAGE_DERIVATIVE_QUALITY", "80"))
+IMAGE_PLACEHOLDER_WIDTH = 16
+# Concurrent uploads to Supabase Storage
+STORAGE_UPLOAD_WORKERS = int(os.getenv("STORAGE_UPLOAD_WORKERS", "8"))
 
 # Email configuration (optional)
 SMTP_HOST = os.getenv("SMTP_HOST", "")
@@ -71,3 +135,29 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USER = os.getenv("SMTP_USER", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 CONTACT_EMAIL = os.getenv("CONTACT_EMAIL", "contact@pieces-methanisation.fr")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "15"))
+# In-app scheduler: listing expiry interval (seconds); the lock file elects one worker process
+# to run jobs and re-queue unprocessed Stripe events at startup
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+EXPIRE_LISTINGS_INTERVAL = int(os.getenv("EXPIRE_LISTINGS_INTERVAL", "3600"))
+SCHEDULER_LOCK_FILE = os.getenv("SCHEDULER_LOCK_FILE", os.path.join(tempfile.gettempdir(), "pieces-methanisation-scheduler.lock"))
+
+# Contact emails are spooled here and sent in the background (kept across restarts until sent)
+OUTBOX_DIR = os.getenv("OUTBOX_DIR", os.path.join(_PROJECT_DIR, "var", "outbox"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "5"))
+
+# Metrics: Server-Timing header on every response; /metrics requires "Authorization: Bearer METRICS_TOKEN" when set
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Templates: compiled bytecode cached on disk and indentation stripped at compile time;
+# turn auto-reload off in production (templates are then only read once per process)
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", os.path.join(_PROJECT_DIR, "var", "jinja"))
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "true").lower() == "true"
+TEMPLATE_MINIFY = os.getenv("TEMPLATE_MINIFY", "true").lower() == "true"
+TEMPLATE_WARM_UP = os.getenv("TEMPLATE_WARM_UP", "true").lower() == "true"
+
+# Startup warm-up (client creation, TLS handshakes, template compilation) runs in the
+# background so the first request is served right away; false to finish it before serving
+WARM_UP_IN_BACKGROUND = os.getenv("WARM_UP_IN_BACKGROUND", "true").lower() == "true"
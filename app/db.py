@@ -1,11 +1,24 @@
 """
-Database access layer for Supabase
+Database access layer for Supabase (or the local SQLite backend with DB_BACKEND=sqlite)
 """
 import os
+import asyncio
+import base64
+import contextvars
+import functools
 import logging
-from typing import Optional, List, Dict, Any
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Tuple, Callable, TypeVar, Union
 from datetime import datetime
-from supabase import create_client, Client
+
+from . import config
+from . import clients
+from . import search
+from .cache import TTLCache
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -14,35 +27,110 @@ logger = logging.getLogger(__name__)
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
 
-if not supabase_url or not supabase_key:
+if config.DB_BACKEND == "sqlite":
+    from .sqlite_backend import SQLiteClient
+    # Same query-builder interface as the Supabase client, on a local file
+    supabase = SQLiteClient(config.SQLITE_PATH, config.SQLITE_STORAGE_DIR)
+elif not supabase_url or not supabase_key:
     print("Warning: Supabase credentials not configured. Using mock mode.")
-    supabase: Optional[Client] = None
+    supabase: Optional["Client"] = None
 else:
-    supabase: Client = create_client(supabase_url, supabase_key)
+    # Built (and the supabase SDK imported) on first query or at warm-up, not at import
+    supabase: Union["Client", clients.LazySupabaseClient] = clients.LazySupabaseClient(supabase_url, supabase_key)
+
+# Dedicated thread pool bridging the synchronous supabase-py client into async routes
+_executor = ThreadPoolExecutor(max_workers=config.DB_MAX_WORKERS, thread_name_prefix="db")
+
+T = TypeVar("T")
+
+
+async def to_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking database call on the database thread pool
+    
+    Async route handlers must use this instead of calling the functions of this
+    module directly, so a Supabase round-trip never freezes the event loop.
+    Like asyncio.to_thread, the caller's context variables are propagated.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+
+# Cache for public listing reads, invalidated by every listing/media write
+_listings_cache = TTLCache(
+    maxsize=config.LISTINGS_CACHE_MAXSIZE,
+    ttl=config.LISTINGS_CACHE_TTL,
+    name="listings",
+)
+
+
+# Users resolved by email (the users table is keyed on a unique email)
+_users_cache = TTLCache(
+    maxsize=config.USER_CACHE_MAXSIZE,
+    ttl=config.USER_CACHE_TTL,
+    name="users",
+)
+
+
+def _listings_changed(
+    upserted: Optional[List[Dict[str, Any]]] = None,
+    removed_ids: Optional[List[str]] = None,
+) -> None:
+    """
+    Propagate a write to listings or media to the in-process read models
+    
+    Cached public reads are invalidated and the search index is updated
+    incrementally with the rows returned by the write.
+    """
+    _listings_cache.invalidate()
+    for listing in upserted or []:
+        search.listing_index.add(listing)
+    for listing_id in removed_ids or []:
+        search.listing_index.remove(listing_id)
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Get hit/miss counters of the public listings cache"""
+    return _listings_cache.stats()
+
+
+def get_user_cache_stats() -> Dict[str, Any]:
+    """Get hit/miss counters of the email -> user cache"""
+    return _users_cache.stats()
 
 
 # ==================== Users ====================
 
 def get_or_create_user(email: str, phone: Optional[str] = None, name: Optional[str] = None) -> Optional[Dict[str, Any]]:
-    """Get existing user or create new one"""
+    """
+    Get existing user or create new one
+    
+    Resolved in a single upsert on the unique email, so concurrent calls can
+    never create duplicates; a given phone or name updates the existing user.
+    Users are cached by email: repeated calls with nothing new to store don't
+    reach the database.
+    """
     if not supabase:
         return {"id": "mock-user-id", "email": email}
     
-    # Try to get existing user
-    result = supabase.table("users").select("*").eq("email", email).execute()
-    
-    if result.data and len(result.data) > 0:
-        return result.data[0]
-    
-    # Create new user
     user_data = {"email": email}
     if phone:
         user_data["phone"] = phone
     if name:
         user_data["name"] = name
     
-    result = supabase.table("users").insert(user_data).execute()
-    return result.data[0] if result.data else None
+    cached = _users_cache.get(email)
+    if cached is not None and all(cached.get(key) == value for key, value in user_data.items()):
+        return dict(cached)
+    
+    # ON CONFLICT (email) DO UPDATE: returns the existing or the new row in one request
+    result = supabase.table("users").upsert(user_data, on_conflict="email").execute()
+    user = result.data[0] if result.data else None
+    if user is not None:
+        _users_cache.set(email, user)
+        return dict(user)
+    return None
 
 
 # ==================== Listings ====================
@@ -62,6 +150,27 @@ def create_listing(user_id: str, listing_data: Dict[str, Any]) -> Optional[Dict[
     return result.data[0] if result.data else None
 
 
+def save_listing(user_id: str, listing_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Insert a listing with a client-generated ID, or update it if that ID exists
+
+    Idempotent, so a form submitted again (e.g. after a failed payment step)
+    never hits a duplicate key. The status is left to the column default on
+    insert and untouched on update.
+    """
+    if not supabase:
+        return {"id": listing_data["id"], **listing_data}
+
+    data = {
+        "user_id": user_id,
+        **listing_data,
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+    result = supabase.table("listings").upsert(data, on_conflict="id").execute()
+    _listings_changed(upserted=result.data)
+    return result.data[0] if result.data else None
+
+
 def update_listing(listing_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Update an existing listing"""
     if not supabase:
@@ -69,34 +178,229 @@ def update_listing(listing_id: str, updates: Dict[str, Any]) -> Optional[Dict[st
     
     updates["updated_at"] = datetime.utcnow().isoformat()
     result = supabase.table("listings").update(updates).eq("id", listing_id).execute()
+    _listings_changed(upserted=result.data)
     return result.data[0] if result.data else None
 
 
+# Columns shown by listing cards, plus the keyset cursor (published_at) and card cache key (updated_at)
+CARD_COLUMNS = (
+    "id, title, summary, category, condition, location, price_amount, price_display, "
+    "published_at, updated_at"
+)
+
+# Columns of the detail page: everything but the owner and bookkeeping columns
+DETAIL_COLUMNS = (
+    "id, status, title, category, listing_type, condition, year, manufacturer, location, "
+    "summary, description, technical_specs, price_amount, price_display, "
+    "contact_email, contact_phone, published_at, expires_at, updated_at"
+)
+
+# First photo of each listing, embedded in the listings query (PostgREST resource embedding)
+CARD_MEDIA = "media(url, variants, placeholder)"
+
+
+def _listings_with_first_photo(columns: str):
+    """
+    Query on listings returning the given columns and, under "media", a list
+    holding the listing's first photo (empty if it has none), in one round-trip
+    """
+    return (
+        supabase.table("listings")
+        .select(f"{columns}, {CARD_MEDIA}")
+        .eq("media.media_type", "photo")
+        .order("display_order", foreign_table="media")
+        .limit(1, foreign_table="media")
+    )
+
+
 def get_listing(listing_id: str) -> Optional[Dict[str, Any]]:
-    """Get a single listing by ID"""
+    """Get a single listing by ID, with its first photo embedded under "media" """
     if not supabase:
         return None
     
-    result = supabase.table("listings").select("*").eq("id", listing_id).execute()
-    return result.data[0] if result.data and len(result.data) > 0 else None
+    def fetch() -> Optional[Dict[str, Any]]:
+        result = _listings_with_first_photo(DETAIL_COLUMNS).eq("id", listing_id).execute()
+        return result.data[0] if result.data and len(result.data) > 0 else None
+    
+    listing = _listings_cache.get_or_set(("listing", listing_id), fetch)
+    return dict(listing) if listing else None
 
 
 def get_published_listings(limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
-    """Get all published listings that have not expired"""
+    """Get the cards (CARD_COLUMNS and first photo) of published listings that have not expired"""
     if not supabase:
         return []
     
-    result = (
-        supabase.table("listings")
-        .select("*")
-        .eq("status", "published")
-        .gte("expires_at", datetime.utcnow().isoformat())  # Include listings expiring at this exact moment
-        .order("published_at", desc=True)
-        .limit(limit)
-        .offset(offset)
-        .execute()
-    )
-    return result.data if result.data else []
+    def fetch() -> List[Dict[str, Any]]:
+        result = (
+            _listings_with_first_photo(CARD_COLUMNS)
+            .eq("status", "published")
+            .gte("expires_at", datetime.utcnow().isoformat())  # Include listings expiring at this exact moment
+            .order("published_at", desc=True)
+            .limit(limit)
+            .offset(offset)
+            .execute()
+        )
+        return result.data if result.data else []
+    
+    # Copies keep callers from mutating cached rows (e.g. when attaching images)
+    listings = _listings_cache.get_or_set(("published", limit, offset), fetch)
+    return [dict(listing) for listing in listings]
+
+
+def encode_cursor(listing: Dict[str, Any]) -> str:
+    """Encode the (published_at, id) keyset position of a listing as an opaque URL-safe cursor"""
+    raw = f"{listing['published_at']}|{listing['id']}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    Decode a cursor into (published_at, id), or None if it is missing or malformed
+    
+    Cursors come from the query string and end up in a PostgREST filter, so both
+    parts must parse as a timestamp and a UUID.
+    """
+    if not cursor:
+        return None
+    
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        published_at, listing_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        datetime.fromisoformat(published_at)
+        uuid.UUID(listing_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    
+    return published_at, listing_id
+
+
+def get_published_listings_page(
+    limit: int = 24,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Get one page of published listings using keyset pagination on (published_at, id)
+    
+    Listings are ordered newest first. `after` returns the page following a cursor,
+    `before` the page preceding it; each page costs a single indexed range scan
+    whatever its depth, unlike offset pagination. Rows are cards: CARD_COLUMNS
+    with the first photo embedded.
+    
+    Returns:
+        {"listings": [...], "next_cursor": str or None, "prev_cursor": str or None}
+    """
+    empty_page = {"listings": [], "next_cursor": None, "prev_cursor": None}
+    if not supabase:
+        return empty_page
+    
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before) if not after_key else None
+    
+    def fetch() -> Dict[str, Any]:
+        backwards = before_key is not None
+        query = (
+            _listings_with_first_photo(CARD_COLUMNS)
+            .eq("status", "published")
+            .gte("expires_at", datetime.utcnow().isoformat())
+        )
+        
+        key = before_key or after_key
+        if key:
+            # Row-value comparison (published_at, id) < / > (cursor) expressed as a PostgREST or-filter
+            op = "gt" if backwards else "lt"
+            published_at, listing_id = key
+            query = query.or_(
+                f'published_at.{op}."{published_at}",'
+                f'and(published_at.eq."{published_at}",id.{op}.{listing_id})'
+            )
+        
+        # Fetch one extra row to know whether another page exists in that direction
+        result = (
+            query
+            .order("published_at", desc=not backwards)
+            .order("id", desc=not backwards)
+            .limit(limit + 1)
+            .execute()
+        )
+        rows = result.data if result.data else []
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        if backwards:
+            rows.reverse()
+            next_cursor = encode_cursor(rows[-1]) if rows else None
+            prev_cursor = encode_cursor(rows[0]) if rows and has_more else None
+        else:
+            next_cursor = encode_cursor(rows[-1]) if rows and has_more else None
+            prev_cursor = encode_cursor(rows[0]) if rows and after_key else None
+        
+        return {"listings": rows, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+    
+    page = _listings_cache.get_or_set(("page", limit, after_key, before_key), fetch)
+    return {**page, "listings": [dict(listing) for listing in page["listings"]]}
+
+
+def get_searchable_listings(batch_size: int = 1000) -> List[Dict[str, Any]]:
+    """Get every published, non-expired listing to (re)build the search index"""
+    if not supabase:
+        return []
+    
+    now = datetime.utcnow().isoformat()
+    listings: List[Dict[str, Any]] = []
+    start = 0
+    while True:
+        result = (
+            supabase.table("listings")
+            .select("*")
+            .eq("status", "published")
+            .gte("expires_at", now)
+            .order("id")
+            .range(start, start + batch_size - 1)
+            .execute()
+        )
+        rows = result.data if result.data else []
+        listings.extend(rows)
+        if len(rows) < batch_size:
+            return listings
+        start += batch_size
+
+
+# Figures shown when the listing_catalogue_stats() function is unavailable
+UNAVAILABLE_STATS: Dict[str, Any] = {"total": None, "categories": {}, "countries": None}
+
+
+def get_catalogue_stats() -> Dict[str, Any]:
+    """
+    Get live catalogue figures for published, non-expired listings
+    
+    Uses the listing_catalogue_stats() SQL function (MIGRATION_CATALOGUE_STATS.sql),
+    which aggregates everything in one round-trip without fetching rows. If the
+    call fails, the figures are reported as unavailable (None) rather than
+    computed from listing rows, and the next request tries again.
+    
+    Returns:
+        {"total": int or None, "categories": {category: count}, "countries": int or None}
+    """
+    if not supabase:
+        return {"total": 0, "categories": {}, "countries": 0}
+    
+    def fetch() -> Optional[Dict[str, Any]]:
+        try:
+            result = supabase.rpc("listing_catalogue_stats").execute()
+        except Exception as e:
+            logger.error(f"listing_catalogue_stats RPC failed (is MIGRATION_CATALOGUE_STATS.sql applied?): {e}")
+            return None
+        data = result.data or {}
+        return {
+            "total": data.get("total") or 0,
+            "categories": data.get("categories") or {},
+            "countries": data.get("countries") or 0,
+        }
+    
+    # None (a failed call) is not cached
+    return _listings_cache.get_or_set(("stats",), fetch) or dict(UNAVAILABLE_STATS)
 
 
 def get_user_listings(user_id: str) -> List[Dict[str, Any]]:
@@ -132,6 +436,7 @@ def publish_listing(listing_id: str) -> Optional[Dict[str, Any]]:
     }
     
     result = supabase.table("listings").update(updates).eq("id", listing_id).execute()
+    _listings_changed(upserted=result.data)
     return result.data[0] if result.data else None
 
 
@@ -140,69 +445,53 @@ def expire_old_listings() -> int:
     Mark listings as expired if they are published and past their expiration date.
     Returns the number of listings that were expired.
     
-    This function should be called regularly via:
-    - A cron job on your server
-    - A scheduled task (e.g., GitHub Actions, Cloud Scheduler)
-    - A Supabase Edge Function with pg_cron
-    
-    Example cron setup (runs daily at 2 AM):
-    0 2 * * * cd /path/to/app && python -c "from app.db import expire_old_listings; expire_old_listings()"
+    A single UPDATE ... RETURNING round-trip: the returned rows give both the
+    count and the IDs to drop from the in-process read models. It is run
+    periodically by the in-app scheduler (see app/scheduler.py and
+    EXPIRE_LISTINGS_INTERVAL), which counts and logs the errors this raises,
+    and can also be run by hand:
     
-    Example Supabase Edge Function with pg_cron:
-    SELECT cron.schedule('expire-listings', '0 2 * * *', $$
-      UPDATE listings 
-      SET status = 'expired', updated_at = NOW()
-      WHERE status = 'published' AND expires_at < NOW()
-    $$);
+    python -c "from app.db import expire_old_listings; expire_old_listings()"
     """
     if not supabase:
         logger.warning("Supabase not configured - cannot expire listings")
         return 0
     
-    try:
-        now = datetime.utcnow().isoformat()
-        
-        # Get count of listings to expire before updating
-        count_result = (
-            supabase.table("listings")
-            .select("id", count="exact")
-            .eq("status", "published")
-            .lt("expires_at", now)
-            .execute()
-        )
-        
-        expired_count = count_result.count if count_result.count is not None else 0
-        
-        if expired_count == 0:
-            logger.info("No listings to expire")
-            return 0
-        
-        # Bulk update all expired listings in a single query
-        # Note: Supabase Python client doesn't support bulk update without filtering,
-        # so we update with the same filter conditions
-        update_result = (
-            supabase.table("listings")
-            .update({
-                "status": "expired",
-                "updated_at": now
-            })
-            .eq("status", "published")
-            .lt("expires_at", now)
-            .execute()
-        )
-        
-        logger.info(f"Expired {expired_count} listings")
-        return expired_count
-        
-    except Exception as e:
-        logger.error(f"Error expiring listings: {e}")
+    now = datetime.utcnow().isoformat()
+    
+    result = (
+        supabase.table("listings")
+        .update({
+            "status": "expired",
+            "updated_at": now
+        })
+        .eq("status", "published")
+        .lt("expires_at", now)
+        .execute()
+    )
+    
+    expired_ids = [row["id"] for row in result.data or []]
+    if not expired_ids:
+        logger.info("No listings to expire")
         return 0
+    
+    _listings_changed(removed_ids=expired_ids)
+    logger.info(f"Expired {len(expired_ids)} listings")
+    return len(expired_ids)
 
 
 # ==================== Media ====================
 
-def add_media(listing_id: str, media_type: str, url: str, filename: Optional[str] = None, display_order: int = 0) -> Optional[Dict[str, Any]]:
-    """Add media to a listing"""
+def add_media(
+    listing_id: str,
+    media_type: str,
+    url: str,
+    filename: Optional[str] = None,
+    display_order: int = 0,
+    variants: Optional[List[Dict[str, Any]]] = None,
+    placeholder: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Add media to a listing (with its resized derivatives and blur placeholder, for photos)"""
     if not supabase:
         return {"id": "mock-media-id", "listing_id": listing_id, "url": url}
     
@@ -211,13 +500,28 @@ def add_media(listing_id: str, media_type: str, url: str, filename: Optional[str
         "media_type": media_type,
         "url": url,
         "filename": filename,
-        "display_order": display_order
+        "display_order": display_order,
+        "variants": variants or [],
+        "placeholder": placeholder
     }
     
     result = supabase.table("media").insert(data).execute()
+    _listings_changed()
     return result.data[0] if result.data else None
 
 
+def add_media_bulk(media: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert several media rows in a single request"""
+    if not media:
+        return []
+    if not supabase:
+        return [{"id": f"mock-media-id-{i}", **item} for i, item in enumerate(media)]
+    
+    result = supabase.table("media").insert(media).execute()
+    _listings_changed()
+    return result.data or []
+
+
 def get_listing_media(listing_id: str) -> List[Dict[str, Any]]:
     """Get all media for a listing"""
     if not supabase:
@@ -233,6 +537,32 @@ def get_listing_media(listing_id: str) -> List[Dict[str, Any]]:
     return result.data if result.data else []
 
 
+def get_first_media_for_listings(listing_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Get the first photo of each listing in a single query, keyed by listing ID"""
+    if not supabase or not listing_ids:
+        return {}
+    
+    unique_ids = list(dict.fromkeys(listing_ids))
+    
+    def fetch() -> Dict[str, Dict[str, Any]]:
+        result = (
+            supabase.table("media")
+            .select("*")
+            .in_("listing_id", unique_ids)
+            .eq("media_type", "photo")
+            .order("display_order")
+            .execute()
+        )
+        
+        first_media: Dict[str, Dict[str, Any]] = {}
+        for media in result.data or []:
+            # Rows are ordered by display_order, so the first row seen per listing wins
+            first_media.setdefault(media["listing_id"], media)
+        return first_media
+    
+    return _listings_cache.get_or_set(("first_media", tuple(unique_ids)), fetch)
+
+
 def delete_listing_media(listing_id: str) -> bool:
     """Delete all media for a listing"""
     if not supabase:
@@ -240,6 +570,7 @@ def delete_listing_media(listing_id: str) -> bool:
     
     try:
         supabase.table("media").delete().eq("listing_id", listing_id).execute()
+        _listings_changed()
         return True
     except Exception as e:
         logger.error(f"Error deleting media: {e}")
@@ -253,6 +584,7 @@ def delete_media_by_id(media_id: str) -> bool:
     
     try:
         supabase.table("media").delete().eq("id", media_id).execute()
+        _listings_changed()
         return True
     except Exception as e:
         logger.error(f"Error deleting media by ID: {e}")
@@ -301,6 +633,22 @@ def update_payment_status(stripe_session_id: str, status: str, payment_intent_id
     return result.data[0] if result.data else None
 
 
+def has_completed_payment(listing_id: str) -> bool:
+    """True if the publication of a listing has been paid for"""
+    if not supabase:
+        return False
+    
+    result = (
+        supabase.table("payments")
+        .select("id")
+        .eq("listing_id", listing_id)
+        .eq("status", "completed")
+        .limit(1)
+        .execute()
+    )
+    return bool(result.data)
+
+
 def get_payment_by_session(stripe_session_id: str) -> Optional[Dict[str, Any]]:
     """Get payment by Stripe session ID"""
     if not supabase:
@@ -315,6 +663,70 @@ def get_payment_by_session(stripe_session_id: str) -> Optional[Dict[str, Any]]:
     return result.data[0] if result.data and len(result.data) > 0 else None
 
 
+# ==================== Stripe events ====================
+
+def record_stripe_event(event_id: str, event_type: str, payload: Dict[str, Any]) -> bool:
+    """
+    Record a received Stripe event for deduplication
+    
+    Returns True if the event is new, False if it was already recorded (a
+    Stripe retry or duplicate delivery). Single request: INSERT ... ON CONFLICT DO NOTHING.
+    """
+    if not supabase:
+        return True
+    
+    result = (
+        supabase.table("stripe_events")
+        .upsert(
+            {"id": event_id, "type": event_type, "payload": payload},
+            on_conflict="id",
+            ignore_duplicates=True,
+        )
+        .execute()
+    )
+    return bool(result.data)
+
+
+def mark_stripe_event_processed(event_id: str, error: Optional[str] = None) -> None:
+    """Record the outcome of processing a Stripe event (error is None on success)"""
+    if not supabase:
+        return
+    
+    now = datetime.utcnow().isoformat()
+    updates = {"last_error": error} if error else {"processed_at": now, "last_error": None}
+    supabase.table("stripe_events").update(updates).eq("id", event_id).execute()
+
+
+def stripe_event_needs_retry(event_id: str) -> bool:
+    """True if a recorded Stripe event was never processed and its last attempt failed"""
+    if not supabase:
+        return False
+    
+    result = (
+        supabase.table("stripe_events")
+        .select("processed_at, last_error")
+        .eq("id", event_id)
+        .execute()
+    )
+    return any(row["processed_at"] is None and row["last_error"] for row in result.data or [])
+
+
+def get_pending_stripe_events(limit: int = 100) -> List[Dict[str, Any]]:
+    """Get recorded Stripe events that were never successfully processed (oldest first)"""
+    if not supabase:
+        return []
+    
+    result = (
+        supabase.table("stripe_events")
+        .select("id, type, payload")
+        .is_("processed_at", "null")
+        .order("received_at")
+        .limit(limit)
+        .execute()
+    )
+    return result.data or []
+
+
 # ==================== Reports (DSA Compliance) ====================
 
 def create_report(listing_url: str, reason: str, description: str, reporter_email: Optional[str] = None, listing_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
@@ -353,6 +765,42 @@ def get_reports(status: Optional[str] = None, limit: int = 100) -> List[Dict[str
     return result.data if result.data else []
 
 
+REPORT_STATUSES = ["new", "reviewed", "resolved"]
+
+
+def get_report_status_counts() -> Dict[str, int]:
+    """
+    Get the number of reports per status, plus the total
+    
+    Uses the report_status_counts() SQL function (MIGRATION_REPORT_COUNTS.sql),
+    a single GROUP BY round-trip. If the function is not installed, falls back to
+    count="exact" head queries, which transfer no rows either.
+    """
+    counts = {status: 0 for status in REPORT_STATUSES}
+    if not supabase:
+        return {**counts, "total": 0}
+    
+    try:
+        result = supabase.rpc("report_status_counts").execute()
+        for row in result.data or []:
+            counts[row["status"]] = row["count"]
+        return {**counts, "total": sum(counts.values())}
+    except Exception as e:
+        logger.warning(f"report_status_counts RPC unavailable, using count queries: {e}")
+    
+    for status in REPORT_STATUSES:
+        result = (
+            supabase.table("reports")
+            .select("id", count="exact", head=True)
+            .eq("status", status)
+            .execute()
+        )
+        counts[status] = result.count or 0
+    
+    result = supabase.table("reports").select("id", count="exact", head=True).execute()
+    return {**counts, "total": result.count or 0}
+
+
 def get_report(report_id: str) -> Optional[Dict[str, Any]]:
     """Get a single report by ID"""
     if not supabase:
@@ -0,0 +1,160 @@
+"""
+Listing wizard drafts held client-side in a signed cookie
+
+Steps 1-4 of the wizard keep the draft (fields, uploaded photos) in a cookie
+instead of the database; the listing is written in one insert at step 5, right
+before checkout. The cookie value is compressed JSON signed with HMAC-SHA256,
+so it cannot be tampered with, and expires after DRAFT_MAX_AGE seconds. Large
+drafts are split over a few cookies, up to DRAFT_MAX_BYTES in total; photos are
+kept as storage references (see storage.photo_reference()) to stay well within it.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+import uuid
+import zlib
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Request
+from starlette.responses import Response
+
+from . import config
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+COOKIE_NAME = "listing_draft"
+# Browsers cap a cookie (name, value and attributes) at 4096 bytes
+CHUNK_SIZE = 3800
+
+# Draft fields written to the listings table at step 5
+LISTING_FIELDS = (
+    "listing_type", "category", "title", "condition", "year", "manufacturer", "summary",
+    "description", "price_amount", "price_display", "location", "contact_email", "contact_phone",
+)
+
+if config.SECRET_KEY:
+    _secret = config.SECRET_KEY.encode()
+else:
+    logger.warning("⚠️  SECRET_KEY not set - wizard drafts won't survive a restart or span several workers")
+    _secret = secrets.token_bytes(32)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(_secret, payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def new_draft(user_id: str) -> Dict[str, Any]:
+    """Start a draft; its ID is the listing ID used for photo storage and the step-5 insert"""
+    return {"id": str(uuid.uuid4()), "user_id": user_id, "photos": []}
+
+
+def encode(draft: Dict[str, Any]) -> str:
+    """Serialize a draft to a signed, compressed cookie value"""
+    data = json.dumps({**draft, "iat": int(time.time())}, separators=(",", ":"), ensure_ascii=False)
+    payload = _b64encode(zlib.compress(data.encode("utf-8"), 9))
+    return f"{payload}.{_sign(payload)}"
+
+
+def decode(value: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Verify and deserialize a cookie value (None if missing, tampered with or expired)"""
+    if not value or "." not in value:
+        return None
+    payload, signature = value.rsplit(".", 1)
+    if not hmac.compare_digest(signature, _sign(payload)):
+        logger.warning("Rejected wizard draft with an invalid signature")
+        return None
+    try:
+        draft = json.loads(zlib.decompress(_b64decode(payload)))
+    except (ValueError, zlib.error):
+        return None
+    if time.time() - draft.pop("iat", 0) > config.DRAFT_MAX_AGE:
+        return None
+    return draft
+
+
+def _chunk_names(count: int):
+    return [COOKIE_NAME] + [f"{COOKIE_NAME}_{i}" for i in range(1, count)]
+
+
+def load(request: Request, listing_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Read the draft from the request cookies
+
+    If a listing ID is given (from the wizard URL or form), a draft for another
+    listing is ignored, e.g. when an old tab is resubmitted.
+    """
+    chunks = []
+    for name in _chunk_names(config.DRAFT_MAX_BYTES // CHUNK_SIZE + 1):
+        chunk = request.cookies.get(name)
+        if chunk is None:
+            break
+        chunks.append(chunk)
+    draft = decode("".join(chunks))
+    if draft is None or (listing_id and draft.get("id") != listing_id):
+        return None
+    return draft
+
+
+def _set_cookie(response: Response, name: str, value: str) -> None:
+    response.set_cookie(
+        key=name,
+        value=value,
+        max_age=config.DRAFT_MAX_AGE,
+        httponly=True,
+        samesite="lax",
+        secure=config.APP_URL.startswith("https://"),
+    )
+
+
+def check_size(draft: Dict[str, Any]) -> str:
+    """
+    Encode a draft, raising a 400 naming what makes it too large for its cookies
+
+    Called before photos are uploaded with the draft they would be part of, so
+    an oversized draft never leaves objects behind in storage.
+    """
+    value = encode(draft)
+    if len(value) <= config.DRAFT_MAX_BYTES:
+        return value
+    if draft.get("photos") and len(encode({**draft, "photos": []})) <= config.DRAFT_MAX_BYTES:
+        detail = "Trop de photos pour votre annonce. Veuillez en sélectionner moins."
+    else:
+        detail = "Votre annonce est trop volumineuse. Veuillez raccourcir le titre, le résumé ou la description."
+    raise HTTPException(status_code=400, detail=detail)
+
+
+def save(response: Response, draft: Dict[str, Any]) -> None:
+    """Store the draft in the response cookies, splitting it if needed"""
+    value = check_size(draft)
+
+    chunks = [value[i:i + CHUNK_SIZE] for i in range(0, len(value), CHUNK_SIZE)]
+    names = _chunk_names(config.DRAFT_MAX_BYTES // CHUNK_SIZE + 1)
+    for name, chunk in zip(names, chunks):
+        _set_cookie(response, name, chunk)
+    # Drop chunks left over from a previously larger draft
+    for name in names[len(chunks):]:
+        response.delete_cookie(name)
+
+
+def clear(response: Response) -> None:
+    """Forget the draft (after the listing has been paid for)"""
+    for name in _chunk_names(config.DRAFT_MAX_BYTES // CHUNK_SIZE + 1):
+        response.delete_cookie(name)
+
+
+def listing_data(draft: Dict[str, Any]) -> Dict[str, Any]:
+    """Columns of the listings row built from a draft"""
+    return {"id": draft["id"], **{field: draft.get(field) for field in LISTING_FIELDS if field in draft}}
@@ -1,14 +1,18 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from typing import Any, Dict, Optional
 import logging
-import asyncio
 from . import config
+from . import clients
+from . import outbox
 
 logger = logging.getLogger(__name__)
 
-def _send_email_sync(
+CONTACT_FIELDS = ("name", "email", "phone", "company", "subject", "reference", "message")
+
+
+def build_contact_message(
     name: str,
     email: str,
     phone: Optional[str],
@@ -16,22 +20,18 @@ def _send_email_sync(
     subject: str,
     reference: Optional[str],
     message: str
-) -> bool:
-    """Synchronous email sending helper"""
-    try:
-        logger.info(f"📧 Preparing to send contact email from {name} <{email}>")
-        logger.debug(f"Email details - Subject: {subject}, Reference: {reference or 'None'}")
-        
-        # Créer le message
-        msg = MIMEMultipart()
-        msg['From'] = config.SMTP_USER
-        msg['To'] = config.CONTACT_EMAIL
-        msg['Subject'] = f"Contact: {subject}"
-        
-        logger.debug(f"Email headers configured - From: {config.SMTP_USER}, To: {config.CONTACT_EMAIL}")
-        
-        # Corps du message
-        body = f"""
+) -> MIMEMultipart:
+    """Build the notification sent to CONTACT_EMAIL for a contact form submission"""
+    # Créer le message
+    msg = MIMEMultipart()
+    msg['From'] = config.SMTP_USER
+    msg['To'] = config.CONTACT_EMAIL
+    msg['Subject'] = f"Contact: {subject}"
+    
+    logger.debug(f"Email headers configured - From: {config.SMTP_USER}, To: {config.CONTACT_EMAIL}")
+    
+    # Corps du message
+    body = f"""
 Nouveau message de contact reçu:
 
 Nom: {name}
@@ -44,37 +44,46 @@ Référence annonce: {reference or 'Aucune'}
 Message:
 {message}
 """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        logger.debug(f"Email body attached, length: {len(body)} characters")
-        
-        # Envoyer via SMTP
-        logger.info(f"🔌 Connecting to SMTP server {config.SMTP_HOST}:{config.SMTP_PORT}")
-        with smtplib.SMTP(config.SMTP_HOST, config.SMTP_PORT) as server:
-            logger.debug("Starting TLS encryption")
-            server.starttls()
-            logger.debug(f"Authenticating as {config.SMTP_USER}")
-            server.login(config.SMTP_USER, config.SMTP_PASSWORD)
-            logger.info("📤 Sending email message...")
-            server.send_message(msg)
-        
-        logger.info(f"✅ Contact email sent successfully to {config.CONTACT_EMAIL} from {email}")
-        return True
-        
-    except smtplib.SMTPAuthenticationError as e:
-        logger.error(f"❌ SMTP Authentication failed: {e}")
-        logger.error(f"Check SMTP_USER and SMTP_PASSWORD in .env file")
-        return False
-    except smtplib.SMTPException as e:
-        logger.error(f"❌ SMTP error occurred: {e}")
-        logger.error(f"SMTP configuration: SMTP_HOST={config.SMTP_HOST}, SMTP_PORT={config.SMTP_PORT}")
-        return False
-    except Exception as e:
-        logger.error(f"❌ Failed to send contact email: {e}")
-        logger.error(f"Check SMTP configuration: SMTP_HOST={config.SMTP_HOST}, SMTP_PORT={config.SMTP_PORT}, SMTP_USER={'<configured>' if config.SMTP_USER else '<not set>'}")
-        return False
+    
+    msg.attach(MIMEText(body, 'plain'))
+    logger.debug(f"Email body attached, length: {len(body)} characters")
+    return msg
+
+
+def _smtp_session() -> clients.SMTPSession:
+    return clients.get_smtp_session(
+        config.SMTP_HOST, config.SMTP_PORT, config.SMTP_USER, config.SMTP_PASSWORD
+    )
+
+
+def _deliver_contact_email(fields: Dict[str, Any]) -> None:
+    """Send a spooled contact message (outbox worker); raising makes the outbox retry"""
+    msg = build_contact_message(**{field: fields.get(field) for field in CONTACT_FIELDS})
+    try:
+        _smtp_session().send_message(msg)
+    except smtplib.SMTPAuthenticationError:
+        # A configuration problem: keep the message and retry once credentials are fixed
+        raise
+    except smtplib.SMTPResponseException as e:
+        if e.smtp_code >= 500:
+            raise outbox.UndeliverableMessage(f"{e.smtp_code} {e.smtp_error!r}") from e
+        raise
+    except smtplib.SMTPRecipientsRefused as e:
+        raise outbox.UndeliverableMessage(str(e)) from e
+    logger.info(f"✅ Contact email from {fields.get('email')} delivered to {config.CONTACT_EMAIL}")
+
+
+# Contact messages waiting for the SMTP server, delivered in the background
+contact_outbox = outbox.Outbox(
+    config.OUTBOX_DIR,
+    _deliver_contact_email,
+    name="contact-outbox",
+    max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+    backoff_base=config.OUTBOX_RETRY_BASE_SECONDS,
+)
 
-async def send_contact_email(
+
+def queue_contact_email(
     name: str,
     email: str,
     phone: Optional[str],
@@ -83,21 +92,25 @@ async def send_contact_email(
     reference: Optional[str],
     message: str
 ) -> bool:
-    """Send contact form email notification"""
-    # Vérifier si SMTP est configuré
-    if not hasattr(config, 'SMTP_HOST') or not config.SMTP_HOST:
-        logger.warning(
-            "⚠️  SMTP not configured - email not sent (mock mode). "
-            "Configure SMTP_HOST, SMTP_USER, SMTP_PASSWORD in .env to enable email sending."
-        )
+    """
+    Spool a contact form notification for background delivery
+    
+    Returns as soon as the message is written to the outbox (blocking file
+    write: call it off the event loop). The message is sent by the outbox
+    worker over the shared SMTP session and kept across restarts until sent.
+    """
+    if not config.SMTP_HOST:
+        logger.warning("⚠️  SMTP not configured - email not queued (mock mode).")
         logger.info(f"📧 [MOCK MODE] Would have sent email from {name} <{email}> with subject: {subject}")
         return True  # Mode mock
     
-    # Run blocking SMTP in thread pool to avoid blocking event loop
-    logger.debug(f"Running email send in thread pool for {email}")
-    result = await asyncio.to_thread(
-        _send_email_sync, name, email, phone, company, subject, reference, message
-    )
-    logger.debug(f"Email send result for {email}: {'success' if result else 'failure'}")
-    return result
-
+    try:
+        contact_outbox.enqueue({
+            "name": name, "email": email, "phone": phone, "company": company,
+            "subject": subject, "reference": reference, "message": message,
+        })
+    except OSError as e:
+        logger.error(f"❌ Could not write contact email to the outbox {config.OUTBOX_DIR}: {e}")
+        return False
+    logger.info(f"📥 Contact email from {email} queued for delivery")
+    return True
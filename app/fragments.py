@@ -0,0 +1,48 @@
+"""
+Cache of rendered listing-card HTML, shared by every page that shows cards
+
+A card only depends on its listing row and its photo, so its markup is keyed on
+(variant, listing id, updated_at, image) and reused across requests and pages:
+rendering a grid is then a string join of cached fragments. Any edit bumps
+updated_at and any photo replacement changes the image URL, so stale entries are
+never hit and simply age out of the LRU.
+"""
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+from jinja2 import Environment, pass_environment
+from markupsafe import Markup
+
+from . import config
+from .cache import TTLCache
+
+CARD_TEMPLATE = "_listing_card.html"
+
+card_cache = TTLCache(maxsize=config.CARD_CACHE_MAXSIZE, ttl=config.CARD_CACHE_TTL, name="listing_cards")
+
+
+def _card_key(item: Dict[str, Any], variant: str) -> Optional[Hashable]:
+    """Cache key of a card, or None if the listing has no version to key on"""
+    if not item.get("updated_at"):
+        return None
+    return (variant, str(item["id"]), str(item["updated_at"]), item.get("image"))
+
+
+def render_listing_card(env: Environment, item: Dict[str, Any], variant: str) -> str:
+    """Render one listing card, from the cache when possible"""
+    key = _card_key(item, variant)
+    if key is None:
+        return env.get_template(CARD_TEMPLATE).render(item=item, variant=variant)
+    return card_cache.get_or_set(
+        key, lambda: env.get_template(CARD_TEMPLATE).render(item=item, variant=variant)
+    )
+
+
+@pass_environment
+def listing_cards(env: Environment, items: Iterable[Dict[str, Any]], variant: str) -> Markup:
+    """
+    Jinja global rendering a grid of listing cards
+
+    Variants: "home" (home page), "catalogue" (/annonces, with condition badge
+    and filter data attributes) and "similar" (detail page strip).
+    """
+    return Markup("\n".join(render_listing_card(env, item, variant) for item in items))
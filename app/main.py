@@ -1,36 +1,248 @@
-from fastapi import FastAPI, Request, HTTPException, Form, Cookie, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, HTTPException, Form, UploadFile, File
+from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from typing import Optional, List
-import stripe
 import json
+import os
+import asyncio
 import logging
+import secrets
 
 from . import db
 from . import config
 from . import storage
+from . import search
+from . import clients
+from . import uploads
+from . import fragments
+from . import assets
+from . import compression
+from . import drafts
+from . import webhooks
+from . import email as email_module
+from . import scheduler
+from . import metrics
+from . import templating
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Pieces Methanisation Pro")
 
-# Configure Stripe
-if config.STRIPE_SECRET_KEY:
-    stripe.api_key = config.STRIPE_SECRET_KEY
-
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
-templates = Jinja2Templates(directory="app/templates")
+async def _warm_up() -> None:
+    """Open outbound connections, compile templates, then re-queue unprocessed Stripe events"""
+    tasks = [clients.warm_up(db.supabase)]
+    if config.TEMPLATE_WARM_UP:
+        tasks.append(db.to_thread(templating.warm_up, templates.env))
+    await asyncio.gather(*tasks)
+    try:
+        await db.to_thread(webhooks.recover_pending)
+    except Exception as e:
+        logger.error(f"Error re-queuing pending Stripe events: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background workers and warm up outbound connections; release them on shutdown"""
+    webhooks.worker.start()
+    if config.SMTP_HOST:
+        email_module.contact_outbox.start()
+    if config.SCHEDULER_ENABLED:
+        scheduler.scheduler.every(config.EXPIRE_LISTINGS_INTERVAL, "expire_listings", db.expire_old_listings)
+        scheduler.scheduler.start()
+    # In the background by default, so a cold start serves its first request without
+    # waiting for the SDK imports and TLS handshakes (a request needing a client waits for it)
+    warm_up = asyncio.create_task(_warm_up())
+    if not config.WARM_UP_IN_BACKGROUND:
+        await warm_up
+    yield
+    warm_up.cancel()
+    scheduler.scheduler.stop()
+    email_module.contact_outbox.stop()
+    webhooks.worker.stop()
+    clients.close(db.supabase)
+
+
+app = FastAPI(title="Pieces Methanisation Pro", lifespan=lifespan)
+
+# Compress HTML and JSON responses (static assets are served precompressed)
+app.add_middleware(
+    compression.CompressionMiddleware,
+    minimum_size=config.COMPRESSION_MIN_SIZE,
+    gzip_level=config.GZIP_LEVEL,
+    brotli_quality=config.BROTLI_QUALITY,
+)
+
+# Refuse oversize photo uploads before their body is buffered
+app.add_middleware(
+    uploads.UploadLimitMiddleware,
+    max_body_size=config.MAX_UPLOAD_REQUEST_BYTES,
+    paths=["/deposer/step3"],
+)
+
+# Outermost: time every request (Server-Timing header and /metrics histograms)
+app.add_middleware(metrics.MetricsMiddleware, server_timing=config.SERVER_TIMING_ENABLED)
+
+# Static files are content-hashed once at startup and linked through static_url()
+app.mount(
+    "/static",
+    assets.FingerprintedStaticFiles(directory=assets.STATIC_DIRECTORY, manifest=assets.manifest.build()),
+    name="static",
+)
+
+# With the SQLite backend, uploaded photos are served locally at their Supabase Storage URLs
+if config.DB_BACKEND == "sqlite":
+    os.makedirs(config.SQLITE_STORAGE_DIR, exist_ok=True)
+    app.mount(
+        "/storage/v1/object/public",
+        StaticFiles(directory=config.SQLITE_STORAGE_DIR),
+        name="local-storage",
+    )
+templates = templating.create_templates(
+    "app/templates",
+    cache_dir=config.TEMPLATE_CACHE_DIR or None,
+    auto_reload=config.TEMPLATE_AUTO_RELOAD,
+    minify=config.TEMPLATE_MINIFY,
+)
+templates.env.template_class = metrics.TimedTemplate
+templates.env.globals["listing_cards"] = fragments.listing_cards
+templates.env.globals["static_url"] = assets.static_url
+
+# Fallback image for listings without any uploaded photo
+DEFAULT_LISTING_IMAGE = "https://images.unsplash.com/photo-1581092918484-8313e1f7e8d6?w=1200&q=80"
+_DEFAULT_IMAGE_BASE = DEFAULT_LISTING_IMAGE.split("?")[0]
+DEFAULT_LISTING_SRCSET = ", ".join(
+    f"{_DEFAULT_IMAGE_BASE}?w={width}&q=80 {width}w" for width in config.IMAGE_DERIVATIVE_WIDTHS
+)
+DEFAULT_LISTING_SRCSET_WEBP = ", ".join(
+    f"{_DEFAULT_IMAGE_BASE}?w={width}&q=80&fm=webp {width}w" for width in config.IMAGE_DERIVATIVE_WIDTHS
+)
 
 
 # ==================== Helper Functions ====================
 
-def get_draft_from_cookie(draft_id: Optional[str]) -> Optional[dict]:
-    """Get draft listing from database"""
-    if not draft_id:
-        return None
-    return db.get_listing(draft_id)
+def attach_listing_images(listings: List[dict]) -> List[dict]:
+    """
+    Attach the first photo (or the default image) to every listing card
+    
+    Listings read with their first photo embedded (under "media") use it; the
+    others (e.g. search results) are completed with one batched media query.
+    Sets image (original URL), image_srcset_webp / image_srcset (resized
+    derivatives, empty for photos uploaded before derivatives existed) and
+    image_placeholder (blurred LQIP data URI, or None).
+    """
+    first_media = db.get_first_media_for_listings([listing["id"] for listing in listings if "media" not in listing])
+    for listing in listings:
+        if "media" in listing:
+            embedded = listing.pop("media")
+            media = embedded[0] if embedded else None
+        else:
+            media = first_media.get(listing["id"])
+        if media:
+            listing["image"] = media["url"]
+            listing["image_srcset_webp"] = storage.build_srcset(media.get("variants"), "image/webp")
+            listing["image_srcset"] = storage.build_srcset(media.get("variants"), "image/jpeg")
+            listing["image_placeholder"] = media.get("placeholder")
+        else:
+            listing["image"] = DEFAULT_LISTING_IMAGE
+            listing["image_srcset_webp"] = DEFAULT_LISTING_SRCSET_WEBP
+            listing["image_srcset"] = DEFAULT_LISTING_SRCSET
+            listing["image_placeholder"] = None
+    return listings
+
+
+async def replace_draft_photos(draft: dict, photos: List[UploadFile], content_types: List[str]) -> None:
+    """
+    Replace the photos of a wizard draft with freshly uploaded ones
+    
+    New photos (and their derivatives) are uploaded concurrently under the
+    draft's listing ID; the previous photos of the draft are then removed from
+    storage in a single batched call. The draft keeps storage references only,
+    and media rows are only written at step 5.
+    """
+    bucket = config.SUPABASE_STORAGE_BUCKET
+    listing_id = draft["id"]
+    paths = [
+        storage.generate_filename(listing_id, photo.filename, content_type)
+        for photo, content_type in zip(photos, content_types)
+    ]
+    # Refuse a draft that couldn't be saved before anything is uploaded
+    drafts.check_size({
+        **draft,
+        "photos": [{**storage.photo_reference(path), "filename": photo.filename} for photo, path in zip(photos, paths)],
+    })
+    
+    stored = await asyncio.gather(*(
+        db.to_thread(
+            uploads.store_photo,
+            db.supabase,
+            bucket,
+            path,
+            photo,
+            content_type,
+            config.UPLOAD_SPOOL_THRESHOLD
+        )
+        for photo, path, content_type in zip(photos, paths, content_types)
+    ))
+    references = [storage.photo_reference(path, item["variants"]) if item else None for path, item in zip(paths, stored)]
+    
+    failed = [photo.filename for photo, item in zip(photos, stored) if not item]
+    if failed:
+        # Don't leave orphaned objects behind for the photos that did upload
+        orphans = [path for reference in references if reference for path in storage.photo_reference_paths(reference, bucket)]
+        await db.to_thread(storage.delete_files, db.supabase, bucket, orphans)
+        logger.error(f"Failed to upload photos: {', '.join(failed)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Échec du téléchargement de la photo: {failed[0]}"
+        )
+    
+    old_paths = [path for photo in draft.get("photos", []) for path in storage.photo_reference_paths(photo, bucket)]
+    draft["photos"] = [{**reference, "filename": photo.filename} for photo, reference in zip(photos, references)]
+    await db.to_thread(storage.delete_files, db.supabase, bucket, old_paths)
+
+
+def save_draft_listing(draft: dict) -> Optional[dict]:
+    """
+    Write a wizard draft to the database: the listing row, then its media rows in one bulk insert
+    
+    The listing is upserted on its draft ID and its media replaced, so submitting
+    step 5 again (e.g. after a cancelled or failed payment) is safe.
+    """
+    listing_data = drafts.listing_data(draft)
+    photos = draft.get("photos", [])
+    # URLs and placeholders are rebuilt from the storage references of the draft
+    resolved = storage.resolve_photos(db.supabase, config.SUPABASE_STORAGE_BUCKET, photos) if photos else []
+    media = [
+        {
+            "listing_id": draft["id"],
+            "media_type": "photo",
+            "url": item["url"],
+            "filename": photo.get("filename"),
+            "display_order": idx,
+            "variants": item.get("variants") or [],
+            "placeholder": item.get("placeholder"),
+        }
+        for idx, (photo, item) in enumerate(zip(photos, resolved))
+    ]
+    
+    # Upsert and media replacement: step 5 can be submitted again after a failed or
+    # cancelled payment, even when the cookie never recorded the first submission
+    listing = db.save_listing(draft["user_id"], listing_data)
+    # Inserting while the previous rows are still there would duplicate them
+    if not db.delete_listing_media(draft["id"]):
+        raise HTTPException(
+            status_code=500,
+            detail="Erreur lors de l'enregistrement des photos. Veuillez réessayer."
+        )
+    db.add_media_bulk(media)
+    return listing
+
+
+def ensure_search_index() -> None:
+    """Build the search index on first use and fully refresh it periodically"""
+    if search.listing_index.is_stale(config.SEARCH_INDEX_REFRESH_SECONDS):
+        search.listing_index.rebuild(db.get_searchable_listings())
 
 
 def format_price_display(price_amount: Optional[int]) -> str:
@@ -46,42 +258,54 @@ def format_price_display(price_amount: Optional[int]) -> str:
 def home(request: Request):
     """Home page with featured listings from database"""
     featured = db.get_published_listings(limit=6)
+    attach_listing_images(featured)
     
-    # Add image URLs for listings that have media
-    for listing in featured:
-        media = db.get_listing_media(listing["id"])
-        if media and len(media) > 0:
-            listing["image"] = media[0]["url"]
-        else:
-            # Fallback to default image
-            listing["image"] = "https://images.unsplash.com/photo-1581092918484-8313e1f7e8d6?w=1200&q=80"
-    
-    count = len(featured)  # In production, you'd query the count separately
+    stats = db.get_catalogue_stats()
     
     return templates.TemplateResponse(
         "index.html",
-        {"request": request, "featured": featured, "count": count},
+        {"request": request, "featured": featured, "count": stats["total"]},
     )
 
 
 # ==================== Listings ====================
 
 @app.get("/annonces", response_class=HTMLResponse)
-def listings(request: Request):
-    """List all published listings"""
-    all_listings = db.get_published_listings(limit=100)
-    
-    # Add image URLs for listings
-    for listing in all_listings:
-        media = db.get_listing_media(listing["id"])
-        if media and len(media) > 0:
-            listing["image"] = media[0]["url"]
-        else:
-            listing["image"] = "https://images.unsplash.com/photo-1581092918484-8313e1f7e8d6?w=1200&q=80"
+def listings(
+    request: Request,
+    q: Optional[str] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+):
+    """List published listings, one keyset-paginated page at a time, or ranked search results"""
+    q = (q or "").strip()
+    if q:
+        ensure_search_index()
+        page = {
+            "listings": search.listing_index.search(q, limit=config.SEARCH_MAX_RESULTS),
+            "next_cursor": None,
+            "prev_cursor": None,
+        }
+    else:
+        page = db.get_published_listings_page(
+            limit=config.LISTINGS_PAGE_SIZE,
+            after=after,
+            before=before,
+        )
+    attach_listing_images(page["listings"])
     
     return templates.TemplateResponse(
         "listing.html",
-        {"request": request, "listings": all_listings},
+        {
+            "request": request,
+            "listings": page["listings"],
+            "next_cursor": page["next_cursor"],
+            "prev_cursor": page["prev_cursor"],
+            "q": q,
+            "stats": db.get_catalogue_stats(),
+            "categories": config.CATEGORIES,
+            "conditions": config.CONDITIONS,
+        },
     )
 
 
@@ -92,24 +316,12 @@ def listing_detail(request: Request, listing_id: str):
     if not listing or listing["status"] != "published":
         raise HTTPException(status_code=404, detail="Annonce introuvable")
     
-    # Get media
-    media = db.get_listing_media(listing_id)
-    if media and len(media) > 0:
-        listing["image"] = media[0]["url"]
-    else:
-        listing["image"] = "https://images.unsplash.com/photo-1581092918484-8313e1f7e8d6?w=1200&q=80"
-    
     # Get similar listings (same category)
     similar = db.get_published_listings(limit=100)
     similar = [l for l in similar if l["category"] == listing["category"] and l["id"] != listing_id][:3]
     
-    # Add images to similar listings
-    for sim in similar:
-        sim_media = db.get_listing_media(sim["id"])
-        if sim_media and len(sim_media) > 0:
-            sim["image"] = sim_media[0]["url"]
-        else:
-            sim["image"] = "https://images.unsplash.com/photo-1581092918484-8313e1f7e8d6?w=1200&q=80"
+    # Attach images to the listing and its similar listings in one media query
+    attach_listing_images([listing, *similar])
     
     return templates.TemplateResponse(
         "detail.html",
@@ -128,9 +340,7 @@ async def deposer_redirect():
 @app.get("/deposer/step1", response_class=HTMLResponse)
 def wizard_step1(request: Request, listing_id: Optional[str] = None):
     """Wizard step 1: Type & Category"""
-    draft = None
-    if listing_id:
-        draft = db.get_listing(listing_id)
+    draft = drafts.load(request)
     
     return templates.TemplateResponse(
         "wizard_step1.html",
@@ -150,39 +360,31 @@ async def wizard_step1_post(
     listing_type: str = Form(...),
     category: str = Form(...),
     title: str = Form(...),
-    draft_id: Optional[str] = Cookie(None),
 ):
     """Save step 1 and redirect to step 2"""
     # Get or create user (simplified - in production you'd have auth)
-    user = db.get_or_create_user("contact@pieces-methanisation.fr")
+    user = await db.to_thread(db.get_or_create_user, "contact@pieces-methanisation.fr")
     
-    listing_data = {
+    # The draft lives in a signed cookie until step 5: no database write here
+    draft = drafts.load(request) or drafts.new_draft(user["id"])
+    draft.update({
         "listing_type": listing_type,
         "category": category,
         "title": title,
-        "contact_email": "contact@pieces-methanisation.fr",
-        "contact_phone": "+33000000000",
-        "location": "Non défini",
-    }
-    
-    if draft_id:
-        # Update existing draft
-        draft = db.update_listing(draft_id, listing_data)
-        listing_id = draft_id
-    else:
-        # Create new draft
-        draft = db.create_listing(user["id"], listing_data)
-        listing_id = draft["id"]
+        "contact_email": draft.get("contact_email") or "contact@pieces-methanisation.fr",
+        "contact_phone": draft.get("contact_phone") or "+33000000000",
+        "location": draft.get("location") or "Non défini",
+    })
     
-    response = RedirectResponse(url=f"/deposer/step2?listing_id={listing_id}", status_code=303)
-    response.set_cookie(key="draft_id", value=listing_id, max_age=86400)
+    response = RedirectResponse(url=f"/deposer/step2?listing_id={draft['id']}", status_code=303)
+    drafts.save(response, draft)
     return response
 
 
 @app.get("/deposer/step2", response_class=HTMLResponse)
-def wizard_step2(request: Request, listing_id: str):
+def wizard_step2(request: Request, listing_id: Optional[str] = None):
     """Wizard step 2: Technical Details"""
-    draft = db.get_listing(listing_id)
+    draft = drafts.load(request, listing_id)
     if not draft:
         return RedirectResponse(url="/deposer/step1", status_code=302)
     
@@ -208,36 +410,41 @@ async def wizard_step2_post(
     description: str = Form(...),
 ):
     """Save step 2 and redirect to step 3"""
-    updates = {
+    draft = drafts.load(request, listing_id)
+    if not draft:
+        return RedirectResponse(url="/deposer/step1", status_code=303)
+    
+    draft.update({
         "condition": condition,
         "year": year if year else None,
         "manufacturer": manufacturer if manufacturer else None,
         "summary": summary,
         "description": description,
-    }
-    
-    db.update_listing(listing_id, updates)
+    })
     
-    return RedirectResponse(url=f"/deposer/step3?listing_id={listing_id}", status_code=303)
+    response = RedirectResponse(url=f"/deposer/step3?listing_id={listing_id}", status_code=303)
+    drafts.save(response, draft)
+    return response
 
 
 @app.get("/deposer/step3", response_class=HTMLResponse)
-def wizard_step3(request: Request, listing_id: str):
+def wizard_step3(request: Request, listing_id: Optional[str] = None):
     """Wizard step 3: Media"""
-    draft = db.get_listing(listing_id)
+    draft = drafts.load(request, listing_id)
     if not draft:
         return RedirectResponse(url="/deposer/step1", status_code=302)
     
-    # Get existing media
-    media = db.get_listing_media(listing_id)
-    draft["photos"] = media  # Add photos list to draft
-    
     return templates.TemplateResponse(
         "wizard_step3.html",
         {
             "request": request,
             "current_step": 3,
             "draft": draft,
+            "photo_urls": [
+                storage.photo_url(db.supabase, config.SUPABASE_STORAGE_BUCKET, photo)
+                for photo in draft.get("photos", [])
+            ] if db.supabase else [],
+            "max_photo_size_mb": config.MAX_PHOTO_SIZE_BYTES // (1024 * 1024),
         },
     )
 
@@ -249,6 +456,9 @@ async def wizard_step3_post(
     photos: List[UploadFile] = File(...),
 ):
     """Save step 3 (upload photos) and redirect to step 4"""
+    draft = drafts.load(request, listing_id)
+    if not draft:
+        return RedirectResponse(url="/deposer/step1", status_code=303)
     
     # Server-side validation: max 3 photos
     if len(photos) > config.MAX_PHOTOS_PER_LISTING:
@@ -264,13 +474,16 @@ async def wizard_step3_post(
             detail="Veuillez télécharger au moins une photo."
         )
     
-    # Validate file types
+    # Validate size and file type from the magic bytes (the client content type is not trusted)
+    content_types = []
     for photo in photos:
-        if photo.content_type not in config.ALLOWED_PHOTO_TYPES:
+        content_type = await uploads.inspect_photo(photo, config.MAX_PHOTO_SIZE_BYTES)
+        if content_type not in config.ALLOWED_PHOTO_TYPES:
             raise HTTPException(
                 status_code=400,
-                detail=f"Type de fichier non autorisé: {photo.content_type}. Utilisez JPG, PNG, WEBP ou GIF."
+                detail=f"Type de fichier non autorisé: {content_type}. Utilisez JPG, PNG, WEBP ou GIF."
             )
+        content_types.append(content_type)
     
     # Check if Supabase is configured
     if not db.supabase:
@@ -279,57 +492,8 @@ async def wizard_step3_post(
         return RedirectResponse(url=f"/deposer/step4?listing_id={listing_id}", status_code=303)
     
     try:
-        # Delete existing media for this listing
-        existing_media = db.get_listing_media(listing_id)
-        for media_item in existing_media:
-            # Extract storage path and delete from storage
-            storage_path = storage.extract_storage_path(media_item["url"], config.SUPABASE_STORAGE_BUCKET)
-            if storage_path:
-                storage.delete_file(db.supabase, config.SUPABASE_STORAGE_BUCKET, storage_path)
-        
-        # Delete media records from database
-        db.delete_listing_media(listing_id)
-        
-        # Upload new photos
-        uploaded_count = 0
-        for idx, photo in enumerate(photos):
-            # Read file content
-            file_content = await photo.read()
-            
-            # Generate unique filename
-            filename = storage.generate_filename(listing_id, photo.filename)
-            
-            # Get content type
-            content_type = storage.get_content_type(photo.filename)
-            
-            # Upload to Supabase Storage
-            public_url = storage.upload_file(
-                db.supabase,
-                config.SUPABASE_STORAGE_BUCKET,
-                filename,
-                file_content,
-                content_type
-            )
-            
-            if public_url:
-                # Save media record to database
-                db.add_media(
-                    listing_id=listing_id,
-                    media_type="photo",
-                    url=public_url,
-                    filename=photo.filename,
-                    display_order=idx
-                )
-                uploaded_count += 1
-            else:
-                # Upload failed
-                logger.error(f"Failed to upload photo: {photo.filename}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Échec du téléchargement de la photo: {photo.filename}"
-                )
-        
-        logger.info(f"Successfully uploaded {uploaded_count} photos for listing {listing_id}")
+        await replace_draft_photos(draft, photos, content_types)
+        logger.info(f"Successfully uploaded {len(photos)} photos for listing {listing_id}")
         
     except HTTPException:
         raise
@@ -340,13 +504,15 @@ async def wizard_step3_post(
             detail="Erreur lors du téléchargement des photos. Veuillez réessayer."
         )
     
-    return RedirectResponse(url=f"/deposer/step4?listing_id={listing_id}", status_code=303)
+    response = RedirectResponse(url=f"/deposer/step4?listing_id={listing_id}", status_code=303)
+    drafts.save(response, draft)
+    return response
 
 
 @app.get("/deposer/step4", response_class=HTMLResponse)
-def wizard_step4(request: Request, listing_id: str):
+def wizard_step4(request: Request, listing_id: Optional[str] = None):
     """Wizard step 4: Price & Location"""
-    draft = db.get_listing(listing_id)
+    draft = drafts.load(request, listing_id)
     if not draft:
         return RedirectResponse(url="/deposer/step1", status_code=302)
     
@@ -369,6 +535,10 @@ async def wizard_step4_post(
     location: str = Form(...),
 ):
     """Save step 4 and redirect to step 5"""
+    draft = drafts.load(request, listing_id)
+    if not draft:
+        return RedirectResponse(url="/deposer/step1", status_code=303)
+    
     if price_type == "quote":
         price_amount_cents = None
         price_display = "Sur devis"
@@ -382,21 +552,21 @@ async def wizard_step4_post(
             price_amount_cents = None
             price_display = "Prix non défini"
     
-    updates = {
+    draft.update({
         "price_amount": price_amount_cents,
         "price_display": price_display,
         "location": location,
-    }
+    })
     
-    db.update_listing(listing_id, updates)
-    
-    return RedirectResponse(url=f"/deposer/step5?listing_id={listing_id}", status_code=303)
+    response = RedirectResponse(url=f"/deposer/step5?listing_id={listing_id}", status_code=303)
+    drafts.save(response, draft)
+    return response
 
 
 @app.get("/deposer/step5", response_class=HTMLResponse)
-def wizard_step5(request: Request, listing_id: str):
+def wizard_step5(request: Request, listing_id: Optional[str] = None):
     """Wizard step 5: Contact & Recap"""
-    draft = db.get_listing(listing_id)
+    draft = drafts.load(request, listing_id)
     if not draft:
         return RedirectResponse(url="/deposer/step1", status_code=302)
     
@@ -419,11 +589,13 @@ async def wizard_step5_post(
     contact_phone: str = Form(...),
     consent_public_contact: Optional[str] = Form(None),
 ):
-    """Save step 5 and create Stripe checkout session"""
+    """Save the listing and create Stripe checkout session"""
+    draft = drafts.load(request, listing_id)
+    if not draft:
+        return RedirectResponse(url="/deposer/step1", status_code=303)
     
     # GDPR consent validation
     if not consent_public_contact:
-        draft = db.get_listing(listing_id)
         return templates.TemplateResponse(
             "wizard_step5.html",
             {
@@ -435,24 +607,36 @@ async def wizard_step5_post(
             }
         )
     
-    updates = {
+    # The draft cookie outlives checkout (in case the payment is cancelled): once
+    # paid for, a resubmitted step 5 must not overwrite the listing or charge again
+    if await db.to_thread(db.has_completed_payment, listing_id):
+        response = RedirectResponse(url=f"/annonces/{listing_id}", status_code=303)
+        drafts.clear(response)
+        return response
+    
+    draft.update({
         "contact_email": contact_email,
         "contact_phone": contact_phone,
-    }
+    })
     
-    draft = db.update_listing(listing_id, updates)
+    # First database write of the wizard: the listing and its photos
+    await db.to_thread(save_draft_listing, draft)
     
     # Update or create user with email
-    user = db.get_or_create_user(contact_email, contact_phone)
+    user = await db.to_thread(db.get_or_create_user, contact_email, contact_phone)
     
     # Create Stripe Checkout Session
     if not config.STRIPE_SECRET_KEY:
         # Mock mode - just publish immediately
-        db.publish_listing(listing_id)
-        return RedirectResponse(url=f"/payment/success?session_id=mock&listing_id={listing_id}", status_code=303)
+        await db.to_thread(db.publish_listing, listing_id)
+        response = RedirectResponse(url=f"/payment/success?session_id=mock&listing_id={listing_id}", status_code=303)
+        drafts.clear(response)
+        return response
     
     try:
-        checkout_session = stripe.checkout.Session.create(
+        # Stripe's client is blocking too, so it runs off the event loop as well
+        checkout_session = await asyncio.to_thread(
+            clients.create_checkout_session,
             payment_method_types=["card"],
             line_items=[{
                 "price_data": {
@@ -475,14 +659,18 @@ async def wizard_step5_post(
         )
         
         # Create payment record
-        db.create_payment(
+        await db.to_thread(
+            db.create_payment,
             listing_id=listing_id,
             user_id=user["id"],
             amount=config.LISTING_PRICE_AMOUNT,
             stripe_session_id=checkout_session.id
         )
         
-        return RedirectResponse(url=checkout_session.url, status_code=303)
+        # Keep the draft in case the payment is cancelled
+        response = RedirectResponse(url=checkout_session.url, status_code=303)
+        drafts.save(response, draft)
+        return response
     
     except Exception as e:
         logger.error(f"Stripe error: {e}")
@@ -512,10 +700,13 @@ def payment_success(request: Request, session_id: str, listing_id: Optional[str]
         # Publish listing
         db.publish_listing(listing_id)
     
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "payment_success.html",
         {"request": request, "listing_id": listing_id},
     )
+    # The listing is paid for: the next wizard run starts a new draft
+    drafts.clear(response)
+    return response
 
 
 @app.get("/payment/cancel", response_class=HTMLResponse)
@@ -536,6 +727,7 @@ async def stripe_webhook(request: Request):
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
     
+    stripe = clients.get_stripe()
     try:
         event = stripe.Webhook.construct_event(
             payload, sig_header, config.STRIPE_WEBHOOK_SECRET
@@ -545,22 +737,10 @@ async def stripe_webhook(request: Request):
     except stripe.error.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid signature")
     
-    # Handle the event
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
-        
-        # Get payment
-        payment = db.get_payment_by_session(session["id"])
-        if payment:
-            # Update payment status
-            db.update_payment_status(
-                session["id"],
-                "completed",
-                session.get("payment_intent")
-            )
-            
-            # Publish listing
-            db.publish_listing(payment["listing_id"])
+    # Acknowledge right away: the event is processed by the background worker
+    queued = await db.to_thread(webhooks.enqueue, json.loads(payload))
+    if not queued:
+        return {"status": "duplicate"}
     
     return {"status": "success"}
 
@@ -601,15 +781,15 @@ async def contact_post(
         # Sauvegarder dans la base de données (optionnel mais recommandé)
         # TODO: Ajouter une table 'contact_messages' si nécessaire
         
-        # Envoyer un email via SMTP
-        logger.info("📧 Attempting to send contact email...")
-        from . import email as email_module
-        email_sent = await email_module.send_contact_email(name, email, phone, company, subject, reference, message)
+        # Mettre l'email en file d'attente : il est envoyé en arrière-plan via SMTP
+        email_queued = await db.to_thread(
+            email_module.queue_contact_email, name, email, phone, company, subject, reference, message
+        )
         
-        if email_sent:
+        if email_queued:
             logger.info(f"✅ Contact form processed successfully for {email}")
         else:
-            logger.warning(f"⚠️  Email not sent for contact form from {email} - SMTP may not be configured or failed")
+            logger.warning(f"⚠️  Email not queued for contact form from {email} - check OUTBOX_DIR")
         
         # Rediriger avec message de succès
         return templates.TemplateResponse(
@@ -691,7 +871,8 @@ async def signaler_post(
             pass
     
     # Save report to database
-    report = db.create_report(
+    report = await db.to_thread(
+        db.create_report,
         listing_url=listing_url,
         reason=reason,
         description=description,
@@ -717,16 +898,11 @@ async def admin_reports(request: Request, status: Optional[str] = None):
     # TODO: Add authentication for admin access
     # For now, this is accessible without auth (should be protected in production)
     
-    reports = db.get_reports(status=status, limit=100)
-    
-    # Get counts by status
-    all_reports = db.get_reports(limit=1000)
-    status_counts = {
-        "new": len([r for r in all_reports if r["status"] == "new"]),
-        "reviewed": len([r for r in all_reports if r["status"] == "reviewed"]),
-        "resolved": len([r for r in all_reports if r["status"] == "resolved"]),
-        "total": len(all_reports)
-    }
+    # Fetch the filtered list and the per-status counts concurrently
+    reports, status_counts = await asyncio.gather(
+        db.to_thread(db.get_reports, status=status, limit=100),
+        db.to_thread(db.get_report_status_counts),
+    )
     
     return templates.TemplateResponse(
         "admin_reports.html",
@@ -744,5 +920,41 @@ async def update_report_status(report_id: str, status: str = Form(...)):
     """Update report status"""
     # TODO: Add authentication for admin access
     
-    db.update_report_status(report_id, status)
+    await db.to_thread(db.update_report_status, report_id, status)
     return RedirectResponse(url="/admin/reports", status_code=303)
+
+
+# ==================== Metrics ====================
+
+def _metrics_samples():
+    """Cache, background queue and scheduler figures, read at each scrape"""
+    samples = []
+    for cache in (db.get_cache_stats(), db.get_user_cache_stats(), fragments.card_cache.stats()):
+        labels = {"cache": cache["name"]}
+        samples.append(("app_cache_hits_total", "counter", "Cache hits", labels, cache["hits"]))
+        samples.append(("app_cache_misses_total", "counter", "Cache misses", labels, cache["misses"]))
+        samples.append(("app_cache_size", "gauge", "Entries in the cache", labels, cache["size"]))
+    for queue in (webhooks.worker.stats(), email_module.contact_outbox.stats()):
+        labels = {"queue": queue["name"]}
+        samples.append(("app_queue_items", "gauge", "Items waiting in a background queue", labels, queue["queued"]))
+        samples.append(("app_queue_processed_total", "counter", "Items processed by a background queue", labels, queue["processed"]))
+        samples.append(("app_queue_retried_total", "counter", "Retries scheduled by a background queue", labels, queue["retried"]))
+        samples.append(("app_queue_failed_total", "counter", "Items given up by a background queue", labels, queue["failed"]))
+    for name, job in scheduler.scheduler.stats()["jobs"].items():
+        labels = {"job": name}
+        samples.append(("app_scheduler_runs_total", "counter", "Scheduled job runs", labels, job["runs"]))
+        samples.append(("app_scheduler_errors_total", "counter", "Scheduled job runs that raised", labels, job["errors"]))
+        samples.append(("app_scheduler_items_total", "counter", "Items handled by a scheduled job", labels, job["total"]))
+    return samples
+
+
+metrics.register_collector(_metrics_samples)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    """Prometheus metrics (bearer token required when METRICS_TOKEN is set)"""
+    authorization = request.headers.get("authorization", "")
+    if config.METRICS_TOKEN and not secrets.compare_digest(authorization, f"Bearer {config.METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,248 @@
+"""
+Per-request timings and process-wide metrics
+
+Calls to the database, Storage, Stripe and SMTP, and template rendering, are
+timed with record()/timed(). Each measurement is added to the current
+request's RequestTimings (a context variable, propagated to the db thread pool
+by db.to_thread) and to process-wide histograms. MetricsMiddleware turns the
+request timings into a Server-Timing header and observes per-route latency;
+render() formats everything in the Prometheus text format for /metrics.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import jinja2
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Latency buckets in seconds (Prometheus client defaults)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Round-trips to a dependency within one request
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+# Dependencies reported in Server-Timing, in this order
+SERVICES = ("db", "storage", "stripe", "smtp", "render")
+
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram with one series per label set"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> (cumulative bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, (bucket_counts, total, count) in series:
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels)]
+            bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+            for bound, bucket_count in zip(bounds, bucket_counts + [count]):
+                bucket_labels = ",".join(pairs + ['le="%s"' % bound])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {bucket_count}")
+            label_text = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}_sum{label_text} {total:.6f}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Time to the first response byte, by route",
+    ("method", "route", "status"), DURATION_BUCKETS,
+)
+dependency_duration = Histogram(
+    "dependency_call_duration_seconds", "Duration of each call to a dependency or template render",
+    ("service",), DURATION_BUCKETS,
+)
+request_dependency_time = Histogram(
+    "http_request_dependency_seconds", "Time spent in a dependency per request, by route",
+    ("route", "service"), DURATION_BUCKETS,
+)
+request_round_trips = Histogram(
+    "http_request_round_trips", "Calls to a dependency per request, by route",
+    ("route", "service"), COUNT_BUCKETS,
+)
+HISTOGRAMS = (request_duration, request_dependency_time, request_round_trips, dependency_duration)
+
+
+class RequestTimings:
+    """Time spent and number of calls per service during one request"""
+
+    def __init__(self) -> None:
+        self.calls: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, service: str, seconds: float) -> None:
+        with self._lock:
+            self.calls[service] = self.calls.get(service, 0) + 1
+            self.seconds[service] = self.seconds.get(service, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        """Server-Timing header value (durations in milliseconds)"""
+        with self._lock:
+            entries = [
+                f'{service};dur={self.seconds[service] * 1000:.1f};desc="{self.calls[service]} call(s)"'
+                for service in SERVICES if service in self.calls
+            ]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def record(service: str, seconds: float) -> None:
+    """Record one call to a service, for the current request and process-wide"""
+    dependency_duration.observe(seconds, service)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(service, seconds)
+
+
+@contextmanager
+def timed(service: str) -> Iterator[None]:
+    """Time the enclosed block as one call to a service"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(service, time.perf_counter() - start)
+
+
+def current() -> Optional[RequestTimings]:
+    """Timings of the request being handled, if any"""
+    return _current.get()
+
+
+# ==================== Templates ====================
+
+_rendering: contextvars.ContextVar[bool] = contextvars.ContextVar("rendering", default=False)
+
+
+class TimedTemplate(jinja2.Template):
+    """Jinja template whose render() is recorded as "render" (nested renders count in the outer one)"""
+
+    def render(self, *args: Any, **kwargs: Any) -> str:
+        if _rendering.get():
+            return super().render(*args, **kwargs)
+        token = _rendering.set(True)
+        try:
+            with timed("render"):
+                return super().render(*args, **kwargs)
+        finally:
+            _rendering.reset(token)
+
+
+# ==================== Middleware ====================
+
+class MetricsMiddleware:
+    """
+    Time every HTTP request, add a Server-Timing header and feed the route histograms
+
+    Routes are labelled by their path template ("/annonces/{listing_id}"), so
+    the number of series stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - start
+                self._observe(scope, status, elapsed, timings)
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", timings.server_timing(elapsed))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception:
+            self._observe(scope, status, time.perf_counter() - start, timings)
+            raise
+        finally:
+            _current.reset(token)
+
+    @staticmethod
+    def _observe(scope: Scope, status: int, elapsed: float, timings: RequestTimings) -> None:
+        route = scope.get("route")
+        route_label = getattr(route, "path", None) or "unmatched"
+        request_duration.observe(elapsed, scope["method"], route_label, str(status))
+        for service in SERVICES:
+            request_round_trips.observe(timings.calls.get(service, 0), route_label, service)
+            if service in timings.seconds:
+                request_dependency_time.observe(timings.seconds[service], route_label, service)
+
+
+# ==================== Exposition ====================
+
+# A sample read at scrape time: (name, type, help, labels, value), type being
+# "gauge" or "counter" (monotonic; by convention its name ends in _total)
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+_collectors: List[Callable[[], List[Sample]]] = []
+
+
+def register_collector(collect: Callable[[], List[Sample]]) -> None:
+    """Add a callback returning (name, type, help, labels, value) samples, read at each scrape"""
+    _collectors.append(collect)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.samples())
+
+    # Samples of one metric must be contiguous, whichever callback produced them
+    families: Dict[str, Tuple[str, str, List[str]]] = {}
+    for collect in _collectors:
+        for name, metric_type, help_text, labels, value in collect():
+            label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            sample = f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}"
+            families.setdefault(name, (metric_type, help_text, []))[2].append(sample)
+    for name, (metric_type, help_text, samples) in families.items():
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", *samples])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,200 @@
+"""
+Persistent outbox for outgoing messages
+
+Messages are written to a spool directory (one JSON file each) and delivered by
+a background worker, so the request that produced them never waits on the mail
+server. A delivery pass sends every spooled message over the same connection;
+failed passes are retried with exponential backoff. Files are only removed once
+delivered, so unsent messages survive a restart and are picked up by start().
+
+The spool directory is shared by the worker processes of the app: each file is
+claimed by renaming it to *.sending before it is sent, so only the process whose
+rename succeeded delivers it. Claims left by a process that died mid-send are
+returned to the spool by start() once older than claim_timeout.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from .worker import BackgroundWorker
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class UndeliverableMessage(Exception):
+    """Raised by a deliver function when retrying a message can never succeed"""
+
+
+class Outbox:
+    """
+    A spool directory of pending messages and the worker delivering them
+
+    Args:
+        directory: Spool directory (created if missing); rejected messages go to its failed/ subdirectory
+        deliver: Called with each message's data; raising retries the pass later,
+            raising UndeliverableMessage sets the message aside instead
+        name: Worker thread name, used in logs
+        max_attempts: Delivery passes attempted before waiting for the next message or restart
+        backoff_base: Delay before the first retried pass, in seconds
+        claim_timeout: Age in seconds after which a claimed (*.sending) file is considered abandoned
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        deliver: Callable[[Dict[str, Any]], None],
+        name: str = "outbox",
+        max_attempts: int = 5,
+        backoff_base: float = 5.0,
+        claim_timeout: float = 600.0,
+    ):
+        self.directory = directory
+        self.failed_directory = os.path.join(directory, "failed")
+        self.deliver = deliver
+        self.claim_timeout = claim_timeout
+        self.sent = 0
+        self.rejected = 0
+        self._scheduled = False
+        self._lock = threading.Lock()
+        self.worker = BackgroundWorker(
+            name,
+            self._flush,
+            max_attempts=max_attempts,
+            backoff_base=backoff_base,
+            on_give_up=self._give_up,
+        )
+
+    def enqueue(self, data: Dict[str, Any]) -> str:
+        """Spool a message and schedule its delivery; returns the spool file path"""
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.json"
+        path = os.path.join(self.directory, name)
+        tmp_path = os.path.join(self.directory, f".{name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        # Atomic: the worker never sees a partially written message
+        os.replace(tmp_path, path)
+
+        self._schedule()
+        return path
+
+    def pending(self) -> List[str]:
+        """Spool files waiting for delivery, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, n) for n in sorted(names) if n.endswith(".json")]
+
+    def start(self) -> int:
+        """Start the worker and schedule delivery of messages left by a previous run"""
+        self.worker.start()
+        self._release_abandoned_claims()
+        count = len(self.pending())
+        if count:
+            logger.info(f"{self.worker.name}: {count} unsent messages found in {self.directory}")
+            self._schedule()
+        return count
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the worker; unsent messages stay spooled for the next start"""
+        self.worker.stop(timeout)
+        with self._lock:
+            self._scheduled = False
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """Wait for the current delivery pass to finish (for tests and shutdown)"""
+        return self.worker.drain(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        return {
+            **self.worker.stats(),
+            "pending": len(self.pending()),
+            "sent": self.sent,
+            "rejected": self.rejected,
+        }
+
+    def _schedule(self) -> None:
+        # At most one pass is queued at a time: messages spooled meanwhile join it
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.worker.submit(None)
+
+    def _flush(self, _item: Optional[Any] = None) -> None:
+        while True:
+            batch = self.pending()
+            if not batch:
+                with self._lock:
+                    # Re-checked under the lock so a message spooled right now isn't missed
+                    if not self.pending():
+                        self._scheduled = False
+                        return
+                continue
+
+            delivered = sum(self._deliver_file(path) for path in batch)
+            if delivered:
+                logger.info(f"{self.worker.name}: delivered {delivered} message(s)")
+
+    def _deliver_file(self, path: str) -> bool:
+        # Claim the file first: rename() is atomic, so of several processes
+        # flushing the same spool only one sends it
+        claimed = path + ".sending"
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return False
+        # The claim's age, for _release_abandoned_claims()
+        os.utime(claimed)
+
+        try:
+            with open(claimed, encoding="utf-8") as f:
+                data = json.load(f)
+            self.deliver(data)
+        except (UndeliverableMessage, json.JSONDecodeError) as e:
+            logger.error(f"{self.worker.name}: setting aside undeliverable message {os.path.basename(path)}: {e}")
+            os.makedirs(self.failed_directory, exist_ok=True)
+            os.replace(claimed, os.path.join(self.failed_directory, os.path.basename(path)))
+            self.rejected += 1
+            return False
+        except Exception:
+            # Back to the spool for the retried pass (here or in another process)
+            os.replace(claimed, path)
+            raise
+
+        os.remove(claimed)
+        self.sent += 1
+        return True
+
+    def _release_abandoned_claims(self) -> None:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith(".json.sending"):
+                continue
+            claimed = os.path.join(self.directory, name)
+            try:
+                if time.time() - os.path.getmtime(claimed) < self.claim_timeout:
+                    continue
+                os.rename(claimed, claimed[:-len(".sending")])
+            except FileNotFoundError:
+                # Delivered or released by another process meanwhile
+                continue
+            logger.warning(f"{self.worker.name}: requeued {name[:-len('.sending')]}, abandoned while sending")
+
+    def _give_up(self, _item: Any, error: Exception) -> None:
+        # Messages stay spooled: the next enqueue() or start() schedules a new pass
+        with self._lock:
+            self._scheduled = False
+        logger.error(f"{self.worker.name}: delivery postponed, {len(self.pending())} messages kept in {self.directory}")
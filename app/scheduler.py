@@ -0,0 +1,179 @@
+"""
+In-process scheduler for periodic maintenance jobs
+
+Jobs run on a daemon thread at fixed intervals. When the app is served by
+several worker processes, only the one holding an exclusive lock on
+SCHEDULER_LOCK_FILE runs them; if that process exits, the lock is released by
+the OS and another worker takes over at its next tick.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from . import config
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    """A periodic job and the metrics of its runs"""
+    name: str
+    interval: float
+    func: Callable[[], Any]
+    next_run: float = 0.0
+    runs: int = 0
+    errors: int = 0
+    # Sum of the numeric results (e.g. rows touched) over all runs
+    total: int = 0
+    last_result: Any = None
+    last_error: Optional[str] = None
+    last_run_at: Optional[float] = None
+    last_duration_ms: Optional[float] = None
+    history: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class Scheduler:
+    """
+    Run registered jobs every `interval` seconds on a background thread
+
+    Args:
+        lock_path: File locked by the process allowed to run jobs (None: always run)
+        history_size: Number of recent runs kept per job for stats()
+    """
+
+    def __init__(self, lock_path: Optional[str] = None, history_size: int = 20):
+        self.lock_path = lock_path
+        self.history_size = history_size
+        self.jobs: Dict[str, Job] = {}
+        self._lock_file = None
+        # Serializes taking the lock: the scheduler thread and startup code (see
+        # webhooks.recover_pending) may both check leadership at once, and a second
+        # flock() on another descriptor would fail even within this process
+        self._leader_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def every(self, interval: float, name: str, func: Callable[[], Any], initial_delay: float = 0.0) -> Job:
+        """Register a job run every `interval` seconds, first after `initial_delay`"""
+        job = Job(name=name, interval=interval, func=func, next_run=time.monotonic() + initial_delay)
+        self.jobs[name] = job
+        return job
+
+    def start(self) -> None:
+        """Start the scheduler thread (no-op if it is already running)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the thread after the job in progress and release the lock"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        self._release_lock()
+
+    def is_leader(self) -> bool:
+        """Try to take (or confirm holding) the lock that allows running jobs"""
+        if self.lock_path is None or fcntl is None:
+            return True
+        with self._leader_lock:
+            return self._acquire_lock()
+
+    def _acquire_lock(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        try:
+            lock_file = open(self.lock_path, "a")
+        except OSError as e:
+            logger.warning(f"Scheduler lock file {self.lock_path} unavailable ({e}), running jobs anyway")
+            return True
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"Scheduler lock acquired by process {os.getpid()}")
+        return True
+
+    def run_job(self, name: str) -> Any:
+        """Run a job now and record its metrics (exceptions are logged, not raised)"""
+        job = self.jobs[name]
+        started = time.monotonic()
+        job.next_run = started + job.interval
+        job.last_run_at = time.time()
+        try:
+            result = job.func()
+            job.last_error = None
+        except Exception as e:
+            result = None
+            job.errors += 1
+            job.last_error = str(e)
+            logger.error(f"Scheduled job {name} failed: {e}")
+        job.runs += 1
+        job.last_duration_ms = round((time.monotonic() - started) * 1000, 1)
+        job.last_result = result
+        if isinstance(result, int):
+            job.total += result
+        job.history.append({"at": job.last_run_at, "result": result, "duration_ms": job.last_duration_ms})
+        del job.history[:-self.history_size]
+        logger.info(f"⏱️  Scheduled job {name}: result={result} in {job.last_duration_ms} ms")
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-job counters and recent runs for monitoring"""
+        return {
+            "leader": self._lock_file is not None or self.lock_path is None or fcntl is None,
+            "jobs": {
+                job.name: {
+                    "interval": job.interval,
+                    "runs": job.runs,
+                    "errors": job.errors,
+                    "total": job.total,
+                    "last_result": job.last_result,
+                    "last_error": job.last_error,
+                    "last_run_at": job.last_run_at,
+                    "last_duration_ms": job.last_duration_ms,
+                    "history": list(job.history),
+                }
+                for job in self.jobs.values()
+            },
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            now = time.monotonic()
+            due = [job for job in self.jobs.values() if job.next_run <= now]
+            if due:
+                if self.is_leader():
+                    for job in due:
+                        self.run_job(job.name)
+                else:
+                    for job in due:
+                        job.next_run = now + job.interval
+            wait = min((job.next_run for job in self.jobs.values()), default=now + 60.0) - time.monotonic()
+            self._stop.wait(max(wait, 0.05))
+
+    def _release_lock(self) -> None:
+        with self._leader_lock:
+            if self._lock_file is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                self._lock_file.close()
+                self._lock_file = None
+
+
+# Process-wide scheduler started with the app
+scheduler = Scheduler(lock_path=config.SCHEDULER_LOCK_FILE)
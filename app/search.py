@@ -0,0 +1,208 @@
+"""
+In-memory full-text search over published listings
+
+Listings are indexed on title, summary, description, manufacturer and category
+with French accent folding ("epuration" matches "Épuration"). The inverted index
+is kept up to date incrementally by the write paths in db.py and fully rebuilt
+periodically so that listings published by other workers are picked up.
+"""
+import math
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Relative importance of each indexed field in the ranking
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "category": 2.0,
+    "manufacturer": 2.0,
+    "summary": 1.5,
+    "description": 1.0,
+}
+
+# Words too common to be useful in a query (already accent-folded)
+STOPWORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "dans", "de", "des", "du", "en", "et",
+    "la", "le", "les", "l", "d", "ou", "par", "pour", "sur", "un", "une",
+}
+
+# Matches on a term prefix (search-as-you-type) count less than exact matches
+PREFIX_MATCH_FACTOR = 0.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "Œ": "oe", "Æ": "ae", "ß": "ss"})
+
+
+def fold(text: str) -> str:
+    """Lowercase text and strip accents ("Épuration" -> "epuration")"""
+    decomposed = unicodedata.normalize("NFKD", text.translate(_LIGATURES))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into accent-folded search terms, dropping stopwords"""
+    if not text:
+        return []
+    return [token for token in _TOKEN_RE.findall(fold(str(text))) if token not in STOPWORDS]
+
+
+def _is_expired(listing: Dict[str, Any], now: datetime) -> bool:
+    """Check a listing's expires_at without trusting the index to be perfectly fresh"""
+    expires_at = listing.get("expires_at")
+    if not expires_at:
+        return False
+    try:
+        expires = datetime.fromisoformat(str(expires_at).replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    if expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    return expires < now
+
+
+class SearchIndex:
+    """Thread-safe inverted index of listings: term -> {listing_id: weight}"""
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._doc_terms: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+        self._lock = threading.RLock()
+        self.built_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, listing: Dict[str, Any]) -> None:
+        """Index a published listing, replacing any previous version; other statuses are removed"""
+        listing_id = str(listing["id"])
+        if listing.get("status") != "published":
+            self.remove(listing_id)
+            return
+
+        weights: Dict[str, float] = {}
+        for field, field_weight in FIELD_WEIGHTS.items():
+            for term in tokenize(listing.get(field)):
+                weights[term] = weights.get(term, 0.0) + field_weight
+
+        with self._lock:
+            self._remove_locked(listing_id)
+            self._documents[listing_id] = dict(listing)
+            self._doc_terms[listing_id] = set(weights)
+            for term, weight in weights.items():
+                postings = self._postings.setdefault(term, {})
+                if not postings:
+                    self._vocabulary_dirty = True
+                # Dampen repeated terms so long descriptions don't dominate the ranking
+                postings[listing_id] = 1.0 + math.log(weight)
+
+    def remove(self, listing_id: str) -> None:
+        """Remove a listing from the index"""
+        with self._lock:
+            self._remove_locked(str(listing_id))
+
+    def _remove_locked(self, listing_id: str) -> None:
+        self._documents.pop(listing_id, None)
+        for term in self._doc_terms.pop(listing_id, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(listing_id, None)
+            if not postings:
+                del self._postings[term]
+                self._vocabulary_dirty = True
+
+    def rebuild(self, listings: Iterable[Dict[str, Any]]) -> None:
+        """Replace the whole index with the given listings"""
+        fresh = SearchIndex()
+        for listing in listings:
+            fresh.add(listing)
+
+        with self._lock:
+            self._postings = fresh._postings
+            self._documents = fresh._documents
+            self._doc_terms = fresh._doc_terms
+            self._vocabulary_dirty = True
+            self.built_at = time.monotonic()
+
+    def is_stale(self, max_age: float) -> bool:
+        """True if the index was never built or is older than max_age seconds"""
+        return self.built_at is None or time.monotonic() - self.built_at > max_age
+
+    def _matching_terms(self, term: str) -> List[str]:
+        """Vocabulary terms starting with the given term (the term itself first if present)"""
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+
+        matches = []
+        start = bisect_left(self._vocabulary, term)
+        for candidate in self._vocabulary[start:]:
+            if not candidate.startswith(term):
+                break
+            matches.append(candidate)
+        return matches
+
+    def search(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Return published listings matching every query term, best match first
+
+        Each term matches indexed terms exactly or by prefix; scores are summed
+        over terms using field weights and inverse document frequency. Ties are
+        broken by most recent publication.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            total = len(self._documents) or 1
+            scores: Optional[Dict[str, float]] = None
+
+            for term in terms:
+                term_scores: Dict[str, float] = {}
+                for candidate in self._matching_terms(term):
+                    postings = self._postings[candidate]
+                    idf = math.log(1 + total / len(postings))
+                    factor = 1.0 if candidate == term else PREFIX_MATCH_FACTOR
+                    for listing_id, weight in postings.items():
+                        score = weight * idf * factor
+                        if score > term_scores.get(listing_id, 0.0):
+                            term_scores[listing_id] = score
+
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        listing_id: score + term_scores[listing_id]
+                        for listing_id, score in scores.items()
+                        if listing_id in term_scores
+                    }
+                if not scores:
+                    return []
+
+            ranked = sorted(
+                scores.items(),
+                key=lambda item: (item[1], str(self._documents[item[0]].get("published_at") or "")),
+                reverse=True,
+            )
+            results = []
+            for listing_id, _score in ranked:
+                listing = self._documents[listing_id]
+                if _is_expired(listing, now):
+                    continue
+                results.append(dict(listing))
+                if len(results) >= limit:
+                    break
+            return results
+
+
+# Process-wide index of published listings
+listing_index = SearchIndex()
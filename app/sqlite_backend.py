@@ -0,0 +1,612 @@
+"""
+Local SQLite backend for app/db.py
+
+SQLiteClient implements the subset of the supabase-py client used by db.py
+(table() query builders with PostgREST-style filters and resource embedding,
+rpc() for the SQL functions of the migrations, and storage buckets), so the whole app runs
+offline with DB_BACKEND=sqlite. The schema mirrors DATABASE_SCHEMA.md and the
+migrations; photos are written to a local directory served under the same
+/storage/v1/object/public/BUCKET/PATH URLs as Supabase Storage.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+from . import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_NOW = "(strftime('%Y-%m-%dT%H:%M:%f', 'now'))"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT UNIQUE NOT NULL,
+    phone TEXT,
+    name TEXT,
+    created_at TEXT DEFAULT {_NOW},
+    updated_at TEXT DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS listings (
+    id TEXT PRIMARY KEY,
+    user_id TEXT REFERENCES users(id) ON DELETE CASCADE,
+    status TEXT NOT NULL DEFAULT 'draft',
+    published_at TEXT,
+    expires_at TEXT,
+    title TEXT NOT NULL,
+    category TEXT NOT NULL,
+    listing_type TEXT NOT NULL DEFAULT 'equipment',
+    technical_specs TEXT,
+    price_amount INTEGER,
+    price_display TEXT,
+    location TEXT NOT NULL,
+    summary TEXT,
+    description TEXT,
+    condition TEXT,
+    year TEXT,
+    manufacturer TEXT,
+    contact_email TEXT NOT NULL,
+    contact_phone TEXT NOT NULL,
+    created_at TEXT DEFAULT {_NOW},
+    updated_at TEXT DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS idx_listings_status ON listings(status);
+CREATE INDEX IF NOT EXISTS idx_listings_user_id ON listings(user_id);
+CREATE INDEX IF NOT EXISTS idx_listings_expires_at ON listings(expires_at);
+CREATE INDEX IF NOT EXISTS idx_listings_published_keyset
+    ON listings(published_at DESC, id DESC) WHERE status = 'published';
+CREATE INDEX IF NOT EXISTS idx_listings_published_category
+    ON listings(category) WHERE status = 'published';
+
+CREATE TABLE IF NOT EXISTS media (
+    id TEXT PRIMARY KEY,
+    listing_id TEXT REFERENCES listings(id) ON DELETE CASCADE,
+    media_type TEXT NOT NULL,
+    url TEXT NOT NULL,
+    filename TEXT,
+    file_size INTEGER,
+    display_order INTEGER DEFAULT 0,
+    variants TEXT NOT NULL DEFAULT '[]',
+    placeholder TEXT,
+    created_at TEXT DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS idx_media_listing_id ON media(listing_id);
+
+CREATE TABLE IF NOT EXISTS payments (
+    id TEXT PRIMARY KEY,
+    listing_id TEXT REFERENCES listings(id) ON DELETE CASCADE,
+    user_id TEXT REFERENCES users(id) ON DELETE CASCADE,
+    stripe_checkout_session_id TEXT UNIQUE,
+    stripe_payment_intent_id TEXT,
+    amount INTEGER NOT NULL,
+    currency TEXT DEFAULT 'EUR',
+    status TEXT NOT NULL DEFAULT 'pending',
+    created_at TEXT DEFAULT {_NOW},
+    updated_at TEXT DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS idx_payments_listing_id ON payments(listing_id);
+
+CREATE TABLE IF NOT EXISTS stripe_events (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    received_at TEXT DEFAULT {_NOW},
+    processed_at TEXT,
+    last_error TEXT
+);
+
+CREATE TABLE IF NOT EXISTS reports (
+    id TEXT PRIMARY KEY,
+    listing_id TEXT REFERENCES listings(id) ON DELETE SET NULL,
+    listing_url TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    description TEXT NOT NULL,
+    reporter_email TEXT,
+    status TEXT NOT NULL DEFAULT 'new',
+    created_at TEXT DEFAULT {_NOW},
+    updated_at TEXT DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS idx_reports_status ON reports(status);
+CREATE INDEX IF NOT EXISTS idx_reports_created_at ON reports(created_at);
+"""
+
+# Columns stored as JSON text (JSONB in Postgres)
+JSON_COLUMNS = {
+    "listings": {"technical_specs"},
+    "media": {"variants"},
+    "stripe_events": {"payload"},
+}
+
+# Tables whose UUID primary key is generated on insert (gen_random_uuid() in Postgres)
+GENERATED_IDS = {"users", "listings", "media", "payments", "reports"}
+
+# One-to-many relationships usable for resource embedding, select("*, media(url)"):
+# (parent table, embedded table) -> foreign key column of the embedded table
+RELATIONSHIPS = {
+    ("users", "listings"): "user_id",
+    ("listings", "media"): "listing_id",
+    ("listings", "payments"): "listing_id",
+    ("listings", "reports"): "listing_id",
+}
+
+_EMBED_RE = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*)\((.*)\)$", re.DOTALL)
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+_OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def _quote(identifier: str) -> str:
+    if not _IDENTIFIER_RE.match(identifier):
+        raise ValueError(f"Invalid column name: {identifier!r}")
+    return f'"{identifier}"'
+
+
+def _split_top_level(expression: str) -> List[str]:
+    """Split a PostgREST logic expression on the commas outside parentheses and quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _unquote(value: str) -> str:
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def _parse_logic(expression: str, joiner: str = "OR") -> Tuple[str, List[Any]]:
+    """Translate a PostgREST or=(...) filter such as `a.lt.1,and(a.eq.1,b.lt.2)` to SQL"""
+    clauses, params = [], []
+    for part in _split_top_level(expression):
+        for prefix, nested_joiner in (("and(", "AND"), ("or(", "OR")):
+            if part.startswith(prefix) and part.endswith(")"):
+                sql, nested_params = _parse_logic(part[len(prefix):-1], nested_joiner)
+                clauses.append(f"({sql})")
+                params.extend(nested_params)
+                break
+        else:
+            column, operator, value = part.split(".", 2)
+            if operator == "is":
+                clauses.append(f"{_quote(column)} IS NULL" if value == "null" else f"{_quote(column)} IS NOT NULL")
+            elif operator == "in":
+                values = [_unquote(v) for v in _split_top_level(value.strip("()"))]
+                clauses.append(f"{_quote(column)} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+            else:
+                clauses.append(f"{_quote(column)} {_OPERATORS[operator]} ?")
+                params.append(_unquote(value))
+    return f" {joiner} ".join(clauses), params
+
+
+@dataclass
+class APIResponse:
+    """Result of a query, shaped like postgrest's APIResponse"""
+    data: Any
+    count: Optional[int] = None
+
+
+class QueryBuilder:
+    """A PostgREST-style query on one table, run by execute()"""
+
+    def __init__(self, client: "SQLiteClient", table: str):
+        self.client = client
+        self.table = table
+        self._method = "select"
+        self._columns = "*"
+        self._count: Optional[str] = None
+        self._head = False
+        self._payload: List[Dict[str, Any]] = []
+        self._on_conflict = ""
+        self._ignore_duplicates = False
+        self._where: List[Tuple[str, List[Any]]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+        # Embedded resources: table -> query on it, run per parent row
+        self._embeds: Dict[str, "QueryBuilder"] = {}
+
+    # ---- Operations ----
+
+    def select(self, *columns: str, count: Optional[str] = None, head: bool = False) -> "QueryBuilder":
+        self._method = "select"
+        self._count = count
+        self._head = head
+        plain = []
+        for column in _split_top_level(",".join(columns) or "*"):
+            embed = _EMBED_RE.match(column)
+            if embed:
+                name, embedded_columns = embed.groups()
+                if (self.table, name) not in RELATIONSHIPS:
+                    raise ValueError(f"No relationship between {self.table} and {name}")
+                self._embeds[name] = QueryBuilder(self.client, name).select(embedded_columns)
+            else:
+                plain.append(column)
+        self._columns = ",".join(plain) or "*"
+        return self
+
+    def _embedded(self, table: Optional[str]) -> "QueryBuilder":
+        if not table:
+            return self
+        if table not in self._embeds:
+            raise ValueError(f"{table} is not embedded in this query")
+        return self._embeds[table]
+
+    def _target(self, column: str) -> Tuple["QueryBuilder", str]:
+        """Query a filter applies to: "media.media_type" filters the embedded media rows"""
+        table, _, name = column.rpartition(".")
+        return self._embedded(table), name
+
+    def insert(self, json: Union[Dict[str, Any], List[Dict[str, Any]]], **_options: Any) -> "QueryBuilder":
+        self._method = "insert"
+        self._payload = json if isinstance(json, list) else [json]
+        return self
+
+    def upsert(
+        self,
+        json: Union[Dict[str, Any], List[Dict[str, Any]]],
+        on_conflict: str = "",
+        ignore_duplicates: bool = False,
+        **_options: Any,
+    ) -> "QueryBuilder":
+        self.insert(json)
+        self._method = "upsert"
+        self._on_conflict = on_conflict or "id"
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json: Dict[str, Any], **_options: Any) -> "QueryBuilder":
+        self._method = "update"
+        self._payload = [json]
+        return self
+
+    def delete(self, **_options: Any) -> "QueryBuilder":
+        self._method = "delete"
+        return self
+
+    # ---- Filters ----
+
+    def _compare(self, column: str, operator: str, value: Any) -> "QueryBuilder":
+        query, column = self._target(column)
+        query._where.append((f"{_quote(column)} {_OPERATORS[operator]} ?", [query._encode(column, value)]))
+        return self
+
+    def eq(self, column: str, value: Any) -> "QueryBuilder":
+        return self._compare(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "QueryBuilder":
+        return self._compare(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "QueryBuilder":
+        return self._compare(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "QueryBuilder":
+        return self._compare(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "QueryBuilder":
+        return self._compare(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "QueryBuilder":
+        return self._compare(column, "lte", value)
+
+    def in_(self, column: str, values: List[Any]) -> "QueryBuilder":
+        query, column = self._target(column)
+        values = list(values)
+        if not values:
+            query._where.append(("0", []))
+        else:
+            query._where.append((f"{_quote(column)} IN ({', '.join('?' for _ in values)})", values))
+        return self
+
+    def is_(self, column: str, value: Optional[str]) -> "QueryBuilder":
+        query, column = self._target(column)
+        if value in (None, "null"):
+            query._where.append((f"{_quote(column)} IS NULL", []))
+        else:
+            query._where.append((f"{_quote(column)} IS ?", [{"true": 1, "false": 0}.get(str(value).lower(), value)]))
+        return self
+
+    def or_(self, filters: str) -> "QueryBuilder":
+        sql, params = _parse_logic(filters)
+        self._where.append((f"({sql})", params))
+        return self
+
+    # ---- Modifiers ----
+
+    def order(
+        self,
+        column: str,
+        desc: bool = False,
+        nullsfirst: Optional[bool] = None,
+        foreign_table: Optional[str] = None,
+    ) -> "QueryBuilder":
+        query = self._embedded(foreign_table)
+        # Postgres puts NULLs last in ascending order and first in descending order
+        nulls_first = desc if nullsfirst is None else nullsfirst
+        direction = "DESC" if desc else "ASC"
+        query._order.append(f"{_quote(column)} {direction} NULLS {'FIRST' if nulls_first else 'LAST'}")
+        return self
+
+    def limit(self, size: int, foreign_table: Optional[str] = None) -> "QueryBuilder":
+        self._embedded(foreign_table)._limit = size
+        return self
+
+    def offset(self, size: int) -> "QueryBuilder":
+        self._offset = size
+        return self
+
+    def range(self, start: int, end: int) -> "QueryBuilder":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    # ---- Execution ----
+
+    def _encode(self, column: str, value: Any) -> Any:
+        if column in JSON_COLUMNS.get(self.table, ()) and value is not None:
+            return json.dumps(value)
+        if isinstance(value, bool):
+            return int(value)
+        return value
+
+    def _decode(self, row: sqlite3.Row) -> Dict[str, Any]:
+        data = dict(row)
+        for column in JSON_COLUMNS.get(self.table, ()):
+            if isinstance(data.get(column), str):
+                data[column] = json.loads(data[column])
+        return data
+
+    def _where_sql(self, extra: Tuple[Tuple[str, List[Any]], ...] = ()) -> Tuple[str, List[Any]]:
+        clauses = [*self._where, *extra]
+        if not clauses:
+            return "", []
+        params: List[Any] = []
+        for _, clause_params in clauses:
+            params.extend(clause_params)
+        return " WHERE " + " AND ".join(sql for sql, _ in clauses), params
+
+    def _modifiers_sql(self) -> str:
+        sql = ""
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None or self._offset is not None:
+            sql += f" LIMIT {int(self._limit if self._limit is not None else -1)} OFFSET {int(self._offset or 0)}"
+        return sql
+
+    def _column_names(self) -> List[str]:
+        return [column.strip() for column in self._columns.split(",") if column.strip()]
+
+    def _select_columns(self) -> str:
+        columns = self._column_names()
+        if "*" in columns:
+            return "*"
+        # Embedding joins on the parent's id, even when it is not selected
+        if self._embeds and "id" not in columns:
+            columns.append("id")
+        return ", ".join(_quote(column) for column in columns)
+
+    def _embed(self, connection: sqlite3.Connection, rows: List[Dict[str, Any]]) -> None:
+        """Attach the embedded rows of each parent row, like PostgREST's resource embedding"""
+        for name, query in self._embeds.items():
+            foreign_key = _quote(RELATIONSHIPS[(self.table, name)])
+            for row in rows:
+                where, params = query._where_sql(((f"{foreign_key} = ?", [row["id"]]),))
+                sql = f'SELECT {query._select_columns()} FROM "{name}"{where}{query._modifiers_sql()}'
+                row[name] = [query._decode(child) for child in connection.execute(sql, params).fetchall()]
+        if "*" not in self._column_names() and "id" not in self._column_names():
+            for row in rows:
+                row.pop("id", None)
+
+    def execute(self) -> APIResponse:
+        return self.client._run(getattr(self, f"_execute_{self._method}"))
+
+    def _execute_select(self, connection: sqlite3.Connection) -> APIResponse:
+        where, params = self._where_sql()
+        count = None
+        if self._count:
+            count = connection.execute(f'SELECT COUNT(*) FROM "{self.table}"{where}', params).fetchone()[0]
+        if self._head:
+            return APIResponse(data=[], count=count)
+
+        sql = f'SELECT {self._select_columns()} FROM "{self.table}"{where}{self._modifiers_sql()}'
+        rows = [self._decode(row) for row in connection.execute(sql, params).fetchall()]
+        if self._embeds:
+            self._embed(connection, rows)
+        return APIResponse(data=rows, count=count)
+
+    def _row_values(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        if self.table in GENERATED_IDS and not row.get("id"):
+            row = {"id": str(uuid.uuid4()), **row}
+        return {column: self._encode(column, value) for column, value in row.items()}
+
+    def _execute_insert(self, connection: sqlite3.Connection) -> APIResponse:
+        inserted = []
+        for row in self._payload:
+            values = self._row_values(row)
+            columns = ", ".join(_quote(column) for column in values)
+            placeholders = ", ".join("?" for _ in values)
+            sql = f'INSERT INTO "{self.table}" ({columns}) VALUES ({placeholders})'
+            if self._method == "upsert":
+                conflict = ", ".join(_quote(c.strip()) for c in self._on_conflict.split(","))
+                if self._ignore_duplicates:
+                    sql += f" ON CONFLICT ({conflict}) DO NOTHING"
+                else:
+                    # Like PostgREST's merge-duplicates: only the given columns are updated
+                    updated = [c for c in values if c != "id"] or list(values)
+                    assignments = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in updated)
+                    sql += f" ON CONFLICT ({conflict}) DO UPDATE SET {assignments}"
+            rows = connection.execute(sql + " RETURNING *", list(values.values())).fetchall()
+            inserted.extend(self._decode(r) for r in rows)
+        return APIResponse(data=inserted)
+
+    _execute_upsert = _execute_insert
+
+    def _execute_update(self, connection: sqlite3.Connection) -> APIResponse:
+        values = {column: self._encode(column, value) for column, value in self._payload[0].items()}
+        where, params = self._where_sql()
+        assignments = ", ".join(f"{_quote(column)} = ?" for column in values)
+        sql = f'UPDATE "{self.table}" SET {assignments}{where} RETURNING *'
+        rows = connection.execute(sql, list(values.values()) + params).fetchall()
+        return APIResponse(data=[self._decode(row) for row in rows])
+
+    def _execute_delete(self, connection: sqlite3.Connection) -> APIResponse:
+        where, params = self._where_sql()
+        rows = connection.execute(f'DELETE FROM "{self.table}"{where} RETURNING *', params).fetchall()
+        return APIResponse(data=[self._decode(row) for row in rows])
+
+
+# ==================== SQL functions (rpc) ====================
+
+def _listing_catalogue_stats(connection: sqlite3.Connection, _params: Dict[str, Any]) -> Dict[str, Any]:
+    """Same figures as listing_catalogue_stats() in MIGRATION_CATALOGUE_STATS.sql"""
+    live = "FROM listings WHERE status = 'published' AND expires_at >= strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+    total = connection.execute(f"SELECT COUNT(*) {live}").fetchone()[0]
+    categories = dict(connection.execute(f"SELECT category, COUNT(*) {live} GROUP BY category").fetchall())
+    countries = {
+        location.rsplit(",", 1)[1].strip().upper()
+        for (location,) in connection.execute(f"SELECT location {live} AND instr(location, ',') > 0")
+    }
+    countries.discard("")
+    return {"total": total, "categories": categories, "countries": len(countries)}
+
+
+def _report_status_counts(connection: sqlite3.Connection, _params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Same rows as report_status_counts() in MIGRATION_REPORT_COUNTS.sql"""
+    rows = connection.execute("SELECT status, COUNT(*) AS count FROM reports GROUP BY status").fetchall()
+    return [dict(row) for row in rows]
+
+
+FUNCTIONS: Dict[str, Callable[[sqlite3.Connection, Dict[str, Any]], Any]] = {
+    "listing_catalogue_stats": _listing_catalogue_stats,
+    "report_status_counts": _report_status_counts,
+}
+
+
+class RPCBuilder:
+    """A call to one of FUNCTIONS, run by execute()"""
+
+    def __init__(self, client: "SQLiteClient", name: str, params: Optional[Dict[str, Any]]):
+        if name not in FUNCTIONS:
+            raise ValueError(f"Unknown function: {name}")
+        self.client = client
+        self.name = name
+        self.params = params or {}
+
+    def execute(self) -> APIResponse:
+        return self.client._run(lambda connection: APIResponse(data=FUNCTIONS[self.name](connection, self.params)))
+
+
+# ==================== Storage ====================
+
+class LocalBucket:
+    """A storage bucket kept in a local directory"""
+
+    def __init__(self, root: str, name: str):
+        self.root = root
+        self.name = name
+
+    def _path(self, file_path: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, self.name, file_path))
+        if not path.startswith(os.path.join(self.root, self.name) + os.sep):
+            raise ValueError(f"Invalid storage path: {file_path!r}")
+        return path
+
+    def upload(self, path: str, file: Union[bytes, BinaryIO], file_options: Optional[Dict[str, str]] = None) -> None:
+        target = self._path(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with metrics.timed("storage"), open(target, "wb") as f:
+            if isinstance(file, bytes):
+                f.write(file)
+            else:
+                for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                    f.write(chunk)
+
+    def download(self, path: str) -> bytes:
+        with metrics.timed("storage"), open(self._path(path), "rb") as f:
+            return f.read()
+
+    def get_public_url(self, path: str) -> str:
+        return f"/storage/v1/object/public/{self.name}/{path}"
+
+    def remove(self, paths: List[str]) -> None:
+        with metrics.timed("storage"):
+            self._remove(paths)
+
+    def _remove(self, paths: List[str]) -> None:
+        for path in paths:
+            try:
+                os.remove(self._path(path))
+            except FileNotFoundError:
+                pass
+
+
+class LocalStorage:
+    """Local replacement for supabase.storage"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def from_(self, bucket_name: str) -> LocalBucket:
+        return LocalBucket(self.root, bucket_name)
+
+
+# ==================== Client ====================
+
+class SQLiteClient:
+    """
+    Drop-in replacement for the Supabase client backed by a SQLite file
+
+    Args:
+        path: Database file (":memory:" for a throwaway database)
+        storage_dir: Directory holding the storage buckets
+    """
+
+    def __init__(self, path: str, storage_dir: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.storage = LocalStorage(storage_dir)
+        # One autocommit connection shared by the db thread pool, serialized by a lock
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute("PRAGMA foreign_keys = ON")
+            self._connection.execute("PRAGMA busy_timeout = 5000")
+            self._connection.executescript(SCHEMA)
+        logger.info(f"Using local SQLite database {path}")
+
+    def table(self, name: str) -> QueryBuilder:
+        return QueryBuilder(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> RPCBuilder:
+        return RPCBuilder(self, name, params)
+
+    def _run(self, operation: Callable[[sqlite3.Connection], APIResponse]) -> APIResponse:
+        with metrics.timed("db"), self._lock:
+            return operation(self._connection)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
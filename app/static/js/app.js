@@ -1,6 +1,6 @@
 // Filter functionality for listings page
+// (keyword search is handled server-side by /annonces?q=)
 document.addEventListener('DOMContentLoaded', function() {
-  const searchInput = document.getElementById('search');
   const categorySelect = document.getElementById('category');
   const conditionSelect = document.getElementById('condition');
   const locationInput = document.getElementById('location');
@@ -12,7 +12,6 @@ document.addEventListener('DOMContentLoaded', function() {
   const cards = Array.from(listingsContainer.querySelectorAll('.card'));
 
   function filterListings() {
-    const searchTerm = searchInput ? searchInput.value.toLowerCase() : '';
     const selectedCategory = categorySelect ? categorySelect.value : '';
     const selectedCondition = conditionSelect ? conditionSelect.value : '';
     const locationTerm = locationInput ? locationInput.value.toLowerCase() : '';
@@ -20,17 +19,15 @@ document.addEventListener('DOMContentLoaded', function() {
     let visibleCount = 0;
 
     cards.forEach(card => {
-      const title = card.dataset.title || '';
       const category = card.dataset.category || '';
       const condition = card.dataset.condition || '';
       const location = card.dataset.location ? card.dataset.location.toLowerCase() : '';
 
-      const matchesSearch = !searchTerm || title.includes(searchTerm);
       const matchesCategory = !selectedCategory || category === selectedCategory;
       const matchesCondition = !selectedCondition || condition === selectedCondition;
       const matchesLocation = !locationTerm || location.includes(locationTerm);
 
-      if (matchesSearch && matchesCategory && matchesCondition && matchesLocation) {
+      if (matchesCategory && matchesCondition && matchesLocation) {
         card.style.display = '';
         visibleCount++;
       } else {
@@ -51,7 +48,6 @@ document.addEventListener('DOMContentLoaded', function() {
   }
 
   // Attach event listeners
-  if (searchInput) searchInput.addEventListener('input', filterListings);
   if (categorySelect) categorySelect.addEventListener('change', filterListings);
   if (conditionSelect) conditionSelect.addEventListener('change', filterListings);
   if (locationInput) locationInput.addEventListener('input', filterListings);
@@ -1,26 +1,41 @@
 """
 Supabase Storage helper for file uploads
 """
+import io
 import os
 import uuid
+import base64
+import contextvars
 import logging
-from typing import Optional, BinaryIO
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, BinaryIO, Union, List, Dict, Any, Tuple
 from pathlib import Path
-from supabase import Client
 
 from . import config
 
+if TYPE_CHECKING:
+    from PIL import Image
+    from supabase import Client
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Threads uploading several objects at once (photo derivatives, multi-photo listings)
+_upload_executor = ThreadPoolExecutor(max_workers=config.STORAGE_UPLOAD_WORKERS, thread_name_prefix="storage")
+
 
-def generate_filename(listing_id: str, original_filename: str) -> str:
+def generate_filename(listing_id: str, original_filename: str, content_type: Optional[str] = None) -> str:
     """
     Generate a unique filename for storage
     Format: listing_id/uuid_original_extension
+    
+    When the actual content type is known (e.g. sniffed from magic bytes), the
+    extension is derived from it rather than trusted from the client filename.
     """
     # Extract file extension
-    extension = Path(original_filename).suffix.lower()
+    extension = get_extension(content_type) if content_type else ""
+    if not extension:
+        extension = Path(original_filename).suffix.lower()
     # Generate unique ID
     unique_id = str(uuid.uuid4())
     # Combine: listing_id/uuid.ext
@@ -28,10 +43,10 @@ def generate_filename(listing_id: str, original_filename: str) -> str:
 
 
 def upload_file(
-    supabase: Client,
+    supabase: "Client",
     bucket_name: str,
     file_path: str,
-    file_content: BinaryIO,
+    file_content: Union[bytes, BinaryIO],
     content_type: str = "image/jpeg"
 ) -> Optional[str]:
     """
@@ -48,15 +63,17 @@ def upload_file(
         Public URL of the uploaded file, or None on failure
     """
     try:
+        bucket = supabase.storage.from_(bucket_name)
+        
         # Upload file to storage
-        result = supabase.storage.from_(bucket_name).upload(
+        bucket.upload(
             file_path,
             file_content,
             file_options={"content-type": content_type}
         )
         
         # Get public URL
-        public_url = supabase.storage.from_(bucket_name).get_public_url(file_path)
+        public_url = bucket.get_public_url(file_path)
         
         return public_url
     
@@ -65,7 +82,7 @@ def upload_file(
         return None
 
 
-def delete_file(supabase: Client, bucket_name: str, file_path: str) -> bool:
+def delete_file(supabase: "Client", bucket_name: str, file_path: str) -> bool:
     """
     Delete a file from Supabase Storage
     
@@ -85,6 +102,28 @@ def delete_file(supabase: Client, bucket_name: str, file_path: str) -> bool:
         return False
 
 
+def delete_files(supabase: "Client", bucket_name: str, file_paths: List[str]) -> bool:
+    """
+    Delete several files from Supabase Storage in a single request
+    
+    Args:
+        supabase: Supabase client
+        bucket_name: Name of the storage bucket
+        file_paths: Paths within the bucket
+    
+    Returns:
+        True if deletion was successful (or there was nothing to delete), False otherwise
+    """
+    if not file_paths:
+        return True
+    try:
+        supabase.storage.from_(bucket_name).remove(list(file_paths))
+        return True
+    except Exception as e:
+        logger.error(f"Error deleting files from Supabase Storage: {e}")
+        return False
+
+
 def get_content_type(filename: str) -> str:
     """
     Determine content type based on file extension
@@ -101,6 +140,20 @@ def get_content_type(filename: str) -> str:
     return content_types.get(extension, "application/octet-stream")
 
 
+def get_extension(content_type: str) -> str:
+    """
+    Determine file extension based on content type (empty string if unknown)
+    """
+    extensions = {
+        "image/jpeg": ".jpg",
+        "image/png": ".png",
+        "image/gif": ".gif",
+        "image/webp": ".webp",
+        "application/pdf": ".pdf"
+    }
+    return extensions.get(content_type, "")
+
+
 def extract_storage_path(url: str, bucket_name: str) -> Optional[str]:
     """
     Extract the storage path from a Supabase public URL
@@ -120,3 +173,220 @@ def extract_storage_path(url: str, bucket_name: str) -> Optional[str]:
         return None
     except Exception:
         return None
+
+
+# ==================== Image derivatives ====================
+
+# Derivative formats: (Pillow format, file extension, MIME type)
+DERIVATIVE_FORMATS = [
+    ("WEBP", ".webp", "image/webp"),
+    ("JPEG", ".jpg", "image/jpeg"),
+]
+
+
+def derivative_path(file_path: str, width: int, extension: str) -> str:
+    """
+    Storage path of a resized derivative next to its original
+    ("listing_id/uuid.png" -> "listing_id/uuid_w640.webp")
+    """
+    stem, _ = os.path.splitext(file_path)
+    return f"{stem}_w{width}{extension}"
+
+
+def placeholder_path(file_path: str) -> str:
+    """
+    Storage path of the blurred placeholder of a photo
+    ("listing_id/uuid.png" -> "listing_id/uuid_placeholder.jpg")
+    """
+    stem, _ = os.path.splitext(file_path)
+    return f"{stem}_placeholder.jpg"
+
+
+def _encode(image: "Image.Image", image_format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=image_format == "JPEG")
+    return buffer.getvalue()
+
+
+def generate_derivatives(
+    source: BinaryIO,
+    widths: List[int],
+    quality: int = 80,
+    placeholder_width: int = 16
+) -> Tuple[List[Tuple[int, str, str, bytes]], str]:
+    """
+    Resize an image into WebP and JPEG derivatives plus a tiny blurred placeholder
+    
+    Widths larger than the original are skipped (images are never upscaled); if the
+    original is smaller than every width, one derivative is made at its own width.
+    
+    Returns:
+        ([(width, extension, content_type, data), ...], placeholder data URI)
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as opened:
+        # Let the JPEG decoder downscale while decoding, then apply EXIF rotation
+        opened.draft("RGB", (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(opened)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode == "L":
+            image = image.convert("RGB")
+    
+    targets = [width for width in sorted(set(widths)) if width < image.width] or [image.width]
+    if image.width <= max(widths) and image.width not in targets:
+        targets.append(image.width)
+    
+    derivatives = []
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+        for image_format, extension, content_type in DERIVATIVE_FORMATS:
+            derivatives.append((width, extension, content_type, _encode(resized, image_format, quality)))
+    
+    tiny_height = max(1, round(image.height * placeholder_width / image.width))
+    tiny = image.resize((placeholder_width, tiny_height), Image.BILINEAR)
+    placeholder = "data:image/jpeg;base64," + base64.b64encode(_encode(tiny, "JPEG", 40)).decode("ascii")
+    
+    return derivatives, placeholder
+
+
+def upload_derivatives(
+    supabase: "Client",
+    bucket_name: str,
+    file_path: str,
+    source: BinaryIO
+) -> Dict[str, Any]:
+    """
+    Generate and upload the derivatives of an uploaded photo
+    
+    Args:
+        supabase: Supabase client
+        bucket_name: Name of the storage bucket
+        file_path: Storage path of the original photo
+        source: Original image content (file-like object, positioned at the start)
+    
+    Returns:
+        {"variants": [{"width", "type", "url"}, ...], "placeholder": data URI}.
+        On failure both are empty and pages fall back to the original photo.
+        The placeholder is also stored (see placeholder_path()) so that
+        resolve_photo() can rebuild it from the storage path alone.
+    """
+    try:
+        derivatives, placeholder = generate_derivatives(
+            source,
+            config.IMAGE_DERIVATIVE_WIDTHS,
+            quality=config.IMAGE_DERIVATIVE_QUALITY,
+            placeholder_width=config.IMAGE_PLACEHOLDER_WIDTH,
+        )
+    except Exception as e:
+        logger.error(f"Error generating derivatives for {file_path}: {e}")
+        return {"variants": [], "placeholder": None}
+    
+    uploads = [
+        (derivative_path(file_path, width, extension), data, content_type)
+        for width, extension, content_type, data in derivatives
+    ]
+    uploads.append((placeholder_path(file_path), base64.b64decode(placeholder.partition(",")[2]), "image/jpeg"))
+    
+    def upload(item: Tuple[str, bytes, str]) -> Optional[str]:
+        return upload_file(supabase, bucket_name, *item)
+    
+    # Upload all derivatives concurrently on the shared connection pool (in the caller's context)
+    context = contextvars.copy_context()
+    urls = list(_upload_executor.map(lambda item: context.copy().run(upload, item), uploads))
+    variants = [
+        {"width": width, "type": content_type, "url": url}
+        for (width, _extension, content_type, _data), url in zip(derivatives, urls)
+        if url
+    ]
+    
+    return {"variants": variants, "placeholder": placeholder}
+
+
+def build_srcset(variants: Optional[List[Dict[str, Any]]], content_type: str) -> str:
+    """Build an HTML srcset attribute from the derivatives of one format"""
+    return ", ".join(
+        f"{variant['url']} {variant['width']}w"
+        for variant in sorted(variants or [], key=lambda variant: variant["width"])
+        if variant.get("type") == content_type
+    )
+
+
+def photo_reference(file_path: str, variants: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Compact description of a stored photo, as kept in a wizard draft cookie
+    
+    Only the storage path and the (width, type) of each derivative are kept:
+    URLs and the placeholder are rebuilt by resolve_photo(). Without variants,
+    every configured derivative is assumed (the largest possible reference, to
+    size a draft before uploading).
+    """
+    if variants is None:
+        variants = [
+            {"width": width, "type": content_type}
+            for width in config.IMAGE_DERIVATIVE_WIDTHS
+            for _format, _extension, content_type in DERIVATIVE_FORMATS
+        ]
+    return {"path": file_path, "variants": [[variant["width"], variant["type"]] for variant in variants]}
+
+
+def photo_reference_paths(reference: Dict[str, Any], bucket_name: str) -> List[str]:
+    """Storage paths of a referenced photo's original, derivatives and placeholder"""
+    if "path" not in reference:
+        # Drafts from before references stored full media rows
+        return media_storage_paths(reference, bucket_name)
+    file_path = reference["path"]
+    derivatives = [derivative_path(file_path, width, get_extension(content_type)) for width, content_type in reference["variants"]]
+    return [file_path, *derivatives, placeholder_path(file_path)]
+
+
+def photo_url(supabase: "Client", bucket_name: str, reference: Dict[str, Any]) -> str:
+    """Public URL of a referenced photo's original (computed locally, no request)"""
+    if "path" not in reference:
+        return reference.get("url")
+    return supabase.storage.from_(bucket_name).get_public_url(reference["path"])
+
+
+def resolve_photo(supabase: "Client", bucket_name: str, reference: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rebuild the media row fields of a referenced photo: {"url", "variants", "placeholder"}
+    
+    Public URLs are computed locally; the placeholder costs one small download
+    (None if it was never stored). Blocking.
+    """
+    if "path" not in reference:
+        return reference
+    bucket = supabase.storage.from_(bucket_name)
+    file_path = reference["path"]
+    try:
+        placeholder = "data:image/jpeg;base64," + base64.b64encode(bucket.download(placeholder_path(file_path))).decode("ascii")
+    except Exception as e:
+        logger.warning(f"No placeholder for {file_path}: {e}")
+        placeholder = None
+    variants = [
+        {"width": width, "type": content_type,
+         "url": bucket.get_public_url(derivative_path(file_path, width, get_extension(content_type)))}
+        for width, content_type in reference["variants"]
+    ]
+    return {"url": photo_url(supabase, bucket_name, reference), "variants": variants, "placeholder": placeholder}
+
+
+def resolve_photos(supabase: "Client", bucket_name: str, references: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """resolve_photo() for several photos, concurrently"""
+    context = contextvars.copy_context()
+    return list(_upload_executor.map(
+        lambda reference: context.copy().run(resolve_photo, supabase, bucket_name, reference),
+        references,
+    ))
+
+
+def media_storage_paths(media: Dict[str, Any], bucket_name: str) -> List[str]:
+    """Storage paths of a media row's original file and all of its derivatives"""
+    urls = [media.get("url")] + [variant.get("url") for variant in media.get("variants") or []]
+    paths = [extract_storage_path(url, bucket_name) for url in urls if url]
+    return [path for path in paths if path]
@@ -0,0 +1,124 @@
+"""
+Jinja environment of the HTML pages
+
+Templates are compiled with trim_blocks/lstrip_blocks, so block tags leave no
+blank lines behind (InlineLineBreaks keeps the line break after a block tag
+that ends a line of markup, e.g. `{% if %}checked{% endif %}` followed by
+another attribute), and WhitespaceMinifier drops the indentation of the
+template source before it is compiled: the whitespace is removed once per
+compilation instead of being sent with every page. Compiled templates are kept
+in a bytecode cache on disk, so a new worker process loads them instead of
+recompiling, and warm_up() compiles them all at startup so the first request to
+each page does not pay for it.
+"""
+import hashlib
+import logging
+import os
+import re
+from typing import Optional
+
+import jinja2
+from jinja2.ext import Extension
+from fastapi.templating import Jinja2Templates
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Trailing whitespace, blank lines and indentation around a line break
+_INDENTATION_RE = re.compile(r"[ \t]*\n\s*")
+# Block tags and comments, and a block tag closing a line (not already -%} or +%})
+_TAG_RE = re.compile(r"\{%.*?%\}|\{#.*?#\}")
+_LINE_END_BLOCK_RE = re.compile(r"(?<![-+])%\}(?=[ \t]*$)")
+# Elements whose text is rendered as written
+_PRESERVED_RE = re.compile(r"(<(pre|textarea)\b.*?</\2>)", re.IGNORECASE | re.DOTALL)
+
+
+def minify_source(source: str) -> str:
+    """
+    Collapse indentation and blank lines of a template source to single line breaks
+
+    Line breaks are kept (they are significant between inline elements and in
+    scripts relying on automatic semicolon insertion); <pre> and <textarea>
+    contents are left untouched.
+    """
+    parts = _PRESERVED_RE.split(source)
+    # split() yields [text, element, tag name, text, element, tag name, ..., text]
+    for i in range(0, len(parts), 3):
+        parts[i] = _INDENTATION_RE.sub("\n", parts[i])
+    return "".join(part for i, part in enumerate(parts) if i % 3 != 2)
+
+
+def keep_inline_line_breaks(source: str) -> str:
+    """
+    Turn off trim_blocks (`+%}`) for block tags ending a line that also holds markup
+
+    trim_blocks is meant for tags alone on their line; after an inline tag the
+    line break may be the only separator between two attributes or words.
+    """
+    lines = source.split("\n")
+    for i, line in enumerate(lines[:-1]):
+        if _LINE_END_BLOCK_RE.search(line) and _TAG_RE.sub("", line).strip():
+            lines[i] = _LINE_END_BLOCK_RE.sub("+%}", line)
+    return "\n".join(lines)
+
+
+class InlineLineBreaks(Extension):
+    """Jinja extension applying keep_inline_line_breaks() to every template at compile time"""
+
+    def preprocess(self, source: str, name: Optional[str], filename: Optional[str] = None) -> str:
+        return keep_inline_line_breaks(source)
+
+
+class WhitespaceMinifier(Extension):
+    """Jinja extension applying minify_source() to every template at compile time"""
+
+    def preprocess(self, source: str, name: Optional[str], filename: Optional[str] = None) -> str:
+        return minify_source(source)
+
+
+def create_templates(
+    directory: str,
+    cache_dir: Optional[str] = None,
+    auto_reload: bool = True,
+    minify: bool = True,
+) -> Jinja2Templates:
+    """
+    Build the page templates
+
+    Args:
+        directory: Template directory
+        cache_dir: Directory of the compiled bytecode cache (None to disable)
+        auto_reload: Check template files for changes on every render (development)
+        minify: Strip indentation at compile time
+    """
+    extensions = [InlineLineBreaks, WhitespaceMinifier] if minify else [InlineLineBreaks]
+    bytecode_cache = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Bytecode is only checked against the template source, so compile options key the cache
+        options = f"trim,lstrip,inline-breaks,minify={minify}"
+        tag = hashlib.sha1(options.encode()).hexdigest()[:8]
+        bytecode_cache = jinja2.FileSystemBytecodeCache(cache_dir, pattern=f"__jinja2_{tag}_%s.cache")
+
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(directory),
+        autoescape=True,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        auto_reload=auto_reload,
+        bytecode_cache=bytecode_cache,
+        extensions=extensions,
+    )
+    return Jinja2Templates(env=env)
+
+
+def warm_up(env: jinja2.Environment) -> int:
+    """Compile (or load from the bytecode cache) every template; returns how many were loaded"""
+    loaded = 0
+    for name in env.list_templates(extensions=["html"]):
+        try:
+            env.get_template(name)
+            loaded += 1
+        except jinja2.TemplateError as e:
+            logger.error(f"Error compiling template {name}: {e}")
+    return loaded
@@ -0,0 +1,167 @@
+"""
+Streaming, size-bounded handling of uploaded photos
+"""
+import io
+import logging
+import os
+from typing import Any, Dict, Iterable, Optional, Union
+
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import storage
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Magic bytes of the accepted image formats
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+# Number of leading bytes needed to identify every accepted format
+SNIFF_BYTES = 12
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """
+    Identify an image from its first bytes, ignoring the client-supplied content type
+
+    Returns the MIME type, or None if the data is not a JPEG, PNG, GIF or WEBP image.
+    """
+    for signature, content_type in _SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Fichier trop volumineux. Taille maximale : {max_bytes // (1024 * 1024)} Mo.",
+    )
+
+
+class UploadLimitMiddleware:
+    """
+    Reject oversize upload requests before their body is buffered
+
+    Requests to the given paths are refused with 413 straight from their
+    Content-Length header when it is too large; otherwise the body is counted as
+    it streams in and parsing is aborted as soon as the limit is crossed (this
+    also covers chunked requests without Content-Length).
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int, paths: Iterable[str]):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.paths = set(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_size:
+            logger.warning(f"Rejected upload to {scope['path']}: Content-Length {int(content_length)} bytes")
+            error = _too_large(self.max_body_size)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    logger.warning(f"Aborted upload to {scope['path']} after {received} bytes")
+                    # Re-raised as-is by FastAPI's body parsing, rendered as a 413 response
+                    raise _too_large(self.max_body_size)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def inspect_photo(photo: UploadFile, max_bytes: int) -> str:
+    """
+    Validate an uploaded photo from its size and magic bytes
+
+    Only the first bytes are read; the file stays in Starlette's spooled
+    temporary file. Returns the sniffed content type.
+    """
+    size = photo.size
+    if size is None:
+        await photo.seek(0, os.SEEK_END)
+        size = photo.file.tell()
+    if size > max_bytes:
+        raise _too_large(max_bytes)
+    if size == 0:
+        raise HTTPException(status_code=400, detail=f"Fichier vide : {photo.filename}")
+
+    await photo.seek(0)
+    header = await photo.read(SNIFF_BYTES)
+    await photo.seek(0)
+
+    content_type = sniff_image_type(header)
+    if content_type is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Le fichier {photo.filename} n'est pas une image JPG, PNG, WEBP ou GIF valide.",
+        )
+    return content_type
+
+
+def open_for_upload(photo: UploadFile, spool_threshold: int) -> Union[bytes, io.FileIO]:
+    """
+    Get the photo content in a form the Storage client can send
+
+    Small files are returned as bytes. Above the threshold the spooled file is
+    rolled to disk and a raw file handle is returned, so the upload is streamed
+    from disk in chunks instead of being loaded into memory. The caller must
+    close the returned handle. Blocking: call it off the event loop.
+    """
+    spooled = photo.file
+    spooled.seek(0)
+    if (photo.size or 0) <= spool_threshold:
+        return spooled.read()
+
+    # fileno() rolls a SpooledTemporaryFile over to disk; the dup shares its offset (0)
+    return io.FileIO(os.dup(spooled.fileno()), "rb")
+
+
+def store_photo(
+    supabase,
+    bucket_name: str,
+    file_path: str,
+    photo: UploadFile,
+    content_type: str,
+    spool_threshold: int,
+) -> Optional[Dict[str, Any]]:
+    """
+    Stream a validated photo to Supabase Storage, then upload its resized derivatives
+
+    Blocking: run it off the event loop. Returns {"url", "variants", "placeholder"}
+    for the media row, or None if the original could not be uploaded.
+    """
+    content = open_for_upload(photo, spool_threshold)
+    try:
+        public_url = storage.upload_file(supabase, bucket_name, file_path, content, content_type)
+    finally:
+        if isinstance(content, io.FileIO):
+            content.close()
+    if not public_url:
+        return None
+
+    photo.file.seek(0)
+    derivatives = storage.upload_derivatives(supabase, bucket_name, file_path, photo.file)
+    return {"url": public_url, **derivatives}
@@ -0,0 +1,116 @@
+"""
+Deduplicated, queued processing of Stripe webhook events
+
+The webhook endpoint only verifies the signature, records the event ID and
+acknowledges; the event itself is processed by a background worker with
+retries. A retried or duplicated delivery of an event already recorded is
+acknowledged without being processed again, unless every attempt at processing
+it failed: a redelivery of such an event is queued again.
+
+Events left unprocessed by a restart are re-queued at startup by a single
+worker process: the one holding the scheduler lock (see app/scheduler.py).
+"""
+import logging
+from typing import Any, Dict
+
+from . import config
+from . import db
+from .cache import TTLCache
+from .scheduler import scheduler
+from .worker import BackgroundWorker
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Recently received event IDs: answers Stripe retries without a database round-trip
+_seen_events = TTLCache(maxsize=10000, ttl=config.STRIPE_EVENT_DEDUPE_TTL, name="stripe_events")
+
+
+def handle_checkout_completed(session: Dict[str, Any]) -> None:
+    """Mark the payment as completed and publish its listing"""
+    payment = db.get_payment_by_session(session["id"])
+    if not payment:
+        logger.warning(f"No payment found for checkout session {session['id']}")
+        return
+
+    db.update_payment_status(session["id"], "completed", session.get("payment_intent"))
+    db.publish_listing(payment["listing_id"])
+
+
+HANDLERS = {
+    "checkout.session.completed": handle_checkout_completed,
+}
+
+
+def process_event(event: Dict[str, Any]) -> None:
+    """Run the handler of an event (raising makes the worker retry it)"""
+    handler = HANDLERS.get(event["type"])
+    try:
+        if handler is not None:
+            handler(event["data"]["object"])
+    except Exception as e:
+        db.mark_stripe_event_processed(event["id"], error=str(e))
+        raise
+    db.mark_stripe_event_processed(event["id"])
+    logger.info(f"✅ Processed Stripe event {event['id']} ({event['type']})")
+
+
+def _give_up(event: Dict[str, Any], error: Exception) -> None:
+    # The event stays unprocessed in stripe_events: it is queued again by a
+    # redelivery from Stripe (no longer answered from memory) or at the next startup
+    _seen_events.invalidate(event["id"])
+    logger.error(f"Stripe event {event['id']} ({event['type']}) could not be processed: {error}")
+
+
+worker = BackgroundWorker(
+    "stripe-webhooks",
+    process_event,
+    max_attempts=config.WEBHOOK_MAX_ATTEMPTS,
+    backoff_base=config.WEBHOOK_RETRY_BASE_SECONDS,
+    on_give_up=_give_up,
+)
+
+
+def enqueue(event: Dict[str, Any]) -> bool:
+    """
+    Queue a verified event for processing unless it was already received
+
+    Blocking (one database write for a new event, one more for a duplicate not
+    seen by this process). Returns True if the event was queued, False if it is
+    a duplicate. A duplicate of an event whose processing failed is queued again.
+    """
+    if _seen_events.get(event["id"]) is not None:
+        return False
+    if not db.record_stripe_event(event["id"], event["type"], event):
+        _seen_events.set(event["id"], True)
+        if not db.stripe_event_needs_retry(event["id"]):
+            logger.info(f"Ignoring duplicate Stripe event {event['id']}")
+            return False
+        logger.info(f"Re-queuing Stripe event {event['id']} redelivered after failed processing")
+        worker.submit(event)
+        return True
+
+    _seen_events.set(event["id"], True)
+    worker.submit(event)
+    return True
+
+
+def recover_pending() -> int:
+    """
+    Queue events recorded but never processed (e.g. interrupted by a restart)
+
+    Every worker process calls this at startup, but they share the
+    stripe_events table: only the scheduler's lock holder re-queues the events,
+    so each one is processed once. Returns the number of events queued.
+    """
+    if not scheduler.is_leader():
+        logger.info("Unprocessed Stripe events left to the process holding the scheduler lock")
+        return 0
+
+    pending = db.get_pending_stripe_events()
+    for row in pending:
+        _seen_events.set(row["id"], True)
+        worker.submit(row["payload"])
+    if pending:
+        logger.info(f"Re-queued {len(pending)} unprocessed Stripe events")
+    return len(pending)
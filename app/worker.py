@@ -0,0 +1,154 @@
+"""
+In-process background worker with retries and exponential backoff
+"""
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    """
+    A daemon thread processing submitted items one at a time
+
+    A failing item is retried up to max_attempts times, after
+    backoff_base * 2^(attempt - 1) seconds (capped at backoff_max, with jitter);
+    after the last attempt it is handed to on_give_up. The thread starts on the
+    first submit() if start() wasn't called.
+
+    Args:
+        name: Thread name, used in logs
+        handler: Called with each item; raising means the attempt failed
+        max_attempts: Attempts per item, the first one included
+        backoff_base: Delay before the first retry, in seconds
+        backoff_max: Upper bound of the retry delay, in seconds
+        on_give_up: Called with (item, exception) once an item ran out of attempts
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], None],
+        max_attempts: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 300.0,
+        on_give_up: Optional[Callable[[Any, Exception], None]] = None,
+    ):
+        self.name = name
+        self.handler = handler
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.on_give_up = on_give_up
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        # Heap of (due time, sequence, attempt, item)
+        self._queue: List[Tuple[float, int, int, Any]] = []
+        self._sequence = itertools.count()
+        self._busy = False
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._condition = threading.Condition()
+
+    def start(self) -> None:
+        """Start the worker thread (no-op if it is already running)"""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Finish the item in progress and stop; items still queued are dropped"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, item: Any, delay: float = 0.0, attempt: int = 1) -> None:
+        """Queue an item for processing after an optional delay"""
+        with self._condition:
+            heapq.heappush(self._queue, (time.monotonic() + delay, next(self._sequence), attempt, item))
+            self._condition.notify_all()
+        self.start()
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """Wait until every item due so far has been handled; False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._busy or (self._queue and self._queue[0][0] <= time.monotonic()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(min(remaining, 0.05))
+            return True
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._queue)
+
+    def stats(self) -> dict:
+        """Counters for monitoring"""
+        return {
+            "name": self.name,
+            "queued": len(self),
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    def _next(self) -> Optional[Tuple[int, Any]]:
+        with self._condition:
+            while not self._stopping:
+                if self._queue:
+                    wait = self._queue[0][0] - time.monotonic()
+                    if wait <= 0:
+                        _due, _seq, attempt, item = heapq.heappop(self._queue)
+                        self._busy = True
+                        return attempt, item
+                    self._condition.wait(wait)
+                else:
+                    self._condition.wait()
+            return None
+
+    def _run(self) -> None:
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            attempt, item = job
+            try:
+                self.handler(item)
+                self.processed += 1
+            except Exception as e:
+                if attempt < self.max_attempts:
+                    delay = min(self.backoff_base * 2 ** (attempt - 1), self.backoff_max)
+                    delay *= random.uniform(0.8, 1.2)
+                    logger.warning(f"{self.name}: attempt {attempt} failed ({e}), retrying in {delay:.1f}s")
+                    self.retried += 1
+                    with self._condition:
+                        heapq.heappush(
+                            self._queue, (time.monotonic() + delay, next(self._sequence), attempt + 1, item)
+                        )
+                else:
+                    logger.error(f"{self.name}: giving up after {attempt} attempts: {e}")
+                    self.failed += 1
+                    if self.on_give_up is not None:
+                        try:
+                            self.on_give_up(item, e)
+                        except Exception as callback_error:
+                            logger.error(f"{self.name}: give-up callback failed: {callback_error}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
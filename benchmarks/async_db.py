@@ -0,0 +1,84 @@
+"""
+Benchmark: concurrent throughput of async routes with and without the db thread-pool bridge
+
+Each database call is replaced by a blocking sleep of --latency seconds, standing
+in for a Supabase round-trip. "blocking" runs the calls inline in the async
+handler (how the routes used to call app/db.py), "bridged" goes through
+db.to_thread. Requests are driven in-process through the ASGI app.
+
+Usage:
+    python -m benchmarks.async_db [--requests 200] [--concurrency 50] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+import httpx
+
+from app import db
+from app.main import app
+
+
+def _slow(latency, result):
+    """Build a fake db function that blocks like a network round-trip"""
+    def call(*args, **kwargs):
+        time.sleep(latency)
+        return result
+    return call
+
+
+async def _inline(func, *args, **kwargs):
+    """Stand-in for db.to_thread that runs the call on the event loop thread"""
+    return func(*args, **kwargs)
+
+
+async def _drive(total: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get("/admin/reports")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def run(mode: str, total: int, concurrency: int, latency: float) -> dict:
+    with patch.object(db, "get_reports", _slow(latency, [])):
+        if mode == "blocking":
+            with patch.object(db, "to_thread", _inline):
+                return asyncio.run(_drive(total, concurrency))
+        return asyncio.run(_drive(total, concurrency))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated round-trip in seconds")
+    args = parser.parse_args()
+
+    print(f"GET /admin/reports x{args.requests}, concurrency {args.concurrency}, "
+          f"{args.latency * 1000:.0f} ms per db call, {db.config.DB_MAX_WORKERS} db threads")
+    for mode in ("blocking", "bridged"):
+        result = run(mode, args.requests, args.concurrency, args.latency)
+        print(f"  {mode:<9} {result['rps']:8.1f} req/s   p50 {result['p50_ms']:8.1f} ms   p99 {result['p99_ms']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
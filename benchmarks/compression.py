@@ -0,0 +1,69 @@
+"""
+Benchmark: bytes on the wire and CPU per request with response compression
+
+Fetches a few pages through the ASGI app with each Accept-Encoding and reports
+the transferred size and the CPU time spent per request (process time, so it
+includes template rendering; the identity row is the baseline). Also shows the
+size/CPU trade-off of the gzip levels and brotli qualities on the largest page.
+
+Usage:
+    python -m benchmarks.compression [--requests 50]
+"""
+import argparse
+import gzip
+import time
+
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.main import app
+
+PAGES = ["/", "/annonces", "/cgv", "/politique-confidentialite", "/mentions-legales"]
+ENCODINGS = ["identity", "gzip", "br"]
+
+
+def _measure(client: TestClient, path: str, encoding: str, total: int) -> dict:
+    size = 0
+    start = time.process_time()
+    for _ in range(total):
+        with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+            response.raise_for_status()
+            size = len(b"".join(response.iter_raw()))
+    return {"bytes": size, "cpu_ms": (time.process_time() - start) / total * 1000}
+
+
+def _levels(body: bytes, total: int) -> None:
+    print(f"\nCompression settings on a {len(body) / 1024:.1f} KB page:")
+    candidates = [(f"gzip level {level}", lambda level=level: gzip.compress(body, compresslevel=level))
+                  for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        candidates += [(f"brotli quality {quality}", lambda quality=quality: compression.brotli.compress(body, quality=quality))
+                       for quality in (1, 4, 11)]
+    for label, compress in candidates:
+        start = time.process_time()
+        for _ in range(total):
+            size = len(compress())
+        cpu_ms = (time.process_time() - start) / total * 1000
+        print(f"  {label:<18} {size / 1024:7.1f} KB  ({size / len(body):5.1%})  {cpu_ms:6.2f} ms CPU")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    encodings = ENCODINGS if compression.brotli is not None else ENCODINGS[:2]
+
+    print(f"GET x{args.requests} per page and encoding")
+    print(f"  {'page':<28}" + "".join(f"{encoding:>22}" for encoding in encodings))
+    for path in PAGES:
+        row = [_measure(client, path, encoding, args.requests) for encoding in encodings]
+        cells = "".join(f"{r['bytes'] / 1024:9.1f} KB {r['cpu_ms']:6.2f} ms" for r in row)
+        print(f"  {path:<28}{cells}")
+
+    _levels(client.get("/politique-confidentialite", headers={"Accept-Encoding": "identity"}).content, args.requests)
+
+
+if __name__ == "__main__":
+    main()
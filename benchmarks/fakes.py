@@ -0,0 +1,150 @@
+"""
+Stand-ins for Supabase, Storage, Stripe and SMTP that count round-trips
+
+FakeSupabase wraps the local SQLite backend, so queries return real data, and
+adds a configurable latency to every execute(), storage upload/download/remove
+and Stripe call, as a network round-trip would. Each round-trip is counted in the
+RoundTrips of the current request (a context variable, propagated to the db
+thread pool by db.to_thread); work done by background workers outside any
+request is counted in `background`.
+"""
+import contextvars
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from app.sqlite_backend import SQLiteClient
+
+
+class RoundTrips:
+    """Thread-safe round-trip counters by service ("db", "storage", "stripe", "smtp")"""
+
+    def __init__(self) -> None:
+        self.counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, service: str) -> None:
+        with self._lock:
+            self.counts[service] += 1
+
+    def total(self, service: Optional[str] = None) -> int:
+        with self._lock:
+            return sum(self.counts.values()) if service is None else self.counts[service]
+
+
+current: contextvars.ContextVar[Optional[RoundTrips]] = contextvars.ContextVar("round_trips", default=None)
+background = RoundTrips()
+
+
+def round_trip(service: str, latency: float) -> None:
+    """Simulate one network round-trip: block for `latency` and count it"""
+    (current.get() or background).add(service)
+    if latency:
+        time.sleep(latency)
+
+
+class _CountedQuery:
+    """Proxy of a query builder whose execute() is a counted round-trip"""
+
+    def __init__(self, query: Any, latency: float):
+        self._query = query
+        self._latency = latency
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._query, name)
+        if not callable(attribute):
+            return attribute
+
+        def chain(*args: Any, **kwargs: Any) -> Any:
+            result = attribute(*args, **kwargs)
+            return _CountedQuery(result, self._latency) if result is self._query else result
+        return chain
+
+    def execute(self) -> Any:
+        round_trip("db", self._latency)
+        return self._query.execute()
+
+
+class _CountedBucket:
+    def __init__(self, bucket: Any, latency: float):
+        self._bucket = bucket
+        self._latency = latency
+
+    def upload(self, *args: Any, **kwargs: Any) -> Any:
+        round_trip("storage", self._latency)
+        return self._bucket.upload(*args, **kwargs)
+
+    def remove(self, *args: Any, **kwargs: Any) -> Any:
+        round_trip("storage", self._latency)
+        return self._bucket.remove(*args, **kwargs)
+
+    def download(self, *args: Any, **kwargs: Any) -> Any:
+        round_trip("storage", self._latency)
+        return self._bucket.download(*args, **kwargs)
+
+    def get_public_url(self, path: str) -> str:
+        # Computed locally by supabase-py: no round-trip
+        return self._bucket.get_public_url(path)
+
+
+class _CountedStorage:
+    def __init__(self, storage: Any, latency: float):
+        self._storage = storage
+        self._latency = latency
+
+    def from_(self, bucket_name: str) -> _CountedBucket:
+        return _CountedBucket(self._storage.from_(bucket_name), self._latency)
+
+
+class FakeSupabase:
+    """
+    Supabase client stand-in: a SQLite database plus a latency per round-trip
+
+    Args:
+        path: SQLite database file (":memory:" by default)
+        storage_dir: Directory of the local storage buckets
+        latency: Seconds added to every query, RPC and storage call
+    """
+
+    def __init__(self, storage_dir: str, path: str = ":memory:", latency: float = 0.0):
+        self.inner = SQLiteClient(path, storage_dir)
+        self.latency = latency
+        self.storage = _CountedStorage(self.inner.storage, latency)
+
+    def table(self, name: str) -> _CountedQuery:
+        return _CountedQuery(self.inner.table(name), self.latency)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> _CountedQuery:
+        return _CountedQuery(self.inner.rpc(name, params), self.latency)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class FakeStripe:
+    """Replacement for stripe.checkout.Session.create returning sequential sessions"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def create_session(self, **_params: Any) -> SimpleNamespace:
+        round_trip("stripe", self.latency)
+        with self._lock:
+            self._sequence += 1
+            session_id = f"cs_bench_{self._sequence}"
+        return SimpleNamespace(id=session_id, url=f"https://checkout.stripe.com/c/pay/{session_id}")
+
+
+def signed_webhook(event: Dict[str, Any], secret: str) -> tuple:
+    """Payload and Stripe-Signature header of an event, as Stripe would send them"""
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return payload, f"t={timestamp},v1={signature}"
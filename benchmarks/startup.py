@@ -0,0 +1,193 @@
+"""
+Benchmark: cold start, from process start to the first byte of a page
+
+Every run uses a fresh interpreter, as a Render instance waking up does:
+
+- import: wall time of `import app.main`, with the heaviest modules from
+  `python -X importtime`, and the SDKs that must stay lazily imported
+  (supabase, stripe, httpx, requests, PIL) flagged if they were loaded;
+- first byte: uvicorn is started on a free port and GET --path is sent as soon
+  as it accepts connections; the time from spawning the process to the first
+  byte of the response is the cold-start latency a visitor sees.
+
+The app runs on the local SQLite backend (DB_BACKEND=sqlite, fresh temporary
+database) so no network round-trip is included. --check fails when the median
+exceeds the targets or a lazy SDK is imported at startup.
+
+Usage:
+    python -m benchmarks.startup [--runs 5] [--path /] [--check]
+"""
+import argparse
+import http.client
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only imported when a client is first used (see app/clients.py)
+LAZY_MODULES = ("supabase", "stripe", "httpx", "requests", "PIL")
+
+# Cold-start budget: Render's health check and a visitor waking the service both wait for this
+TARGET_IMPORT_MS = 600
+TARGET_FIRST_BYTE_MS = 1000
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def _environment(workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "DB_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(workdir, "startup.db"),
+        "SQLITE_STORAGE_DIR": os.path.join(workdir, "storage"),
+        "OUTBOX_DIR": os.path.join(workdir, "outbox"),
+        "SCHEDULER_ENABLED": "false",
+    })
+    return env
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, float, float]]:
+    """(module, depth, self ms, cumulative ms) of each line of -X importtime output"""
+    modules = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, len(indent) // 2, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+
+def import_profile(env: Dict[str, str]) -> Dict[str, object]:
+    """Time `import app.main` in a fresh interpreter and list what it imported"""
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import app.main\n"
+        "print(round((time.perf_counter() - start) * 1000, 1))\n"
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    lines = result.stdout.splitlines()
+    modules = parse_importtime(result.stderr)
+    # Lines are printed once a module is loaded, so the direct imports of app.main
+    # are the depth-1 lines between the previous top-level line and its own
+    end = next(i for i, (name, depth, _, _) in enumerate(modules) if name == "app.main" and depth == 0)
+    children = []
+    for name, depth, _, cumulative in reversed(modules[:end]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children.append((name, cumulative))
+    heaviest = sorted(children, key=lambda item: item[1], reverse=True)
+    return {
+        "import_ms": float(lines[-2]),
+        "eager_sdks": [name for name in lines[-1].split(",") if name],
+        "heaviest": heaviest[:8],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_byte(env: Dict[str, str], path: str = "/", timeout: float = 30.0) -> Dict[str, float]:
+    """Spawn uvicorn and time the first byte of GET path from process start"""
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        listening: Optional[float] = None
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+            try:
+                connection.connect()
+            except ConnectionRefusedError:
+                time.sleep(0.002)
+                continue
+            listening = time.perf_counter() - start
+            connection.request("GET", path, headers={"Accept-Encoding": "identity"})
+            response = connection.getresponse()
+            first_byte = time.perf_counter() - start
+            response.read()
+            connection.close()
+            if response.status >= 500:
+                raise RuntimeError(f"GET {path} returned {response.status}")
+            return {"listening_ms": listening * 1000, "first_byte_ms": first_byte * 1000}
+        raise RuntimeError(f"uvicorn did not accept connections within {timeout:.0f}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run(runs: int, path: str) -> Dict[str, object]:
+    """Median import time and time to first byte over several cold starts"""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = _environment(workdir)
+        profiles = [import_profile(env) for _ in range(runs)]
+        starts = [time_to_first_byte(env, path) for _ in range(runs)]
+    return {
+        "import_ms": statistics.median(p["import_ms"] for p in profiles),
+        "listening_ms": statistics.median(s["listening_ms"] for s in starts),
+        "first_byte_ms": statistics.median(s["first_byte_ms"] for s in starts),
+        "eager_sdks": sorted({name for p in profiles for name in p["eager_sdks"]}),
+        "heaviest": profiles[-1]["heaviest"],
+    }
+
+
+def check(results: Dict[str, object]) -> List[str]:
+    """Describe every missed target (empty list: within budget)"""
+    failures = []
+    if results["import_ms"] > TARGET_IMPORT_MS:
+        failures.append(f"import app.main took {results['import_ms']:.0f} ms (target {TARGET_IMPORT_MS} ms)")
+    if results["first_byte_ms"] > TARGET_FIRST_BYTE_MS:
+        failures.append(f"first byte after {results['first_byte_ms']:.0f} ms (target {TARGET_FIRST_BYTE_MS} ms)")
+    if results["eager_sdks"]:
+        failures.append(f"imported at startup instead of on first use: {', '.join(results['eager_sdks'])}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts (median reported)")
+    parser.add_argument("--path", default="/", help="page requested first")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 when a target is missed")
+    args = parser.parse_args()
+
+    results = run(args.runs, args.path)
+    print(f"Cold start, median of {args.runs} runs (GET {args.path}):")
+    print(f"  import app.main      {results['import_ms']:8.0f} ms   (target {TARGET_IMPORT_MS} ms)")
+    print(f"  accepting requests   {results['listening_ms']:8.0f} ms")
+    print(f"  first byte           {results['first_byte_ms']:8.0f} ms   (target {TARGET_FIRST_BYTE_MS} ms)")
+    print("\n  Heaviest imports (cumulative):")
+    for name, cumulative in results["heaviest"]:
+        print(f"    {name:<28}{cumulative:8.1f} ms")
+
+    if args.check:
+        failures = check(results)
+        for failure in failures:
+            print(f"  ❌ {failure}")
+        if failures:
+            sys.exit(1)
+        print("\n✅ Cold start within targets")
+
+
+if __name__ == "__main__":
+    main()
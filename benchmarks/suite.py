@@ -0,0 +1,365 @@
+"""
+Benchmark suite: throughput, latency and round-trips per request of the main pages
+
+Drives app.main:app in-process (httpx ASGI transport) against fake Supabase,
+Storage, Stripe and SMTP services (benchmarks/fakes.py) that return real data
+from a seeded SQLite database and add --latency seconds per round-trip.
+
+For each scenario, a cold probe (caches cleared before every iteration, run
+sequentially) counts the database, storage and Stripe round-trips per request;
+the measured run then reports requests/s and p50/p99 latency at --concurrency
+with warm caches. Latencies are per iteration: one request, except for the
+wizard (the ten requests of steps 1 to 5).
+
+Results can be saved as baselines and checked against them to catch
+regressions: more cold round-trips than the baseline always fails, a p50
+slower than the baseline by more than --tolerance fails when the run settings
+match those of the baselines.
+
+Usage:
+    python -m benchmarks.suite [--scenarios home,detail] [--requests 200] [--concurrency 20]
+                               [--latency 0.005] [--check | --update-baselines]
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List
+from unittest.mock import patch
+
+import httpx
+import stripe
+from PIL import Image
+
+from app import config, db, fragments, outbox, webhooks
+from app import email as email_module
+from app.main import app
+from benchmarks import fakes
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+WEBHOOK_SECRET = "whsec_benchmark"
+SEED_SESSION_ID = "cs_seed"
+
+STEP1 = {"listing_type": "part", "category": "Pompage", "title": "Pompe à lobes"}
+STEP2 = {"condition": "Neuf", "year": "2020", "manufacturer": "Vogelsang",
+         "summary": "Pompe révisée", "description": "Pompe à lobes révisée en 2024, livrée avec son moteur."}
+STEP4 = {"price_type": "fixed", "price_amount": "1500", "location": "Bretagne, FR"}
+STEP5 = {"contact_email": "vendeur@example.fr", "contact_phone": "+33600000000", "consent_public_contact": "on"}
+
+
+# ==================== Fixtures ====================
+
+def seed(fake: fakes.FakeSupabase, listings: int) -> Dict[str, Any]:
+    """Fill the fake database with published listings, their photos and one payment"""
+    client = fake.inner
+    user = client.table("users").insert({"email": "vendeur@example.fr"}).execute().data[0]
+    now = datetime.utcnow()
+    ids = []
+    for i in range(listings):
+        category = config.CATEGORIES[i % len(config.CATEGORIES)]
+        listing = client.table("listings").insert({
+            "user_id": user["id"], "status": "published", "title": f"{category} d'occasion n°{i}",
+            "category": category, "location": f"Région {i % 12}, {['FR', 'DE', 'BE', 'ES'][i % 4]}",
+            "summary": "Matériel révisé, disponible immédiatement", "description": "Description détaillée. " * 20,
+            "condition": "Occasion", "manufacturer": "Vogelsang", "price_amount": 150000 + i,
+            "price_display": f"{1500 + i} €", "contact_email": "vendeur@example.fr", "contact_phone": "+33600000000",
+            "published_at": (now - timedelta(minutes=i)).isoformat(),
+            "expires_at": (now + timedelta(days=30)).isoformat(), "updated_at": now.isoformat(),
+        }).execute().data[0]
+        url = f"/storage/v1/object/public/{config.SUPABASE_STORAGE_BUCKET}/{listing['id']}/photo.jpg"
+        client.table("media").insert({
+            "listing_id": listing["id"], "media_type": "photo", "url": url, "display_order": 0,
+            "variants": [{"width": w, "type": "image/webp", "url": url.replace(".jpg", f"_w{w}.webp")}
+                         for w in config.IMAGE_DERIVATIVE_WIDTHS],
+        }).execute()
+        ids.append(listing["id"])
+
+    client.table("payments").insert({
+        "listing_id": ids[0], "user_id": user["id"], "amount": config.LISTING_PRICE_AMOUNT,
+        "stripe_checkout_session_id": SEED_SESSION_ID,
+    }).execute()
+
+    photo = io.BytesIO()
+    Image.new("RGB", (1600, 1200), (90, 120, 60)).save(photo, format="JPEG", quality=85)
+    return {"listing_ids": ids, "photo": photo.getvalue()}
+
+
+def clear_caches() -> None:
+    """Forget every in-process read cache (cold probe)"""
+    db._listings_cache.invalidate()
+    db._users_cache.invalidate()
+    fragments.card_cache.invalidate()
+
+
+# ==================== Scenarios ====================
+# Each scenario runs one iteration and returns the number of HTTP requests it made
+
+Scenario = Callable[[httpx.AsyncClient, httpx.AsyncBaseTransport, Dict[str, Any], int], Awaitable[int]]
+
+
+def _check(response: httpx.Response, *statuses: int) -> None:
+    if response.status_code not in statuses:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: {response.status_code}")
+
+
+async def home(client, transport, ctx, i) -> int:
+    _check(await client.get("/"), 200)
+    return 1
+
+
+async def annonces(client, transport, ctx, i) -> int:
+    _check(await client.get("/annonces"), 200)
+    return 1
+
+
+async def detail(client, transport, ctx, i) -> int:
+    listing_ids = ctx["listing_ids"]
+    _check(await client.get(f"/annonces/{listing_ids[i % len(listing_ids)]}"), 200)
+    return 1
+
+
+async def wizard(client, transport, ctx, i) -> int:
+    # Each flow has its own cookie jar (the draft lives in a cookie)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as flow:
+        _check(await flow.get("/deposer/step1"), 200)
+        response = await flow.post("/deposer/step1", data=STEP1)
+        _check(response, 303)
+        listing_id = response.headers["location"].split("listing_id=")[1]
+        for step, data in ((2, STEP2), (3, None), (4, STEP4), (5, STEP5)):
+            _check(await flow.get(f"/deposer/step{step}?listing_id={listing_id}"), 200)
+            if step == 3:
+                files = [("photos", ("pompe.jpg", ctx["photo"], "image/jpeg"))]
+                response = await flow.post("/deposer/step3", data={"listing_id": listing_id}, files=files)
+            else:
+                response = await flow.post(f"/deposer/step{step}", data={**data, "listing_id": listing_id})
+            _check(response, 303)
+    return 10
+
+
+async def webhook(client, transport, ctx, i) -> int:
+    event = {
+        "id": f"evt_bench_{uuid.uuid4().hex}",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": {"id": SEED_SESSION_ID, "object": "checkout.session", "payment_intent": "pi_bench"}},
+    }
+    payload, signature = fakes.signed_webhook(event, WEBHOOK_SECRET)
+    response = await client.post("/webhook/stripe", content=payload,
+                                 headers={"stripe-signature": signature, "content-type": "application/json"})
+    _check(response, 200)
+    return 1
+
+
+async def contact(client, transport, ctx, i) -> int:
+    response = await client.post("/contact", data={
+        "name": "Acheteur", "email": "acheteur@example.fr", "subject": "question-annonce",
+        "reference": f"#{i}", "message": "Bonjour, la pompe est-elle toujours disponible ?",
+    })
+    _check(response, 200)
+    return 1
+
+
+async def signaler(client, transport, ctx, i) -> int:
+    listing_id = ctx["listing_ids"][i % len(ctx["listing_ids"])]
+    response = await client.post("/signaler", data={
+        "listing_url": f"{config.APP_URL}/annonces/{listing_id}", "reason": "fraudulent",
+        "description": "Annonce suspecte", "reporter_email": "signalement@example.fr",
+    })
+    _check(response, 200)
+    return 1
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "home": home,
+    "annonces": annonces,
+    "detail": detail,
+    "wizard": wizard,
+    "webhook": webhook,
+    "contact": contact,
+    "signaler": signaler,
+}
+
+
+# ==================== Driver ====================
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[max(math.ceil(len(sorted_values) * fraction) - 1, 0)]
+
+
+async def _iteration(scenario, client, transport, ctx, i) -> tuple:
+    trips = fakes.RoundTrips()
+    fakes.current.set(trips)
+    start = time.perf_counter()
+    requests = await scenario(client, transport, ctx, i)
+    return time.perf_counter() - start, requests, trips
+
+
+async def _probe(scenario, transport, ctx, iterations: int) -> Dict[str, float]:
+    """Sequential, cold iterations: round-trips per request by service"""
+    totals: Dict[str, int] = {}
+    requests = 0
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(iterations):
+            clear_caches()
+            _, made, trips = await asyncio.create_task(_iteration(scenario, client, transport, ctx, i))
+            requests += made
+            for service, count in trips.counts.items():
+                totals[service] = totals.get(service, 0) + count
+    return {service: count / requests for service, count in sorted(totals.items())}
+
+
+async def _measure(scenario, transport, ctx, total: int, concurrency: int) -> Dict[str, float]:
+    """Concurrent, warm iterations: throughput and latency"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    requests = 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # One warm-up iteration fills the caches
+        await asyncio.create_task(_iteration(scenario, client, transport, ctx, 0))
+
+        async def one(i: int) -> None:
+            nonlocal requests
+            async with semaphore:
+                elapsed, made, _ = await _iteration(scenario, client, transport, ctx, i)
+                latencies.append(elapsed)
+                requests += made
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+def run(names: List[str], total: int, concurrency: int, latency: float, listings: int, probe: int) -> Dict[str, Any]:
+    """Run the given scenarios against fresh fakes; returns {scenario: metrics}"""
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    fake = fakes.FakeSupabase(os.path.join(workdir, "storage"), latency=latency)
+    fake_stripe = fakes.FakeStripe(latency)
+    contact_outbox = outbox.Outbox(
+        os.path.join(workdir, "outbox"), lambda message: fakes.round_trip("smtp", latency), name="bench-outbox"
+    )
+    ctx = seed(fake, listings)
+    transport = httpx.ASGITransport(app=app)
+
+    results = {}
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(db, "supabase", fake))
+        stack.enter_context(patch.object(config, "STRIPE_SECRET_KEY", "sk_test_benchmark"))
+        stack.enter_context(patch.object(config, "STRIPE_WEBHOOK_SECRET", WEBHOOK_SECRET))
+        stack.enter_context(patch.object(stripe.checkout.Session, "create", fake_stripe.create_session))
+        stack.enter_context(patch.object(config, "SMTP_HOST", "smtp.benchmark"))
+        stack.enter_context(patch.object(email_module, "contact_outbox", contact_outbox))
+
+        for name in names:
+            scenario = SCENARIOS[name]
+            round_trips = asyncio.run(_probe(scenario, transport, ctx, probe))
+            metrics = asyncio.run(_measure(scenario, transport, ctx, total, concurrency))
+            # Let background work (webhook processing, outbox) finish against the fakes
+            webhooks.worker.drain(timeout=60)
+            contact_outbox.drain(timeout=60)
+            results[name] = {
+                **{key: round(value, 2) for key, value in metrics.items()},
+                "round_trips": {service: round(count, 2) for service, count in round_trips.items()},
+            }
+
+    contact_outbox.stop()
+    fake.close()
+    return results
+
+
+# ==================== Baselines ====================
+
+def load_baselines(path: str = BASELINES_PATH) -> Dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def compare(results: Dict[str, Any], baselines: Dict[str, Any], settings: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every regression of results against baselines (empty list: no regression)"""
+    regressions = []
+    same_settings = baselines.get("settings") == settings
+    for name, metrics in results.items():
+        baseline = baselines.get("scenarios", {}).get(name)
+        if not baseline:
+            continue
+        for service, count in metrics["round_trips"].items():
+            expected = baseline["round_trips"].get(service, 0)
+            if count > expected + 1e-9:
+                regressions.append(f"{name}: {count} {service} round-trips per request (baseline {expected})")
+        if same_settings and metrics["p50_ms"] > baseline["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {metrics['p50_ms']} ms (baseline {baseline['p50_ms']} ms)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="iterations per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated round-trip in seconds")
+    parser.add_argument("--listings", type=int, default=200, help="published listings seeded")
+    parser.add_argument("--probe", type=int, default=3, help="cold iterations counting round-trips")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed p50 slowdown vs baseline (0.5 = +50%%)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--check", action="store_true", help="exit with status 1 on regression vs baselines")
+    mode.add_argument("--update-baselines", action="store_true", help=f"save results to {BASELINES_PATH}")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the measurements
+    logging.disable(logging.INFO)
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    settings = {"requests": args.requests, "concurrency": args.concurrency,
+                "latency": args.latency, "listings": args.listings}
+    print(f"{args.requests} iterations per scenario, concurrency {args.concurrency}, "
+          f"{args.latency * 1000:.1f} ms per round-trip, {args.listings} listings")
+    results = run(names, args.requests, args.concurrency, args.latency, args.listings, args.probe)
+
+    print(f"\n  {'scenario':<10}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}   round-trips per request (cold)")
+    for name, metrics in results.items():
+        trips = ", ".join(f"{service} {count:g}" for service, count in metrics["round_trips"].items()) or "none"
+        print(f"  {name:<10}{metrics['rps']:9.1f}{metrics['p50_ms']:10.1f}{metrics['p99_ms']:10.1f}   {trips}")
+
+    if args.update_baselines:
+        baselines = load_baselines()
+        baselines["settings"] = settings
+        baselines.setdefault("scenarios", {}).update(results)
+        with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaselines saved to {BASELINES_PATH}")
+    elif args.check:
+        regressions = compare(results, load_baselines(), settings, args.tolerance)
+        for regression in regressions:
+            print(f"  ❌ {regression}")
+        if regressions:
+            sys.exit(1)
+        print("\n✅ No regression against baselines")
+
+
+if __name__ == "__main__":
+    main()
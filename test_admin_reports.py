@@ -0,0 +1,60 @@
+"""
+Test aggregate report counts for the admin dashboard
+"""
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app import db
+
+client = TestClient(app)
+
+
+def test_status_counts_from_grouped_rpc():
+    """Counts come from one grouped RPC, whatever the number of reports"""
+    mock_supabase = MagicMock()
+    mock_supabase.rpc.return_value.execute.return_value = MagicMock(data=[
+        {"status": "new", "count": 1500},
+        {"status": "resolved", "count": 20},
+    ])
+
+    with patch.object(db, "supabase", mock_supabase):
+        counts = db.get_report_status_counts()
+
+    assert counts == {"new": 1500, "reviewed": 0, "resolved": 20, "total": 1520}
+    mock_supabase.table.assert_not_called()
+
+
+def test_status_counts_fallback_uses_head_queries():
+    """Without the RPC, counts use count-only head queries instead of fetching rows"""
+    mock_supabase = MagicMock()
+    mock_supabase.rpc.side_effect = Exception("function report_status_counts() does not exist")
+    select = mock_supabase.table.return_value.select
+    select.return_value.eq.return_value.execute.return_value = MagicMock(count=7, data=[])
+    select.return_value.execute.return_value = MagicMock(count=21, data=[])
+
+    with patch.object(db, "supabase", mock_supabase):
+        counts = db.get_report_status_counts()
+
+    assert counts == {"new": 7, "reviewed": 7, "resolved": 7, "total": 21}
+    for call in select.call_args_list:
+        assert call.kwargs == {"count": "exact", "head": True}
+
+
+def test_dashboard_renders_counts():
+    """The dashboard shows the aggregate counts"""
+    counts = {"new": 1234, "reviewed": 5, "resolved": 6, "total": 1245}
+    with patch.object(db, "get_reports", return_value=[]) as get_reports, \
+         patch.object(db, "get_report_status_counts", return_value=counts):
+        response = client.get("/admin/reports")
+
+    assert response.status_code == 200
+    assert "1245" in response.text
+    assert get_reports.call_count == 1
+
+
+if __name__ == "__main__":
+    print("Running admin reports tests...")
+    test_status_counts_from_grouped_rpc()
+    test_status_counts_fallback_uses_head_queries()
+    test_dashboard_renders_counts()
+    print("\n✅ All tests passed!")
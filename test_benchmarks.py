@@ -0,0 +1,53 @@
+"""
+Test the benchmark suite and its round-trip-counting fakes
+"""
+import tempfile
+from benchmarks import fakes, suite
+
+
+def test_fake_counts_round_trips_per_request():
+    """Queries made in a request context are counted there, others as background"""
+    fake = fakes.FakeSupabase(tempfile.mkdtemp())
+    trips = fakes.RoundTrips()
+    token = fakes.current.set(trips)
+    try:
+        fake.table("reports").select("*").eq("status", "new").limit(5).execute()
+        fake.rpc("report_status_counts").execute()
+        fake.storage.from_("bucket").upload("a/b.jpg", b"data")
+        assert fake.storage.from_("bucket").get_public_url("a/b.jpg").endswith("/bucket/a/b.jpg")
+    finally:
+        fakes.current.reset(token)
+
+    assert trips.counts == {"db": 2, "storage": 1}
+    fake.close()
+
+
+def test_suite_runs_scenarios():
+    """A short run reports throughput, latency and round-trips for each scenario"""
+    results = suite.run(["home", "signaler"], total=4, concurrency=2, latency=0.0, listings=5, probe=1)
+
+    assert results["home"]["round_trips"] == {"db": 2.0}
+    assert results["signaler"]["round_trips"] == {"db": 1.0}
+    assert results["home"]["rps"] > 0 and results["home"]["p99_ms"] >= results["home"]["p50_ms"]
+
+
+def test_compare_flags_regressions():
+    """Extra round-trips always fail; latency is only compared with identical settings"""
+    settings = {"requests": 10}
+    baselines = {"settings": settings, "scenarios": {"home": {"p50_ms": 10.0, "round_trips": {"db": 3.0}}}}
+
+    assert suite.compare({"home": {"p50_ms": 12.0, "round_trips": {"db": 3.0}}}, baselines, settings, 0.5) == []
+    assert len(suite.compare({"home": {"p50_ms": 10.0, "round_trips": {"db": 4.0}}}, baselines, settings, 0.5)) == 1
+    assert len(suite.compare({"home": {"p50_ms": 30.0, "round_trips": {"db": 3.0}}}, baselines, settings, 0.5)) == 1
+    assert suite.compare({"home": {"p50_ms": 30.0, "round_trips": {"db": 3.0}}}, baselines, {"requests": 5}, 0.5) == []
+
+
+if __name__ == "__main__":
+    print("Running benchmark suite tests...")
+    test_fake_counts_round_trips_per_request()
+    print("✓ Round-trips counted per request")
+    test_suite_runs_scenarios()
+    print("✓ Suite runs scenarios")
+    test_compare_flags_regressions()
+    print("✓ Regressions against baselines detected")
+    print("\n✅ All tests passed!")
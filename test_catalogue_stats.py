@@ -0,0 +1,71 @@
+"""
+Test live catalogue statistics
+"""
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app import db
+
+client = TestClient(app)
+
+STATS = {"total": 42, "categories": {"Pompage": 30, "Épuration": 12}, "countries": 5}
+
+
+def test_stats_from_rpc_are_cached():
+    """Stats come from one RPC call and are served from cache until a write"""
+    mock_supabase = MagicMock()
+    mock_supabase.rpc.return_value.execute.return_value = MagicMock(data=STATS)
+    db._listings_cache.invalidate()
+
+    with patch.object(db, "supabase", mock_supabase):
+        assert db.get_catalogue_stats() == STATS
+        assert db.get_catalogue_stats() == STATS
+        assert mock_supabase.rpc.call_count == 1
+
+        db.publish_listing("listing-1")
+        db.get_catalogue_stats()
+        assert mock_supabase.rpc.call_count == 2
+    db._listings_cache.invalidate()
+
+
+def test_stats_unavailable_without_rpc():
+    """Without the SQL function, no rows are fetched: the figures are unavailable and retried"""
+    mock_supabase = MagicMock()
+    mock_supabase.rpc.return_value.execute.side_effect = Exception("Could not find the function listing_catalogue_stats")
+    db._listings_cache.invalidate()
+
+    with patch.object(db, "supabase", mock_supabase):
+        assert db.get_catalogue_stats() == {"total": None, "categories": {}, "countries": None}
+        db.get_catalogue_stats()
+    assert mock_supabase.rpc.call_count == 2
+    mock_supabase.table.assert_not_called()
+
+    page = {"listings": [], "next_cursor": None, "prev_cursor": None}
+    with patch.object(db, "get_catalogue_stats", return_value=dict(db.UNAVAILABLE_STATS)), \
+         patch.object(db, "get_published_listings_page", return_value=page):
+        listings = client.get("/annonces")
+    assert listings.text.count('<span class="stat-number">–</span>') == 3
+
+
+def test_pages_render_live_stats():
+    """Home and /annonces show live numbers instead of hardcoded ones"""
+    page = {"listings": [], "next_cursor": None, "prev_cursor": None}
+    with patch.object(db, "get_catalogue_stats", return_value=STATS), \
+         patch.object(db, "get_published_listings_page", return_value=page), \
+         patch.object(db, "get_published_listings", return_value=[]):
+        home = client.get("/")
+        listings = client.get("/annonces")
+
+    assert "<strong>42</strong> annonces en ligne" in home.text
+    assert '<span class="stat-number">42</span>' in listings.text
+    assert '<span class="stat-number">2</span>' in listings.text
+    assert '<span class="stat-number">5</span>' in listings.text
+    assert "Pompage (30)" in listings.text
+
+
+if __name__ == "__main__":
+    print("Running catalogue stats tests...")
+    test_stats_from_rpc_are_cached()
+    test_stats_unavailable_without_rpc()
+    test_pages_render_live_stats()
+    print("\n✅ All tests passed!")
@@ -0,0 +1,79 @@
+"""
+Test lazy client creation and deferred SDK imports (fast cold start)
+"""
+import os
+import subprocess
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+from app import clients
+from benchmarks import startup
+
+
+def test_app_import_defers_sdks():
+    """With production credentials set, importing the app loads none of the SDKs"""
+    env = dict(os.environ, SUPABASE_URL="https://example.supabase.co", SUPABASE_KEY="key",
+               STRIPE_SECRET_KEY="sk_test_x", DB_BACKEND="supabase")
+    code = f"import sys, app.main; print(','.join(m for m in {startup.LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines()[-1] == ""
+
+
+def test_lazy_supabase_client_built_once():
+    """The client is created by the first caller only, even under concurrency"""
+    real = MagicMock()
+    with patch.object(clients, "create_supabase_client", return_value=real) as create:
+        lazy = clients.LazySupabaseClient("https://example.supabase.co", "key")
+        assert lazy and not lazy.created
+        lazy.close()
+
+        threads = [threading.Thread(target=lambda: lazy.table("listings")) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    create.assert_called_once_with("https://example.supabase.co", "key")
+    assert real.table.call_count == 8
+    lazy.close()
+    real.options.httpx_client.close.assert_called_once()
+
+
+def test_stripe_configured_on_first_use():
+    """get_stripe() sets the key and the pooled session once"""
+    with patch.object(clients, "_stripe_configured", False), \
+         patch.object(clients, "configure_stripe") as configure, \
+         patch.object(clients.config, "STRIPE_SECRET_KEY", "sk_test_x"):
+        clients.get_stripe()
+        stripe = clients.get_stripe()
+    configure.assert_called_once()
+    assert stripe.__name__ == "stripe"
+
+
+def test_parse_importtime():
+    """-X importtime lines give module, depth, self and cumulative times"""
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     app.config\n"
+        "import time:      5000 |     205000 |   fastapi\n"
+        "import time:     77000 |     282120 | app.main\n"
+    )
+    assert startup.parse_importtime(output) == [
+        ("app.config", 2, 0.12, 0.12),
+        ("fastapi", 1, 5.0, 205.0),
+        ("app.main", 0, 77.0, 282.12),
+    ]
+
+
+if __name__ == "__main__":
+    print("Running cold start tests...")
+    test_app_import_defers_sdks()
+    print("✓ App import defers the SDKs")
+    test_lazy_supabase_client_built_once()
+    print("✓ Lazy Supabase client built once")
+    test_stripe_configured_on_first_use()
+    print("✓ Stripe configured on first use")
+    test_parse_importtime()
+    print("✓ importtime output parsed")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,122 @@
+"""
+Test response compression
+"""
+import gzip
+import json
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+from app.main import app
+from app import assets, compression
+
+client = TestClient(app)
+
+BIG_HTML = "<p>" + "Méthanisation " * 200 + "</p>"
+
+
+def build_app():
+    test_app = FastAPI()
+    test_app.add_middleware(compression.CompressionMiddleware, minimum_size=500)
+
+    @test_app.get("/big")
+    def big():
+        return HTMLResponse(BIG_HTML)
+
+    @test_app.get("/small")
+    def small():
+        return HTMLResponse("<p>ok</p>")
+
+    @test_app.get("/json")
+    def data():
+        return JSONResponse({"items": list(range(500))})
+
+    @test_app.get("/pdf")
+    def pdf():
+        return Response(b"%PDF" + b"0" * 2000, media_type="application/pdf")
+
+    @test_app.get("/stream")
+    def stream():
+        return StreamingResponse((BIG_HTML for _ in range(3)), media_type="text/html")
+
+    return TestClient(test_app)
+
+
+test_client = build_app()
+
+
+def raw_get(client_, path, encoding):
+    """GET without letting httpx decode the body"""
+    with client_.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_legal_page_gzipped():
+    """Large HTML pages go out compressed"""
+    response, body = raw_get(client, "/politique-confidentialite", "gzip")
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) == len(body)
+    html = gzip.decompress(body).decode()
+    assert "</html>" in html
+    assert len(body) < len(html.encode()) / 3
+
+
+def test_brotli_preferred():
+    if assets.brotli is None:
+        return
+    response, body = raw_get(test_client, "/big", "gzip, br")
+    assert response.headers["content-encoding"] == "br"
+    assert assets.brotli.decompress(body).decode() == BIG_HTML
+
+
+def test_json_compressed():
+    response, body = raw_get(test_client, "/json", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(body)) == {"items": list(range(500))}
+
+
+def test_small_and_excluded_bodies_untouched():
+    """Small bodies, non-text types and clients without gzip get identity"""
+    response, body = raw_get(test_client, "/small", "gzip")
+    assert "content-encoding" not in response.headers
+    assert body == b"<p>ok</p>"
+
+    response, _ = raw_get(test_client, "/pdf", "gzip")
+    assert "content-encoding" not in response.headers
+
+    response, body = raw_get(test_client, "/big", "identity")
+    assert "content-encoding" not in response.headers
+    assert body.decode() == BIG_HTML
+
+
+def test_streaming_response():
+    response, body = raw_get(test_client, "/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(body).decode() == BIG_HTML * 3
+
+
+def test_precompressed_static_not_recompressed():
+    """Static assets keep their own precompressed encoding"""
+    asset = assets.manifest.get("css/styles.css")
+    response, body = raw_get(client, assets.static_url("css/styles.css"), "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert body == asset.encodings["gzip"]
+
+
+if __name__ == "__main__":
+    print("Running compression tests...")
+    test_legal_page_gzipped()
+    print("✓ Legal page gzipped")
+    test_brotli_preferred()
+    print("✓ Brotli preferred when accepted")
+    test_json_compressed()
+    print("✓ JSON compressed")
+    test_small_and_excluded_bodies_untouched()
+    print("✓ Small and excluded bodies untouched")
+    test_streaming_response()
+    print("✓ Streaming response compressed")
+    test_precompressed_static_not_recompressed()
+    print("✓ Static assets not recompressed")
+    print("\n✅ All tests passed!")
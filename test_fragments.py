@@ -0,0 +1,89 @@
+"""
+Test the rendered listing-card fragment cache
+"""
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app, templates
+from app import db, fragments
+
+client = TestClient(app)
+
+
+def make_listings(count, updated_at="2026-01-01T00:00:00"):
+    return [
+        {"id": f"listing-{i}", "title": f"Annonce {i}", "category": "Pompage", "status": "published",
+         "location": "Bretagne, FR", "summary": "Résumé", "condition": "Neuf", "price_display": "100 €",
+         "updated_at": updated_at}
+        for i in range(count)
+    ]
+
+
+def get_catalogue(listings):
+    page = {"listings": listings, "next_cursor": None, "prev_cursor": None}
+    with patch.object(db, "get_published_listings_page", return_value=page), \
+         patch.object(db, "get_first_media_for_listings", return_value={}):
+        return client.get("/annonces")
+
+
+def test_cards_rendered_once_across_requests():
+    """A grid re-requested with unchanged listings is served from the cache"""
+    fragments.card_cache.invalidate()
+    listings = make_listings(20)
+    template = templates.env.get_template(fragments.CARD_TEMPLATE)
+
+    with patch.object(template, "render", wraps=template.render) as render:
+        first = get_catalogue([dict(item) for item in listings])
+        second = get_catalogue([dict(item) for item in listings])
+
+    assert first.status_code == second.status_code == 200
+    assert render.call_count == 20
+    assert first.text == second.text
+    assert first.text.count('<article class="card"') == 20
+    assert 'data-category="Pompage"' in first.text
+
+
+def test_updated_listing_rerendered():
+    """Bumping updated_at produces a fresh card"""
+    fragments.card_cache.invalidate()
+    get_catalogue(make_listings(1))
+
+    changed = make_listings(1, updated_at="2026-02-01T00:00:00")
+    changed[0]["title"] = "Titre modifié"
+    response = get_catalogue(changed)
+
+    assert "Titre modifié" in response.text
+
+
+def test_variants_cached_separately():
+    """Home and catalogue cards of the same listing don't share markup"""
+    fragments.card_cache.invalidate()
+    item = make_listings(1)[0]
+    item["image"] = "https://cdn/photo.jpg"
+
+    home = fragments.render_listing_card(templates.env, item, "home")
+    catalogue = fragments.render_listing_card(templates.env, item, "catalogue")
+
+    assert "Voir l’annonce" in home and "badge" not in home
+    assert "Voir les détails" in catalogue and "badge-success" in catalogue
+    assert len(fragments.card_cache) == 2
+
+
+def test_unversioned_listing_not_cached():
+    """Listings without updated_at are rendered but never cached"""
+    fragments.card_cache.invalidate()
+    item = make_listings(1, updated_at=None)[0]
+    assert "Annonce 0" in fragments.render_listing_card(templates.env, item, "home")
+    assert len(fragments.card_cache) == 0
+
+
+if __name__ == "__main__":
+    print("Running fragment cache tests...")
+    test_cards_rendered_once_across_requests()
+    print("✓ Cards reused across requests")
+    test_updated_listing_rerendered()
+    print("✓ Updated listing re-rendered")
+    test_variants_cached_separately()
+    print("✓ Variants cached separately")
+    test_unversioned_listing_not_cached()
+    print("✓ Unversioned listings not cached")
+    print("\n✅ All tests passed!")
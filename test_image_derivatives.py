@@ -0,0 +1,158 @@
+"""
+Test resized photo derivatives and responsive listing images
+"""
+import io
+from unittest.mock import MagicMock, patch
+from PIL import Image
+from fastapi.testclient import TestClient
+from app.main import app, DEFAULT_LISTING_SRCSET
+from app import db, storage
+
+client = TestClient(app)
+
+BUCKET = "listing-photos"
+BASE = f"https://proj.supabase.co/storage/v1/object/public/{BUCKET}"
+
+
+def make_image(width, height, image_format="JPEG", mode="RGB"):
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height), (200, 80, 40) if mode == "RGB" else (200, 80, 40, 128)).save(buffer, format=image_format)
+    buffer.seek(0)
+    return buffer
+
+
+def test_derivatives_widths_and_formats():
+    """Each target width is produced in WebP and JPEG, never upscaled"""
+    derivatives, placeholder = storage.generate_derivatives(make_image(1600, 1200), [320, 640, 1200])
+
+    sizes = {(width, content_type) for width, _ext, content_type, _data in derivatives}
+    assert sizes == {(w, t) for w in (320, 640, 1200) for t in ("image/webp", "image/jpeg")}
+    for width, _ext, content_type, data in derivatives:
+        with Image.open(io.BytesIO(data)) as image:
+            assert image.width == width
+            assert image.height == width * 3 // 4
+            assert image.format == ("WEBP" if content_type == "image/webp" else "JPEG")
+    assert placeholder.startswith("data:image/jpeg;base64,")
+    assert len(placeholder) < 1000
+
+
+def test_small_image_not_upscaled():
+    """A photo narrower than the targets keeps its own width"""
+    derivatives, _ = storage.generate_derivatives(make_image(500, 300), [320, 640, 1200])
+    assert sorted({width for width, *_ in derivatives}) == [320, 500]
+
+    derivatives, _ = storage.generate_derivatives(make_image(200, 100), [320, 640])
+    assert {width for width, *_ in derivatives} == {200}
+
+
+def test_transparent_png_flattened():
+    """PNG with alpha is flattened so it can be saved as JPEG"""
+    derivatives, _ = storage.generate_derivatives(make_image(400, 400, "PNG", "RGBA"), [320])
+    jpeg = next(data for _w, _ext, content_type, data in derivatives if content_type == "image/jpeg")
+    with Image.open(io.BytesIO(jpeg)) as image:
+        assert image.mode == "RGB"
+        assert image.size == (320, 320)
+
+
+def test_upload_derivatives_paths():
+    """Derivatives are stored next to the original with a width suffix"""
+    mock_supabase = MagicMock()
+    bucket = mock_supabase.storage.from_.return_value
+    bucket.get_public_url.side_effect = lambda path: f"{BASE}/{path}"
+
+    with patch("app.config.IMAGE_DERIVATIVE_WIDTHS", [320, 640]):
+        result = storage.upload_derivatives(mock_supabase, BUCKET, "abc/photo.png", make_image(1000, 500))
+
+    paths = sorted(call.args[0] for call in bucket.upload.call_args_list)
+    assert paths == [
+        "abc/photo_placeholder.jpg", "abc/photo_w320.jpg", "abc/photo_w320.webp", "abc/photo_w640.jpg", "abc/photo_w640.webp",
+    ]
+    assert storage.build_srcset(result["variants"], "image/webp") == (
+        f"{BASE}/abc/photo_w320.webp 320w, {BASE}/abc/photo_w640.webp 640w"
+    )
+    assert result["placeholder"]
+
+
+def test_upload_derivatives_invalid_image():
+    """Undecodable data yields no variants instead of failing the upload"""
+    result = storage.upload_derivatives(MagicMock(), BUCKET, "abc/photo.jpg", io.BytesIO(b"not an image"))
+    assert result == {"variants": [], "placeholder": None}
+
+
+def test_media_storage_paths():
+    """Replacing a photo deletes the original and every derivative"""
+    media = {
+        "url": f"{BASE}/abc/photo.jpg",
+        "variants": [{"width": 320, "type": "image/webp", "url": f"{BASE}/abc/photo_w320.webp"}],
+    }
+    assert storage.media_storage_paths(media, BUCKET) == ["abc/photo.jpg", "abc/photo_w320.webp"]
+    assert storage.media_storage_paths({"url": f"{BASE}/abc/old.jpg", "variants": None}, BUCKET) == ["abc/old.jpg"]
+
+
+def test_photo_reference_round_trip():
+    """A draft's photo reference rebuilds the media row and lists every stored object"""
+    variants = [{"width": 320, "type": "image/webp", "url": f"{BASE}/abc/photo_w320.webp"}]
+    reference = storage.photo_reference("abc/photo.jpg", variants)
+    assert reference == {"path": "abc/photo.jpg", "variants": [[320, "image/webp"]]}
+    assert storage.photo_reference_paths(reference, BUCKET) == [
+        "abc/photo.jpg", "abc/photo_w320.webp", "abc/photo_placeholder.jpg",
+    ]
+
+    mock_supabase = MagicMock()
+    bucket = mock_supabase.storage.from_.return_value
+    bucket.get_public_url.side_effect = lambda path: f"{BASE}/{path}"
+    bucket.download.side_effect = FileNotFoundError("abc/photo_placeholder.jpg")
+    assert storage.resolve_photo(mock_supabase, BUCKET, reference) == {
+        "url": f"{BASE}/abc/photo.jpg", "variants": variants, "placeholder": None,
+    }
+
+
+def test_listing_cards_emit_srcset():
+    """Cards use the derivatives, the placeholder, and the resized default image"""
+    listings = [
+        {"id": f"listing-{i}", "title": f"Annonce {i}", "category": "Pompage", "status": "published",
+         "location": "Bretagne, FR", "summary": "Résumé", "condition": "Neuf", "price_display": "100 €"}
+        for i in range(2)
+    ]
+    media = {"listing-0": {
+        "listing_id": "listing-0",
+        "url": f"{BASE}/listing-0/photo.jpg",
+        "variants": [
+            {"width": 320, "type": "image/webp", "url": f"{BASE}/listing-0/photo_w320.webp"},
+            {"width": 320, "type": "image/jpeg", "url": f"{BASE}/listing-0/photo_w320.jpg"},
+        ],
+        "placeholder": "data:image/jpeg;base64,AAAA",
+    }}
+    page = {"listings": listings, "next_cursor": None, "prev_cursor": None}
+
+    with patch.object(db, "get_published_listings_page", return_value=page), \
+         patch.object(db, "get_first_media_for_listings", return_value=media):
+        response = client.get("/annonces")
+
+    assert response.status_code == 200
+    assert f'<source type="image/webp" srcset="{BASE}/listing-0/photo_w320.webp 320w"' in response.text
+    assert f'srcset="{BASE}/listing-0/photo_w320.jpg 320w"' in response.text
+    assert "data:image/jpeg;base64,AAAA" in response.text
+    assert DEFAULT_LISTING_SRCSET.replace("&", "&amp;") in response.text
+    assert 'loading="lazy"' in response.text
+
+
+if __name__ == "__main__":
+    print("Running image derivative tests...")
+    test_derivatives_widths_and_formats()
+    print("✓ WebP and JPEG derivatives at each width")
+    test_small_image_not_upscaled()
+    print("✓ Small images not upscaled")
+    test_transparent_png_flattened()
+    print("✓ Transparent PNG flattened")
+    test_upload_derivatives_paths()
+    print("✓ Derivatives stored next to the original")
+    test_upload_derivatives_invalid_image()
+    print("✓ Invalid image falls back to the original")
+    test_media_storage_paths()
+    print("✓ Derivatives deleted with the original")
+    test_photo_reference_round_trip()
+    print("✓ Photo references rebuild media rows")
+    test_listing_cards_emit_srcset()
+    print("✓ Cards emit srcset")
+    print("\n✅ All tests passed!")
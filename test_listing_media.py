@@ -0,0 +1,93 @@
+"""
+Test batched media lookup for listing grids
+"""
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from app.main import app, DEFAULT_LISTING_IMAGE
+from app import db
+
+client = TestClient(app)
+
+LISTINGS = [
+    {"id": f"listing-{i}", "title": f"Annonce {i}", "category": "Pompage", "status": "published",
+     "location": "Bretagne, FR", "summary": "Résumé", "condition": "Neuf", "price_display": "100 €"}
+    for i in range(5)
+]
+
+
+def test_first_media_single_query():
+    """One media query returns the first photo of every listing"""
+    mock_supabase = MagicMock()
+    query = mock_supabase.table.return_value.select.return_value.in_.return_value.eq.return_value.order.return_value
+    query.execute.return_value = MagicMock(data=[
+        {"listing_id": "a", "url": "https://cdn/a-0.jpg", "display_order": 0},
+        {"listing_id": "b", "url": "https://cdn/b-0.jpg", "display_order": 0},
+        {"listing_id": "a", "url": "https://cdn/a-1.jpg", "display_order": 1},
+    ])
+
+    db._listings_cache.invalidate()
+    with patch.object(db, "supabase", mock_supabase):
+        first_media = db.get_first_media_for_listings(["a", "b", "a"])
+
+    assert query.execute.call_count == 1
+    mock_supabase.table.return_value.select.return_value.in_.assert_called_once_with("listing_id", ["a", "b"])
+    assert first_media["a"]["url"] == "https://cdn/a-0.jpg"
+    assert first_media["b"]["url"] == "https://cdn/b-0.jpg"
+
+
+def test_first_media_empty_ids():
+    """No query is issued for an empty page"""
+    mock_supabase = MagicMock()
+    with patch.object(db, "supabase", mock_supabase):
+        assert db.get_first_media_for_listings([]) == {}
+    mock_supabase.table.assert_not_called()
+
+
+def test_listings_page_uses_one_media_lookup():
+    """/annonces attaches images with a single batched lookup"""
+    listings = [dict(listing) for listing in LISTINGS]
+    media = {"listing-0": {"listing_id": "listing-0", "url": "https://cdn/photo.jpg"}}
+
+    page = {"listings": listings, "next_cursor": None, "prev_cursor": None}
+
+    with patch.object(db, "get_published_listings_page", return_value=page), \
+         patch.object(db, "get_first_media_for_listings", return_value=media) as batched, \
+         patch.object(db, "get_listing_media") as per_listing:
+        response = client.get("/annonces")
+
+    assert response.status_code == 200
+    assert batched.call_count == 1
+    per_listing.assert_not_called()
+    assert "https://cdn/photo.jpg" in response.text
+    assert DEFAULT_LISTING_IMAGE.replace("&", "&amp;") in response.text
+
+
+def test_embedded_media_skips_media_lookup():
+    """Cards read with their first photo embedded need no media query"""
+    listings = [
+        {**LISTINGS[0], "media": [{"url": "https://cdn/embedded.jpg", "variants": [], "placeholder": None}]},
+        {**LISTINGS[1], "media": []},
+    ]
+    page = {"listings": listings, "next_cursor": None, "prev_cursor": None}
+
+    with patch.object(db, "get_published_listings_page", return_value=page), \
+         patch.object(db, "get_first_media_for_listings", return_value={}) as batched:
+        response = client.get("/annonces")
+
+    assert response.status_code == 200
+    batched.assert_called_once_with([])
+    assert "https://cdn/embedded.jpg" in response.text
+    assert DEFAULT_LISTING_IMAGE.replace("&", "&amp;") in response.text
+
+
+if __name__ == "__main__":
+    print("Running listing media tests...")
+    test_first_media_single_query()
+    print("✓ First media fetched in one query")
+    test_first_media_empty_ids()
+    print("✓ Empty page skips the media query")
+    test_listings_page_uses_one_media_lookup()
+    print("✓ /annonces uses one batched media lookup")
+    test_embedded_media_skips_media_lookup()
+    print("✓ Embedded media skips the media lookup")
+    print("\n✅ All tests passed!")
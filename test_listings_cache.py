@@ -0,0 +1,87 @@
+"""
+Test the TTL cache in front of public listing reads
+"""
+import time
+from unittest.mock import MagicMock, patch
+from app import db
+from app.cache import TTLCache
+
+
+def _published_query(mock_supabase):
+    """Return the mocked builder at the end of the get_published_listings chain"""
+    return (
+        mock_supabase.table.return_value.select.return_value
+        .eq.return_value.order.return_value.limit.return_value  # embedded first photo
+        .eq.return_value.gte.return_value.order.return_value
+        .limit.return_value.offset.return_value
+    )
+
+
+def test_ttl_cache_hit_miss_and_expiry():
+    """Entries are served until they expire and counters track lookups"""
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    assert cache.get_or_set("a", lambda: 1) == 1
+    assert cache.get_or_set("a", lambda: 2) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_ttl_cache_is_bounded():
+    """Least recently used entries are evicted past maxsize"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+
+def test_read_racing_an_invalidation_not_cached():
+    """A value computed while the cache is invalidated is returned but not stored"""
+    cache = TTLCache(maxsize=2, ttl=60)
+
+    def stale_read():
+        cache.invalidate()  # a write lands while the read is in flight
+        return "stale"
+
+    assert cache.get_or_set("a", stale_read) == "stale"
+    assert cache.get("a") is None
+    assert cache.get_or_set("a", lambda: "fresh") == "fresh"
+    assert cache.get("a") == "fresh"
+
+
+def test_published_listings_cached_and_invalidated_on_publish():
+    """Repeated reads hit the cache until a write path invalidates it"""
+    mock_supabase = MagicMock()
+    _published_query(mock_supabase).execute.return_value = MagicMock(data=[{"id": "l1", "title": "Pompe"}])
+    db._listings_cache.invalidate()
+
+    with patch.object(db, "supabase", mock_supabase):
+        first = db.get_published_listings(limit=6)
+        first[0]["image"] = "mutated"
+        second = db.get_published_listings(limit=6)
+        assert _published_query(mock_supabase).execute.call_count == 1
+        assert "image" not in second[0]
+
+        db.publish_listing("l2")
+        db.get_published_listings(limit=6)
+        assert _published_query(mock_supabase).execute.call_count == 2
+
+
+if __name__ == "__main__":
+    print("Running listings cache tests...")
+    test_ttl_cache_hit_miss_and_expiry()
+    print("✓ TTL expiry and hit/miss counters")
+    test_ttl_cache_is_bounded()
+    print("✓ Cache is bounded")
+    test_read_racing_an_invalidation_not_cached()
+    print("✓ Reads racing an invalidation not cached")
+    test_published_listings_cached_and_invalidated_on_publish()
+    print("✓ Published listings cached and invalidated on publish")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,182 @@
+"""
+Test replacing the photos of a wizard draft and writing its media rows
+"""
+import time
+from unittest.mock import MagicMock, patch
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.main import app, save_draft_listing
+from app import config, db, drafts, storage, uploads
+
+client = TestClient(app)
+
+BUCKET = config.SUPABASE_STORAGE_BUCKET
+BASE = f"https://proj.supabase.co/storage/v1/object/public/{BUCKET}"
+JPEG = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + b"\x00" * 100
+
+OLD_PHOTOS = [
+    {"path": "abc/old1.jpg", "filename": "old1.jpg", "variants": [[320, "image/webp"]]},
+    {"path": "abc/old2.jpg", "filename": "old2.jpg", "variants": []},
+]
+
+
+def post_photos(count):
+    client.cookies.set(drafts.COOKIE_NAME, drafts.encode({"id": "abc", "user_id": "user-1", "photos": OLD_PHOTOS}))
+    files = [("photos", (f"photo{i}.jpg", JPEG, "image/jpeg")) for i in range(count)]
+    return client.post("/deposer/step3", data={"listing_id": "abc"}, files=files, follow_redirects=False)
+
+
+def fake_store(delay=0.0, fail=()):
+    def store(supabase, bucket, path, photo, content_type, threshold):
+        time.sleep(delay)
+        if photo.filename in fail:
+            return None
+        return {"url": f"{BASE}/{path}", "variants": [], "placeholder": None}
+    return store
+
+
+def test_upload_file_single_bucket_handle():
+    """upload_file resolves the bucket once"""
+    mock_supabase = MagicMock()
+    mock_supabase.storage.from_.return_value.get_public_url.return_value = "https://cdn/x.jpg"
+    assert storage.upload_file(mock_supabase, BUCKET, "abc/x.jpg", b"data") == "https://cdn/x.jpg"
+    assert mock_supabase.storage.from_.call_count == 1
+
+
+def test_delete_files_single_request():
+    """Several objects are removed with one remove() call; nothing is sent for an empty list"""
+    mock_supabase = MagicMock()
+    assert storage.delete_files(mock_supabase, BUCKET, ["a.jpg", "b.jpg"])
+    mock_supabase.storage.from_.return_value.remove.assert_called_once_with(["a.jpg", "b.jpg"])
+
+    mock_supabase.reset_mock()
+    assert storage.delete_files(mock_supabase, BUCKET, [])
+    mock_supabase.storage.from_.assert_not_called()
+
+
+def test_add_media_bulk_single_insert():
+    """All media rows are inserted in one request"""
+    mock_supabase = MagicMock()
+    rows = [{"listing_id": "abc", "url": f"u{i}", "display_order": i} for i in range(3)]
+    mock_supabase.table.return_value.insert.return_value.execute.return_value = MagicMock(data=rows)
+    with patch.object(db, "supabase", mock_supabase):
+        assert db.add_media_bulk(rows) == rows
+    mock_supabase.table.return_value.insert.assert_called_once_with(rows)
+
+
+def test_replace_photos_concurrent_and_batched():
+    """Uploads overlap, the draft's old objects go in one remove(), no media row is written yet"""
+    mock_supabase = MagicMock()
+    with patch.object(db, "supabase", mock_supabase), \
+         patch.object(config, "MAX_PHOTOS_PER_LISTING", 3), \
+         patch.object(uploads, "store_photo", side_effect=fake_store(delay=0.2)), \
+         patch.object(db, "add_media_bulk") as bulk, \
+         patch.object(storage, "delete_files", return_value=True) as delete_files:
+        started = time.monotonic()
+        response = post_photos(3)
+        elapsed = time.monotonic() - started
+
+    assert response.status_code == 303
+    assert elapsed < 0.5  # three 0.2s uploads ran concurrently
+    bulk.assert_not_called()
+    delete_files.assert_called_once_with(mock_supabase, BUCKET, [
+        "abc/old1.jpg", "abc/old1_w320.webp", "abc/old1_placeholder.jpg", "abc/old2.jpg", "abc/old2_placeholder.jpg",
+    ])
+
+    # The cookie keeps storage references only, no URLs or placeholders
+    draft = drafts.decode(response.cookies[drafts.COOKIE_NAME])
+    assert [photo["filename"] for photo in draft["photos"]] == ["photo0.jpg", "photo1.jpg", "photo2.jpg"]
+    assert all(photo["path"].startswith("abc/") and set(photo) == {"path", "variants", "filename"}
+               for photo in draft["photos"])
+
+
+def test_replace_photos_failure_keeps_old_photos():
+    """If an upload fails, the draft keeps its photos and the new objects are cleaned up"""
+    mock_supabase = MagicMock()
+    with patch.object(db, "supabase", mock_supabase), \
+         patch.object(config, "MAX_PHOTOS_PER_LISTING", 2), \
+         patch.object(uploads, "store_photo", side_effect=fake_store(fail={"photo1.jpg"})), \
+         patch.object(storage, "delete_files", return_value=True) as delete_files:
+        response = post_photos(2)
+
+    assert response.status_code == 500
+    assert drafts.COOKIE_NAME not in response.cookies
+    original, placeholder = delete_files.call_args.args[2]
+    assert original.startswith("abc/") and "old" not in original
+    assert placeholder == storage.placeholder_path(original)
+
+
+def test_oversized_draft_rejected_before_upload():
+    """A draft too large for its cookies with the new photos is refused before any upload"""
+    small_draft = len(drafts.encode({"id": "abc", "user_id": "user-1", "photos": []}))
+    with patch.object(db, "supabase", MagicMock()), \
+         patch.object(config, "MAX_PHOTOS_PER_LISTING", 3), \
+         patch.object(config, "DRAFT_MAX_BYTES", small_draft + 200), \
+         patch.object(uploads, "store_photo") as store, \
+         patch.object(storage, "delete_files") as delete_files:
+        response = post_photos(3)
+
+    assert response.status_code == 400
+    assert "Trop de photos" in response.json()["detail"]
+    store.assert_not_called()
+    delete_files.assert_not_called()
+
+
+def test_save_draft_listing_bulk_media():
+    """Step 5 upserts the listing, then replaces all its media rows in one request"""
+    draft = {"id": "abc", "user_id": "user-1", "title": "Pompe", "photos": OLD_PHOTOS}
+    mock_supabase = MagicMock()
+    bucket = mock_supabase.storage.from_.return_value
+    bucket.get_public_url.side_effect = lambda path: f"{BASE}/{path}"
+    bucket.download.return_value = b"\xff\xd8tiny"
+    # Submitted once, or again after a cancelled or failed payment: same writes
+    for _ in range(2):
+        with patch.object(db, "supabase", mock_supabase), \
+             patch.object(db, "save_listing", return_value={"id": "abc"}) as save, \
+             patch.object(db, "delete_listing_media") as delete_rows, \
+             patch.object(db, "add_media_bulk") as bulk:
+            save_draft_listing(draft)
+
+        save.assert_called_once_with("user-1", {"id": "abc", "title": "Pompe"})
+        delete_rows.assert_called_once_with("abc")
+        rows = bulk.call_args.args[0]
+        assert [row["display_order"] for row in rows] == [0, 1]
+        # URLs and placeholders are rebuilt from the storage references
+        assert rows[0]["url"] == f"{BASE}/abc/old1.jpg"
+        assert rows[0]["variants"] == [{"width": 320, "type": "image/webp", "url": f"{BASE}/abc/old1_w320.webp"}]
+        assert rows[0]["placeholder"] == "data:image/jpeg;base64,/9h0aW55"
+
+
+def test_save_draft_listing_stops_when_media_not_deleted():
+    """If the previous media rows can't be removed, no new ones are inserted next to them"""
+    draft = {"id": "abc", "user_id": "user-1", "title": "Pompe", "photos": []}
+    with patch.object(db, "save_listing", return_value={"id": "abc"}), \
+         patch.object(db, "delete_listing_media", return_value=False), \
+         patch.object(db, "add_media_bulk") as bulk:
+        try:
+            save_draft_listing(draft)
+            assert False, "expected an HTTPException"
+        except HTTPException as e:
+            assert e.status_code == 500
+    bulk.assert_not_called()
+
+
+if __name__ == "__main__":
+    print("Running media replace tests...")
+    test_upload_file_single_bucket_handle()
+    print("✓ upload_file resolves the bucket once")
+    test_delete_files_single_request()
+    print("✓ Batched storage remove")
+    test_add_media_bulk_single_insert()
+    print("✓ Bulk media insert")
+    test_replace_photos_concurrent_and_batched()
+    print("✓ Concurrent uploads, batched delete")
+    test_replace_photos_failure_keeps_old_photos()
+    print("✓ Failed upload keeps old photos")
+    test_oversized_draft_rejected_before_upload()
+    print("✓ Oversized draft rejected before upload")
+    test_save_draft_listing_bulk_media()
+    print("✓ Step 5 writes listing and media in bulk")
+    test_save_draft_listing_stops_when_media_not_deleted()
+    print("✓ Step 5 stops when old media can't be deleted")
+    print("\n✅ All tests passed!")
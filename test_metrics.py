@@ -0,0 +1,120 @@
+"""
+Test per-request timings (Server-Timing header) and the /metrics endpoint
+"""
+import tempfile
+from unittest.mock import patch
+
+import httpx
+import jinja2
+from fastapi.testclient import TestClient
+
+from app import clients, config, db, metrics
+from app.main import app
+from app.sqlite_backend import SQLiteClient
+
+client = TestClient(app)
+
+
+def test_server_timing_header():
+    """Responses list the time spent in the database and in rendering"""
+    local = SQLiteClient(":memory:", tempfile.mkdtemp())
+    with patch.object(db, "supabase", local):
+        response = client.get("/admin/reports")
+    local.close()
+
+    assert response.status_code == 200
+    header = response.headers["server-timing"]
+    assert 'db;dur=' in header and 'desc="2 call(s)"' in header
+    assert "render;dur=" in header
+    assert "total;dur=" in header
+
+
+def test_metrics_endpoint_lists_route_histograms():
+    """/metrics exposes latency by route template and the cache/queue gauges"""
+    client.get("/annonces/unknown-listing")
+    body = client.get("/metrics").text
+
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/annonces/{listing_id}",status="404",le="+Inf"}' in body
+    assert 'http_request_round_trips_bucket{route="/annonces/{listing_id}",service="db",le="0"}' in body
+    # Monotonic figures are counters (rate() and reset handling work), levels are gauges
+    assert '# TYPE app_cache_hits_total counter' in body
+    assert '# TYPE app_queue_processed_total counter' in body
+    assert '# TYPE app_cache_size gauge' in body
+    assert 'app_queue_items{queue="stripe-webhooks"}' in body
+    # One HELP/TYPE header per metric family
+    assert body.count("# TYPE app_cache_hits_total counter") == 1
+
+
+def test_metrics_token():
+    """With METRICS_TOKEN set, scrapes need the bearer token"""
+    with patch.object(config, "METRICS_TOKEN", "secret"):
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+
+def test_histogram_format():
+    """Buckets are cumulative and end with +Inf, _sum and _count"""
+    histogram = metrics.Histogram("demo_seconds", "Demo", ("route",), (0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+
+    lines = histogram.samples()
+    assert lines[:2] == ["# HELP demo_seconds Demo", "# TYPE demo_seconds histogram"]
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{route="/a"} 3' in lines
+
+
+def test_http_hooks_record_supabase_calls():
+    """PostgREST and Storage requests are recorded under "db" and "storage" """
+    timings = metrics.RequestTimings()
+    token = metrics._current.set(timings)
+    try:
+        for path in ("/rest/v1/listings", "/storage/v1/object/listings/a.jpg"):
+            request = httpx.Request("GET", f"https://example.supabase.co{path}")
+            clients._start_timer(request)
+            clients._record_round_trip(httpx.Response(200, request=request, content=b"[]"))
+    finally:
+        metrics._current.reset(token)
+
+    assert timings.calls == {"db": 1, "storage": 1}
+
+
+def test_nested_renders_counted_once():
+    """Includes and macros rendered inside a template are part of its render time"""
+    env = jinja2.Environment(loader=jinja2.DictLoader({
+        "page.html": "{{ inner() }}",
+        "inner.html": "x",
+    }))
+    env.template_class = metrics.TimedTemplate
+    env.globals["inner"] = lambda: env.get_template("inner.html").render()
+
+    timings = metrics.RequestTimings()
+    token = metrics._current.set(timings)
+    try:
+        assert env.get_template("page.html").render() == "x"
+    finally:
+        metrics._current.reset(token)
+    assert timings.calls == {"render": 1}
+
+
+if __name__ == "__main__":
+    print("Running metrics tests...")
+    test_server_timing_header()
+    print("✓ Server-Timing header")
+    test_metrics_endpoint_lists_route_histograms()
+    print("✓ /metrics lists route histograms")
+    test_metrics_token()
+    print("✓ /metrics token")
+    test_histogram_format()
+    print("✓ Histogram format")
+    test_http_hooks_record_supabase_calls()
+    print("✓ Supabase calls recorded")
+    test_nested_renders_counted_once()
+    print("✓ Nested renders counted once")
+    print("\n✅ All tests passed!")
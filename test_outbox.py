@@ -0,0 +1,190 @@
+"""
+Test the persistent outbox used for contact emails
+"""
+import json
+import os
+import smtplib
+import tempfile
+import time
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app import config, outbox
+from app import email as email_module
+
+client = TestClient(app)
+
+FIELDS = {
+    "name": "Test User", "email": "user@example.com", "phone": None, "company": None,
+    "subject": "Test Subject", "reference": None, "message": "Test message",
+}
+
+
+def make_outbox(deliver, **kwargs):
+    return outbox.Outbox(tempfile.mkdtemp(), deliver, name="test-outbox", **kwargs)
+
+
+def test_enqueue_delivers_in_background():
+    """Spooled messages are delivered by the worker and removed from the spool"""
+    delivered = []
+    box = make_outbox(delivered.append)
+    for i in range(3):
+        box.enqueue({"n": i})
+    assert box.drain(timeout=5)
+    box.stop()
+
+    assert [m["n"] for m in delivered] == [0, 1, 2]
+    assert box.pending() == []
+    assert box.sent == 3
+
+
+def test_failed_pass_retried_with_backoff():
+    """A failing delivery keeps the message spooled and the pass is retried"""
+    deliver = MagicMock(side_effect=[smtplib.SMTPServerDisconnected(), None])
+    box = make_outbox(deliver, backoff_base=0.01)
+    box.enqueue({"n": 1})
+    box.drain(timeout=5)
+    time.sleep(0.05)
+    assert box.drain(timeout=5)
+    box.stop()
+
+    assert deliver.call_count == 2
+    assert box.pending() == []
+
+
+def test_unsent_messages_survive_restart():
+    """Messages spooled by a previous process are delivered on start()"""
+    directory = tempfile.mkdtemp()
+    with open(os.path.join(directory, "1-old.json"), "w") as f:
+        json.dump({"n": "old"}, f)
+
+    delivered = []
+    box = outbox.Outbox(directory, delivered.append, name="test-outbox")
+    assert box.start() == 1
+    assert box.drain(timeout=5)
+    box.stop()
+
+    assert delivered == [{"n": "old"}]
+
+
+def test_undeliverable_message_set_aside():
+    """A permanently rejected message moves to failed/ without blocking the others"""
+    def deliver(data):
+        if data["n"] == 0:
+            raise outbox.UndeliverableMessage("550 no such user")
+
+    box = make_outbox(deliver)
+    box.enqueue({"n": 0})
+    box.enqueue({"n": 1})
+    assert box.drain(timeout=5)
+    box.stop()
+
+    assert box.pending() == []
+    assert len(os.listdir(box.failed_directory)) == 1
+    assert (box.sent, box.rejected) == (1, 1)
+
+
+def test_processes_sharing_the_spool_send_once():
+    """Workers of several processes flushing the same spool claim each message once"""
+    directory = tempfile.mkdtemp()
+    for i in range(30):
+        with open(os.path.join(directory, f"{i:03d}-msg.json"), "w") as f:
+            json.dump({"n": i}, f)
+
+    delivered = []
+    def deliver(data):
+        time.sleep(0.001)
+        delivered.append(data["n"])
+
+    boxes = [outbox.Outbox(directory, deliver, name=f"test-outbox-{i}") for i in range(3)]
+    for box in boxes:
+        box.start()
+    for box in boxes:
+        assert box.drain(timeout=5)
+        box.stop()
+
+    assert sorted(delivered) == list(range(30))
+    assert sum(box.sent for box in boxes) == 30
+    assert os.listdir(directory) == []
+
+
+def test_abandoned_claims_requeued():
+    """A message claimed by a process that died mid-send is requeued once the claim is stale"""
+    directory = tempfile.mkdtemp()
+    for name in ("1-stale.json.sending", "2-fresh.json.sending"):
+        with open(os.path.join(directory, name), "w") as f:
+            json.dump({"n": name}, f)
+    old = time.time() - 3600
+    os.utime(os.path.join(directory, "1-stale.json.sending"), (old, old))
+
+    delivered = []
+    box = outbox.Outbox(directory, delivered.append, name="test-outbox", claim_timeout=600)
+    assert box.start() == 1
+    assert box.drain(timeout=5)
+    box.stop()
+
+    assert delivered == [{"n": "1-stale.json.sending"}]
+    # Possibly still being sent by another process: left alone
+    assert os.listdir(directory) == ["2-fresh.json.sending"]
+
+
+@patch('app.email.smtplib.SMTP')
+def test_contact_emails_share_one_smtp_session(mock_smtp_class):
+    """Queued contact emails are sent over one authenticated connection"""
+    from app import clients
+    clients.close_smtp_sessions()
+    box = make_outbox(email_module._deliver_contact_email)
+    with patch.object(config, "SMTP_HOST", "smtp.example.com"), \
+         patch.object(config, "SMTP_USER", "test@example.com"), \
+         patch.object(config, "SMTP_PASSWORD", "password"):
+        for _ in range(3):
+            box.enqueue(FIELDS)
+        assert box.drain(timeout=5)
+    box.stop()
+    clients.close_smtp_sessions()
+
+    mock_smtp_class.assert_called_once()
+    mock_smtp_class.return_value.login.assert_called_once()
+    assert mock_smtp_class.return_value.send_message.call_count == 3
+
+
+def test_contact_post_only_queues():
+    """POST /contact spools the email and responds without talking to SMTP"""
+    box = make_outbox(MagicMock())
+    with patch.object(config, "SMTP_HOST", "smtp.example.com"), \
+         patch.object(email_module, "contact_outbox", box), \
+         patch.object(box.worker, "submit") as submit, \
+         patch.object(email_module, "_smtp_session") as send_now:
+        response = client.post("/contact", data={
+            "name": "Test User", "email": "user@example.com",
+            "subject": "test-subject", "message": "Bonjour",
+        })
+
+    assert response.status_code == 200
+    assert "Message envoyé !" in response.text
+    send_now.assert_not_called()
+    submit.assert_called_once()
+    [path] = box.pending()
+    with open(path) as f:
+        assert json.load(f)["message"] == "Bonjour"
+
+
+if __name__ == "__main__":
+    print("Running outbox tests...")
+    test_enqueue_delivers_in_background()
+    print("✓ Messages delivered in the background")
+    test_failed_pass_retried_with_backoff()
+    print("✓ Failed deliveries retried")
+    test_unsent_messages_survive_restart()
+    print("✓ Unsent messages survive a restart")
+    test_undeliverable_message_set_aside()
+    print("✓ Undeliverable messages set aside")
+    test_processes_sharing_the_spool_send_once()
+    print("✓ Processes sharing the spool send each message once")
+    test_abandoned_claims_requeued()
+    print("✓ Abandoned claims requeued")
+    test_contact_emails_share_one_smtp_session()
+    print("✓ Contact emails share one SMTP session")
+    test_contact_post_only_queues()
+    print("✓ POST /contact only queues the email")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,124 @@
+"""
+Test keyset (cursor) pagination of /annonces
+"""
+import base64
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app import db
+
+client = TestClient(app)
+
+
+def _listing(i):
+    return {
+        "id": f"00000000-0000-0000-0000-{i:012d}",
+        "published_at": f"2026-01-{i:02d}T10:00:00.123456+00:00",
+        "title": f"Annonce {i}",
+        "category": "Pompage",
+        "status": "published",
+    }
+
+
+def _page_query(mock_supabase):
+    """Return the mocked builder before the .or_() keyset filter"""
+    # select() is followed by the embedded first-photo filter, order and limit
+    cards = mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.limit.return_value
+    return cards.eq.return_value.gte.return_value
+
+
+def test_cursor_round_trip():
+    """Cursors are opaque and decode back to (published_at, id)"""
+    listing = _listing(3)
+    cursor = db.encode_cursor(listing)
+    assert "|" not in cursor
+    assert db.decode_cursor(cursor) == (listing["published_at"], listing["id"])
+
+
+def test_invalid_cursor_is_ignored():
+    """Malformed cursors fall back to the first page"""
+    assert db.decode_cursor(None) is None
+    assert db.decode_cursor("not-a-cursor!") is None
+
+
+def test_tampered_cursor_is_ignored():
+    """A cursor decoding to something else than a timestamp and a UUID never reaches the filter"""
+    def forge(raw):
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    listing = _listing(3)
+    tampered = [
+        forge(f'{listing["published_at"]}|{listing["id"]}),status.neq.published,or(id.is.null'),
+        forge(f'2026-01-03",status.neq.published|{listing["id"]}'),
+        forge("yesterday|listing-3"),
+    ]
+    mock_supabase = MagicMock()
+    _page_query(mock_supabase).order.return_value.order.return_value.limit.return_value.execute.return_value.data = []
+    with patch.object(db, "supabase", mock_supabase):
+        for cursor in tampered:
+            assert db.decode_cursor(cursor) is None
+            page = db.get_published_listings_page(limit=2, after=cursor, before=cursor)
+            assert page["prev_cursor"] is None
+    _page_query(mock_supabase).or_.assert_not_called()
+
+
+def test_first_page_has_next_cursor_only():
+    """The first page fetches limit + 1 rows and exposes a next cursor"""
+    mock_supabase = MagicMock()
+    rows = [_listing(i) for i in (5, 4, 3)]
+    ordered = _page_query(mock_supabase).order.return_value.order.return_value.limit.return_value
+    ordered.execute.return_value = MagicMock(data=rows)
+    db._listings_cache.invalidate()
+
+    with patch.object(db, "supabase", mock_supabase):
+        page = db.get_published_listings_page(limit=2)
+
+    _page_query(mock_supabase).order.return_value.order.return_value.limit.assert_called_once_with(3)
+    assert [l["id"] for l in page["listings"]] == [rows[0]["id"], rows[1]["id"]]
+    assert page["prev_cursor"] is None
+    assert db.decode_cursor(page["next_cursor"]) == (rows[1]["published_at"], rows[1]["id"])
+
+
+def test_after_cursor_filters_on_keyset():
+    """Following a cursor filters on (published_at, id) instead of using an offset"""
+    mock_supabase = MagicMock()
+    cursor_row = _listing(4)
+    filtered = _page_query(mock_supabase).or_.return_value
+    filtered.order.return_value.order.return_value.limit.return_value.execute.return_value = MagicMock(data=[_listing(3)])
+    db._listings_cache.invalidate()
+
+    with patch.object(db, "supabase", mock_supabase):
+        page = db.get_published_listings_page(limit=2, after=db.encode_cursor(cursor_row))
+
+    keyset_filter = _page_query(mock_supabase).or_.call_args[0][0]
+    assert f'published_at.lt."{cursor_row["published_at"]}"' in keyset_filter
+    assert f'id.lt.{cursor_row["id"]}' in keyset_filter
+    assert page["next_cursor"] is None
+    assert page["prev_cursor"] is not None
+
+
+def test_listings_route_renders_pagination_links():
+    """/annonces renders next/prev links from the page cursors"""
+    page = {"listings": [_listing(1)], "next_cursor": "NEXT", "prev_cursor": "PREV"}
+    with patch.object(db, "get_published_listings_page", return_value=page) as get_page, \
+         patch.object(db, "get_first_media_for_listings", return_value={}):
+        response = client.get("/annonces?after=CURSOR")
+
+    assert response.status_code == 200
+    assert get_page.call_args.kwargs["after"] == "CURSOR"
+    assert "/annonces?after=NEXT" in response.text
+    assert "/annonces?before=PREV" in response.text
+
+
+if __name__ == "__main__":
+    print("Running pagination tests...")
+    test_cursor_round_trip()
+    test_invalid_cursor_is_ignored()
+    test_tampered_cursor_is_ignored()
+    print("✓ Cursor encoding")
+    test_first_page_has_next_cursor_only()
+    test_after_cursor_filters_on_keyset()
+    print("✓ Keyset queries")
+    test_listings_route_renders_pagination_links()
+    print("✓ Pagination links rendered")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,116 @@
+"""
+Test the in-app scheduler and single-request listing expiry
+"""
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock, patch
+from app import db, search
+from app.scheduler import Scheduler
+
+
+def test_expire_single_round_trip():
+    """Expiry is one UPDATE ... RETURNING: no count query, expired rows leave the index"""
+    search.listing_index.add({"id": "old-1", "title": "Pompe", "status": "published"})
+    mock_supabase = MagicMock()
+    update = mock_supabase.table.return_value.update
+    update.return_value.eq.return_value.lt.return_value.execute.return_value = MagicMock(
+        data=[{"id": "old-1"}, {"id": "old-2"}]
+    )
+    with patch.object(db, "supabase", mock_supabase):
+        assert db.expire_old_listings() == 2
+
+    assert mock_supabase.table.call_count == 1
+    mock_supabase.table.return_value.select.assert_not_called()
+    assert update.call_args[0][0]["status"] == "expired"
+    assert search.listing_index.search("pompe") == []
+
+
+def test_jobs_run_on_interval_with_metrics():
+    """Jobs run periodically and each run's result is recorded"""
+    results = iter([3, 0, 1, 0, 0, 0, 0, 0])
+    scheduler = Scheduler()
+    scheduler.every(0.02, "expire", lambda: next(results))
+    scheduler.start()
+    time.sleep(0.15)
+    scheduler.stop()
+
+    stats = scheduler.stats()["jobs"]["expire"]
+    assert stats["runs"] >= 3
+    assert stats["total"] == 4
+    assert stats["history"][0]["result"] == 3
+    assert stats["errors"] == 0
+
+
+def test_failing_job_recorded():
+    """An exception is counted and logged without stopping the scheduler"""
+    scheduler = Scheduler()
+    scheduler.every(60, "broken", MagicMock(side_effect=RuntimeError("timeout")))
+    assert scheduler.run_job("broken") is None
+    stats = scheduler.stats()["jobs"]["broken"]
+    assert (stats["runs"], stats["errors"], stats["last_error"]) == (1, 1, "timeout")
+
+
+def test_expiry_errors_reach_the_scheduler():
+    """A failed expiry UPDATE is counted as a job error, not reported as 0 listings expired"""
+    mock_supabase = MagicMock()
+    mock_supabase.table.return_value.update.return_value.eq.return_value.lt.return_value.execute.side_effect = (
+        RuntimeError("connection reset")
+    )
+    scheduler = Scheduler()
+    scheduler.every(60, "expire_listings", db.expire_old_listings)
+    with patch.object(db, "supabase", mock_supabase):
+        assert scheduler.run_job("expire_listings") is None
+
+    stats = scheduler.stats()["jobs"]["expire_listings"]
+    assert (stats["errors"], stats["last_error"], stats["total"]) == (1, "connection reset", 0)
+
+
+def test_only_one_process_holds_the_lock():
+    """A second scheduler on the same lock file doesn't run jobs until the first stops"""
+    lock_path = os.path.join(tempfile.mkdtemp(), "scheduler.lock")
+    first, second = Scheduler(lock_path), Scheduler(lock_path)
+    assert first.is_leader()
+    assert not second.is_leader()
+    first.stop()
+    assert second.is_leader()
+    second.stop()
+
+
+def test_concurrent_leader_checks_agree():
+    """Threads of the lock holder checking leadership at once never lock the process out"""
+    lock_path = os.path.join(tempfile.mkdtemp(), "scheduler.lock")
+    for _ in range(20):
+        scheduler = Scheduler(lock_path)
+        barrier = threading.Barrier(8)
+        results = []
+
+        def check():
+            barrier.wait()
+            results.append(scheduler.is_leader())
+
+        threads = [threading.Thread(target=check) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        scheduler.stop()
+        assert results == [True] * 8
+
+
+if __name__ == "__main__":
+    print("Running scheduler tests...")
+    test_expire_single_round_trip()
+    print("✓ Listing expiry in one round-trip")
+    test_jobs_run_on_interval_with_metrics()
+    print("✓ Jobs run on their interval with metrics")
+    test_failing_job_recorded()
+    print("✓ Failing jobs recorded")
+    test_expiry_errors_reach_the_scheduler()
+    print("✓ Expiry errors reach the scheduler")
+    test_only_one_process_holds_the_lock()
+    print("✓ Only one process holds the scheduler lock")
+    test_concurrent_leader_checks_agree()
+    print("✓ Concurrent leader checks agree")
+    print("\n✅ All tests passed!")
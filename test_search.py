@@ -0,0 +1,107 @@
+"""
+Test the accent-folded full-text search index
+"""
+import time
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app import db, search
+from app.search import SearchIndex, fold, tokenize
+
+client = TestClient(app)
+
+LISTINGS = [
+    {"id": "1", "status": "published", "title": "Module d'épuration biogaz PSA", "category": "Épuration",
+     "summary": "Unité PSA complète", "description": "Production de biométhane", "manufacturer": "CarboTech",
+     "published_at": "2026-01-03T10:00:00+00:00", "expires_at": "2099-01-01T00:00:00+00:00"},
+    {"id": "2", "status": "published", "title": "Pompe à membrane pour digestat", "category": "Pompage",
+     "summary": "Pompe 12 m³/h", "description": "Compatible biogaz, révision complète", "manufacturer": "Vogelsang",
+     "published_at": "2026-01-02T10:00:00+00:00", "expires_at": "2099-01-01T00:00:00+00:00"},
+    {"id": "3", "status": "published", "title": "Désulfurisation biologique", "category": "Épuration",
+     "summary": "Colonne charbon actif", "description": "Protection des moteurs", "manufacturer": "BioControl",
+     "published_at": "2026-01-01T10:00:00+00:00", "expires_at": "2099-01-01T00:00:00+00:00"},
+]
+
+
+def _index():
+    index = SearchIndex()
+    index.rebuild(LISTINGS)
+    return index
+
+
+def test_accent_folding():
+    """Accents, case and ligatures are folded"""
+    assert fold("Épuration Cœur") == "epuration coeur"
+    assert tokenize("Pompe à membrane") == ["pompe", "membrane"]
+
+
+def test_search_matches_unaccented_query():
+    """'epuration' matches listings titled or categorised 'Épuration'"""
+    results = _index().search("epuration")
+    assert [listing["id"] for listing in results][:1] == ["1"]
+    assert {listing["id"] for listing in results} == {"1", "3"}
+
+
+def test_search_ranks_title_matches_first_and_requires_all_terms():
+    """Title matches outrank description matches and every term must match"""
+    index = _index()
+    assert [listing["id"] for listing in index.search("biogaz")] == ["1", "2"]
+    assert [listing["id"] for listing in index.search("pompe vogelsang")] == ["2"]
+    assert index.search("pompe carbotech") == []
+
+
+def test_search_prefix_and_incremental_updates():
+    """Prefixes match and the index follows publish/expire incrementally"""
+    index = _index()
+    assert [listing["id"] for listing in index.search("vogel")] == ["2"]
+
+    index.remove("2")
+    assert index.search("vogel") == []
+
+    index.add({**LISTINGS[1], "title": "Pompe doseuse"})
+    assert [listing["id"] for listing in index.search("doseuse")] == ["2"]
+
+    index.add({**LISTINGS[1], "status": "expired"})
+    assert index.search("doseuse") == []
+
+
+def test_search_skips_expired_listings():
+    """Listings past expires_at are never returned even before the index is refreshed"""
+    index = SearchIndex()
+    index.add({**LISTINGS[0], "expires_at": "2020-01-01T00:00:00+00:00"})
+    assert index.search("psa") == []
+
+
+def test_search_is_sub_millisecond():
+    """A query over a few thousand listings is answered without scanning rows"""
+    index = SearchIndex()
+    index.rebuild({**LISTINGS[i % 3], "id": str(i)} for i in range(3000))
+    start = time.perf_counter()
+    index.search("epuration psa")
+    assert time.perf_counter() - start < 0.05
+
+
+def test_annonces_search_route():
+    """/annonces?q= serves ranked results from the index"""
+    search.listing_index.rebuild(LISTINGS)
+    with patch.object(db, "get_first_media_for_listings", return_value={}), \
+         patch.object(db, "get_published_listings_page") as get_page:
+        response = client.get("/annonces", params={"q": "epuration"})
+
+    get_page.assert_not_called()
+    assert response.status_code == 200
+    assert "Module d&#39;épuration biogaz PSA" in response.text
+    assert "Pompe à membrane" not in response.text
+    search.listing_index.built_at = None
+
+
+if __name__ == "__main__":
+    print("Running search tests...")
+    test_accent_folding()
+    test_search_matches_unaccented_query()
+    test_search_ranks_title_matches_first_and_requires_all_terms()
+    test_search_prefix_and_incremental_updates()
+    test_search_skips_expired_listings()
+    test_search_is_sub_millisecond()
+    test_annonces_search_route()
+    print("\n✅ All tests passed!")
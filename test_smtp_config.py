@@ -6,7 +6,7 @@ Run with: python test_smtp_config.py
 import asyncio
 import sys
 from app import config
-from app.email import send_contact_email
+from app.email import _deliver_contact_email
 
 async def test_smtp():
     print("=" * 60)
@@ -41,16 +41,21 @@ async def test_smtp():
     print(f"  Subject: SMTP Configuration Test")
     print()
     
-    # Send test email
-    success = await send_contact_email(
-        name="Test User",
-        email="test@example.com",
-        phone="+33123456789",
-        company="Test Company",
-        subject="SMTP Configuration Test",
-        reference=None,
-        message="This is a test email from the SMTP configuration test script."
-    )
+    # Send test email directly (bypassing the outbox) to see SMTP errors here
+    try:
+        await asyncio.to_thread(_deliver_contact_email, {
+            "name": "Test User",
+            "email": "test@example.com",
+            "phone": "+33123456789",
+            "company": "Test Company",
+            "subject": "SMTP Configuration Test",
+            "reference": None,
+            "message": "This is a test email from the SMTP configuration test script.",
+        })
+        success = True
+    except Exception as e:
+        print(f"❌ {type(e).__name__}: {e}")
+        success = False
     
     print()
     if success:
@@ -0,0 +1,139 @@
+"""
+Test the local SQLite backend behind app/db.py
+"""
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from app import db, storage
+from app.sqlite_backend import SQLiteClient
+
+LISTING = {
+    "title": "Pompe à lobes", "category": "Pompage", "location": "Bretagne, FR",
+    "contact_email": "vendeur@example.fr", "contact_phone": "0600000000",
+    "technical_specs": {"debit": "20 m3/h"},
+}
+
+
+def sqlite_db():
+    db._listings_cache.invalidate()
+    db._users_cache.invalidate()
+    return patch.object(db, "supabase", SQLiteClient(":memory:", tempfile.mkdtemp()))
+
+
+def test_users_upsert_on_email():
+    """get_or_create_user resolves the same row for an email and updates given fields"""
+    with sqlite_db():
+        first = db.get_or_create_user("vendeur@example.fr")
+        db._users_cache.invalidate()
+        second = db.get_or_create_user("vendeur@example.fr", phone="0600000000")
+
+    assert first["id"] == second["id"]
+    assert second["phone"] == "0600000000"
+
+
+def test_listing_lifecycle_and_pagination():
+    """Listings are created, published, paginated by cursor and expired"""
+    with sqlite_db():
+        user = db.get_or_create_user("vendeur@example.fr")
+        ids = []
+        for i in range(5):
+            listing = db.create_listing(user["id"], {**LISTING, "title": f"Pompe {i}"})
+            db.publish_listing(listing["id"])
+            ids.append(listing["id"])
+
+        assert db.get_listing(ids[0])["technical_specs"] == {"debit": "20 m3/h"}
+
+        first = db.get_published_listings_page(limit=2)
+        second = db.get_published_listings_page(limit=2, after=first["next_cursor"])
+        back = db.get_published_listings_page(limit=2, before=second["prev_cursor"])
+        assert len(first["listings"]) == 2 and len(second["listings"]) == 2
+        assert not {l["id"] for l in first["listings"]} & {l["id"] for l in second["listings"]}
+        assert [l["id"] for l in back["listings"]] == [l["id"] for l in first["listings"]]
+
+        stats = db.get_catalogue_stats()
+        assert stats == {"total": 5, "categories": {"Pompage": 5}, "countries": 1}
+
+        past = (datetime.utcnow() - timedelta(days=1)).isoformat()
+        db.supabase.table("listings").update({"expires_at": past}).eq("id", ids[0]).execute()
+        assert db.expire_old_listings() == 1
+        assert db.get_listing(ids[0])["status"] == "expired"
+
+
+def test_media_and_storage():
+    """Photos are stored locally and the first photo of each listing is found in one query"""
+    with sqlite_db():
+        user = db.get_or_create_user("vendeur@example.fr")
+        listing = db.create_listing(user["id"], LISTING)
+        url = storage.upload_file(db.supabase, "listing-photos", f"{listing['id']}/a.jpg", b"jpeg")
+        assert url == f"/storage/v1/object/public/listing-photos/{listing['id']}/a.jpg"
+
+        db.add_media_bulk([
+            {"listing_id": listing["id"], "media_type": "photo", "url": url, "display_order": 1},
+            {"listing_id": listing["id"], "media_type": "photo", "url": "first", "display_order": 0,
+             "variants": [{"width": 320, "type": "image/webp", "url": "w320"}]},
+        ])
+        first = db.get_first_media_for_listings([listing["id"]])[listing["id"]]
+        assert first["url"] == "first"
+        assert first["variants"][0]["width"] == 320
+
+        assert db.delete_listing_media(listing["id"])
+        assert db.get_listing_media(listing["id"]) == []
+
+
+def test_cards_embed_first_photo():
+    """Card queries return only card columns and the first photo, in one query"""
+    with sqlite_db():
+        user = db.get_or_create_user("vendeur@example.fr")
+        with_photos = db.create_listing(user["id"], {**LISTING, "description": "Longue description"})
+        without_photo = db.create_listing(user["id"], LISTING)
+        for listing in (with_photos, without_photo):
+            db.publish_listing(listing["id"])
+        db.add_media_bulk([
+            {"listing_id": with_photos["id"], "media_type": "photo", "url": f"https://cdn/{order}.jpg",
+             "display_order": order}
+            for order in (2, 0, 1)
+        ])
+
+        cards = {card["id"]: card for card in db.get_published_listings()}
+        detail = db.get_listing(with_photos["id"])
+
+    card = cards[with_photos["id"]]
+    assert "description" not in card and "technical_specs" not in card and "contact_email" not in card
+    assert card["media"] == [{"url": "https://cdn/0.jpg", "variants": [], "placeholder": None}]
+    assert cards[without_photo["id"]]["media"] == []
+    assert detail["description"] == "Longue description"
+    assert detail["media"][0]["url"] == "https://cdn/0.jpg"
+
+
+def test_reports_and_stripe_events():
+    """Report counters use the rpc equivalent and Stripe events are deduplicated"""
+    with sqlite_db():
+        report = db.create_report("https://example.fr/annonce/1", "spam", "Annonce douteuse")
+        db.create_report("https://example.fr/annonce/2", "spam", "Doublon")
+        db.update_report_status(report["id"], "resolved")
+        assert db.get_report_status_counts() == {"new": 1, "reviewed": 0, "resolved": 1, "total": 2}
+
+        assert db.record_stripe_event("evt_1", "checkout.session.completed", {"id": "evt_1"})
+        assert not db.record_stripe_event("evt_1", "checkout.session.completed", {"id": "evt_1"})
+        assert [e["id"] for e in db.get_pending_stripe_events()] == ["evt_1"]
+        assert not db.stripe_event_needs_retry("evt_1")
+        db.mark_stripe_event_processed("evt_1", error="timeout")
+        assert db.stripe_event_needs_retry("evt_1")
+        db.mark_stripe_event_processed("evt_1")
+        assert not db.stripe_event_needs_retry("evt_1")
+        assert db.get_pending_stripe_events() == []
+
+
+if __name__ == "__main__":
+    print("Running SQLite backend tests...")
+    test_users_upsert_on_email()
+    print("✓ Users upserted on email")
+    test_listing_lifecycle_and_pagination()
+    print("✓ Listing lifecycle, pagination, stats and expiry")
+    test_media_and_storage()
+    print("✓ Media rows and local storage")
+    test_cards_embed_first_photo()
+    print("✓ Card queries embed the first photo")
+    test_reports_and_stripe_events()
+    print("✓ Report counters and Stripe event dedupe")
+    print("\n✅ All tests passed!")
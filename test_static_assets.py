@@ -0,0 +1,137 @@
+"""
+Test fingerprinted static assets
+"""
+import gzip
+import re
+from fastapi.testclient import TestClient
+from app.main import app
+from app import assets
+
+client = TestClient(app)
+
+with open("app/static/js/cookie-consent.js", "rb") as f:
+    COOKIE_JS = f.read()
+
+
+def fingerprinted_url(path):
+    url = assets.static_url(path)
+    assert re.fullmatch(r"/static/" + re.escape(path.rsplit(".", 1)[0]) + r"\.[0-9a-f]{12}\.\w+", url), url
+    return url
+
+
+def test_pages_link_fingerprinted_assets():
+    """Pages reference hashed URLs for CSS and JS"""
+    response = client.get("/contact")
+    assert response.status_code == 200
+    for path in ("css/styles.css", "js/app.js", "js/cookie-consent.js"):
+        assert fingerprinted_url(path) in response.text
+    assert '"/static/css/styles.css"' not in response.text
+
+
+def test_fingerprinted_asset_immutable():
+    """Hashed URLs are cacheable forever and revalidate with the ETag"""
+    url = fingerprinted_url("js/cookie-consent.js")
+    response = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.content == COOKIE_JS
+    assert "immutable" in response.headers["cache-control"]
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-type"].startswith(("text/javascript", "application/javascript"))
+
+    cached = client.get(url, headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+
+def test_precompressed_variants():
+    """gzip and brotli variants are served according to Accept-Encoding"""
+    url = fingerprinted_url("js/cookie-consent.js")
+    asset = assets.manifest.get("js/cookie-consent.js")
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(asset.encodings["gzip"])
+    assert gzip.decompress(asset.encodings["gzip"]) == COOKIE_JS
+    assert response.content == COOKIE_JS  # decoded by the client
+
+    if assets.brotli is not None:
+        response = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+        assert response.headers["content-encoding"] == "br"
+        assert int(response.headers["content-length"]) < len(asset.encodings["gzip"])
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in response.headers
+
+
+def test_plain_url_still_served():
+    """Unfingerprinted URLs keep working with a short cache lifetime"""
+    response = client.get("/static/js/cookie-consent.js")
+    assert response.status_code == 200
+    assert response.content == COOKIE_JS
+    assert response.headers["cache-control"] == assets.DEFAULT_CACHE_CONTROL
+    assert client.get("/static/js/missing.js").status_code == 404
+
+
+def test_fingerprint_changes_with_content(tmp_path):
+    """The hash follows the file content"""
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text("body { color: red; }")
+    first = assets.AssetManifest(str(tmp_path)).build().get("css/site.css").fingerprinted_path
+    (tmp_path / "css" / "site.css").write_text("body { color: blue; }")
+    second = assets.AssetManifest(str(tmp_path)).build().get("css/site.css").fingerprinted_path
+    assert first != second
+    assert first.startswith("css/site.") and first.endswith(".css")
+
+
+def test_compressed_on_first_request(tmp_path, monkeypatch):
+    """Building the manifest only hashes; each asset is compressed once, when first served"""
+    calls = []
+    compress = assets._compress
+    monkeypatch.setattr(assets, "_compress", lambda content, media_type: calls.append(media_type) or compress(content, media_type))
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text("body { color: red; }\n" * 200)
+    manifest = assets.AssetManifest(str(tmp_path)).build()
+    assert calls == []
+
+    from fastapi import FastAPI
+    site = FastAPI()
+    site.mount("/static", assets.FingerprintedStaticFiles(directory=str(tmp_path), manifest=manifest))
+    url = "/static/" + manifest.get("css/site.css").fingerprinted_path
+    with TestClient(site) as site_client:
+        for _ in range(2):
+            response = site_client.get(url, headers={"Accept-Encoding": "gzip"})
+            assert response.headers["content-encoding"] == "gzip"
+    assert calls == ["text/css"]
+
+
+def test_accepted_encodings():
+    assert assets.accepted_encodings("gzip, deflate, br") == {"gzip", "deflate", "br"}
+    assert assets.accepted_encodings("br;q=0, gzip;q=0.5") == {"gzip"}
+    assert assets.accepted_encodings(None) == set()
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("Running static asset tests...")
+    test_pages_link_fingerprinted_assets()
+    print("✓ Pages link fingerprinted assets")
+    test_fingerprinted_asset_immutable()
+    print("✓ Immutable caching and ETag")
+    test_precompressed_variants()
+    print("✓ Precompressed variants")
+    test_plain_url_still_served()
+    print("✓ Plain URLs still served")
+    with tempfile.TemporaryDirectory() as directory:
+        test_fingerprint_changes_with_content(Path(directory))
+    print("✓ Fingerprint follows content")
+    with tempfile.TemporaryDirectory() as directory:
+        import pytest
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            test_compressed_on_first_request(Path(directory), monkeypatch)
+    print("✓ Compressed on first request")
+    test_accepted_encodings()
+    print("✓ Accept-Encoding parsing")
+    print("\n✅ All tests passed!")
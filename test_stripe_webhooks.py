@@ -0,0 +1,155 @@
+"""
+Test deduplicated, queued Stripe webhook processing
+"""
+import json
+import os
+import tempfile
+import time
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app import config, db, webhooks
+from app.scheduler import Scheduler
+
+client = TestClient(app)
+
+
+def make_event(event_id):
+    return {
+        "id": event_id,
+        "type": "checkout.session.completed",
+        "data": {"object": {"id": "cs_test_1", "payment_intent": "pi_1"}},
+    }
+
+
+def post_event(event):
+    payload = json.dumps(event)
+    with patch.object(config, "STRIPE_WEBHOOK_SECRET", "whsec_test"), \
+         patch("stripe.Webhook.construct_event", return_value=event):
+        return client.post("/webhook/stripe", content=payload, headers={"stripe-signature": "t=1,v1=x"})
+
+
+def test_acknowledges_before_processing():
+    """The endpoint records and queues the event, then answers without running the handler"""
+    webhooks._seen_events.invalidate()
+    with patch.object(db, "record_stripe_event", return_value=True) as record, \
+         patch.object(webhooks.worker, "submit") as submit, \
+         patch.object(db, "publish_listing") as publish:
+        response = post_event(make_event("evt_ack"))
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "success"}
+    record.assert_called_once()
+    assert submit.call_args[0][0]["id"] == "evt_ack"
+    publish.assert_not_called()
+
+
+def test_duplicate_event_processed_once():
+    """A Stripe retry of a recorded event is acknowledged without being queued again"""
+    webhooks._seen_events.invalidate()
+    with patch.object(db, "record_stripe_event", side_effect=[True, False]) as record, \
+         patch.object(webhooks.worker, "submit") as submit:
+        assert post_event(make_event("evt_dup")).json() == {"status": "success"}
+        assert post_event(make_event("evt_dup")).json() == {"status": "duplicate"}
+        webhooks._seen_events.invalidate()
+        assert post_event(make_event("evt_dup")).json() == {"status": "duplicate"}
+
+    assert submit.call_count == 1
+    # The second delivery is answered from memory, the third by the database
+    assert record.call_count == 2
+
+
+def test_failed_event_retried():
+    """A failing handler is retried by the worker and the event is then marked processed"""
+    webhooks._seen_events.invalidate()
+    payment = {"id": "pay-1", "listing_id": "listing-1"}
+    with patch.object(db, "record_stripe_event", return_value=True), \
+         patch.object(db, "get_payment_by_session", return_value=payment), \
+         patch.object(db, "update_payment_status"), \
+         patch.object(db, "publish_listing", side_effect=[RuntimeError("timeout"), {"id": "listing-1"}]) as publish, \
+         patch.object(db, "mark_stripe_event_processed") as mark, \
+         patch.object(webhooks.worker, "backoff_base", 0.01):
+        assert webhooks.enqueue(make_event("evt_retry"))
+        assert webhooks.worker.drain(timeout=5)
+        # Let the retry become due, then wait for it
+        time.sleep(0.05)
+        assert webhooks.worker.drain(timeout=5)
+
+    assert publish.call_count == 2
+    mark.assert_any_call("evt_retry", error="timeout")
+    mark.assert_called_with("evt_retry")
+
+
+def test_redelivery_after_give_up_requeued():
+    """An event that exhausted its attempts is queued again when Stripe redelivers it"""
+    webhooks._seen_events.invalidate()
+    with patch.object(db, "record_stripe_event", side_effect=[True, False]), \
+         patch.object(db, "stripe_event_needs_retry", return_value=True) as needs_retry, \
+         patch.object(webhooks.worker, "submit") as submit:
+        assert webhooks.enqueue(make_event("evt_failed"))
+        webhooks._give_up(make_event("evt_failed"), RuntimeError("timeout"))
+        assert webhooks.enqueue(make_event("evt_failed"))
+
+    needs_retry.assert_called_once_with("evt_failed")
+    assert submit.call_count == 2
+
+
+def test_recover_pending_requeues_events():
+    """Events recorded but never processed are queued again at startup"""
+    webhooks._seen_events.invalidate()
+    pending = [{"id": "evt_old", "type": "checkout.session.completed", "payload": make_event("evt_old")}]
+    with patch.object(db, "get_pending_stripe_events", return_value=pending), \
+         patch.object(webhooks, "scheduler", Scheduler()), \
+         patch.object(webhooks.worker, "submit") as submit:
+        assert webhooks.recover_pending() == 1
+
+    assert submit.call_args[0][0]["id"] == "evt_old"
+
+
+def test_recover_pending_runs_in_one_process():
+    """Of several worker processes starting together, only the scheduler lock holder re-queues events"""
+    webhooks._seen_events.invalidate()
+    pending = [{"id": "evt_old", "type": "checkout.session.completed", "payload": make_event("evt_old")}]
+    lock_path = os.path.join(tempfile.mkdtemp(), "scheduler.lock")
+    workers = [Scheduler(lock_path) for _ in range(3)]
+    with patch.object(db, "get_pending_stripe_events", return_value=pending) as get_pending, \
+         patch.object(webhooks.worker, "submit") as submit:
+        for worker_scheduler in workers:
+            with patch.object(webhooks, "scheduler", worker_scheduler):
+                webhooks.recover_pending()
+    for worker_scheduler in workers:
+        worker_scheduler.stop()
+
+    get_pending.assert_called_once()
+    submit.assert_called_once()
+
+
+def test_record_event_ignores_duplicates():
+    """Recording an event is a single insert that ignores existing IDs"""
+    mock_supabase = MagicMock()
+    upsert = mock_supabase.table.return_value.upsert
+    upsert.return_value.execute.return_value = MagicMock(data=[])
+    with patch.object(db, "supabase", mock_supabase):
+        assert db.record_stripe_event("evt_1", "checkout.session.completed", {}) is False
+
+    mock_supabase.table.assert_called_once_with("stripe_events")
+    assert upsert.call_args.kwargs == {"on_conflict": "id", "ignore_duplicates": True}
+
+
+if __name__ == "__main__":
+    print("Running Stripe webhook tests...")
+    test_acknowledges_before_processing()
+    print("✓ Webhook acknowledged before processing")
+    test_duplicate_event_processed_once()
+    print("✓ Duplicate events processed once")
+    test_failed_event_retried()
+    print("✓ Failed events retried in the background")
+    test_redelivery_after_give_up_requeued()
+    print("✓ Redelivered events re-queued after giving up")
+    test_recover_pending_requeues_events()
+    print("✓ Unprocessed events re-queued at startup")
+    test_recover_pending_runs_in_one_process()
+    print("✓ Unprocessed events re-queued by one process")
+    test_record_event_ignores_duplicates()
+    print("✓ Event recording ignores duplicates")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,88 @@
+"""
+Test the compiled template environment (whitespace trimming, bytecode cache, warm-up)
+"""
+import os
+import tempfile
+
+from app import templating
+
+
+def _write(directory, name, source):
+    with open(os.path.join(directory, name), "w") as f:
+        f.write(source)
+
+
+def test_minify_keeps_preformatted_text():
+    """Indentation is stripped except inside <pre> and <textarea>"""
+    source = "<ul>\n    <li>a</li>\n\n    <li>b</li>   \n</ul>\n<pre>\n  code\n</pre>\n  <textarea>\n  x</textarea>"
+    assert templating.minify_source(source) == (
+        "<ul>\n<li>a</li>\n<li>b</li>\n</ul>\n<pre>\n  code\n</pre>\n<textarea>\n  x</textarea>"
+    )
+
+
+def test_block_tags_leave_no_blank_lines():
+    """trim_blocks/lstrip_blocks and the minifier apply at compile time"""
+    directory = tempfile.mkdtemp()
+    _write(directory, "list.html", "<ul>\n  {% for i in items %}\n    <li>{{ i }}</li>\n  {% endfor %}\n</ul>\n")
+    templates = templating.create_templates(directory)
+
+    html = templates.env.get_template("list.html").render(items=[1, 2])
+    assert html == "<ul>\n<li>1</li>\n<li>2</li>\n</ul>"
+    # Rendered values are never altered
+    assert templates.env.from_string("{{ v }}").render(v="a\n    b") == "a\n    b"
+
+
+def test_inline_block_keeps_line_break():
+    """A block tag ending a line of markup keeps the line break separating it from the next line"""
+    directory = tempfile.mkdtemp()
+    _write(directory, "input.html", '<input\n    {% if on %}checked{% endif %}\n    onchange="f()" />\n')
+    for minify in (True, False):
+        env = templating.create_templates(directory, minify=minify).env
+        html = env.get_template("input.html").render(on=True)
+        assert "checked\n" in html and "checkedonchange" not in html
+    # Tags alone on their line are still trimmed
+    assert templating.keep_inline_line_breaks("{% if a %}\nx{% endif %}") == "{% if a %}\nx{% endif %}"
+    assert templating.keep_inline_line_breaks("x{% endif %}\ny") == "x{% endif +%}\ny"
+
+
+def test_bytecode_cache_shared_across_processes():
+    """A second environment (another worker) loads the compiled template from disk"""
+    directory, cache_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    _write(directory, "page.html", "<p>{{ name }}</p>")
+
+    first = templating.create_templates(directory, cache_dir=cache_dir, auto_reload=False)
+    assert templating.warm_up(first.env) == 1
+    assert len(os.listdir(cache_dir)) == 1
+
+    second = templating.create_templates(directory, cache_dir=cache_dir, auto_reload=False)
+    loaded = []
+    original = second.env.bytecode_cache.load_bytecode
+    second.env.bytecode_cache.load_bytecode = lambda bucket: (original(bucket), loaded.append(bucket.code))[0]
+    assert second.env.get_template("page.html").render(name="x") == "<p>x</p>"
+    assert loaded[0] is not None
+
+    # Other compile options never reuse this bytecode
+    templating.create_templates(directory, cache_dir=cache_dir, minify=False).env.get_template("page.html")
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_warm_up_compiles_app_templates():
+    """Every page template compiles at startup"""
+    templates = templating.create_templates("app/templates")
+    expected = [name for name in os.listdir("app/templates") if name.endswith(".html")]
+    assert templating.warm_up(templates.env) == len(expected)
+
+
+if __name__ == "__main__":
+    print("Running templating tests...")
+    test_minify_keeps_preformatted_text()
+    print("✓ Minifier keeps preformatted text")
+    test_block_tags_leave_no_blank_lines()
+    print("✓ Block tags leave no blank lines")
+    test_inline_block_keeps_line_break()
+    print("✓ Inline block tags keep their line break")
+    test_bytecode_cache_shared_across_processes()
+    print("✓ Bytecode cache shared across processes")
+    test_warm_up_compiles_app_templates()
+    print("✓ Warm-up compiles the app templates")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,144 @@
+"""
+Test size-bounded, sniffed photo uploads in wizard step 3
+"""
+import io
+import tempfile
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from starlette.datastructures import UploadFile
+from app.main import app
+from app import config, db, drafts, uploads
+
+client = TestClient(app)
+client.cookies.set(drafts.COOKIE_NAME, drafts.encode({"id": "abc", "user_id": "user-1", "photos": []}))
+
+JPEG = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + b"\x00" * 100
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+WEBP = b"RIFF\x00\x00\x00\x00WEBPVP8 " + b"\x00" * 100
+
+
+def test_sniff_image_type():
+    """Formats are identified from magic bytes only"""
+    assert uploads.sniff_image_type(JPEG[:12]) == "image/jpeg"
+    assert uploads.sniff_image_type(PNG[:12]) == "image/png"
+    assert uploads.sniff_image_type(b"GIF89a......") == "image/gif"
+    assert uploads.sniff_image_type(WEBP[:12]) == "image/webp"
+    assert uploads.sniff_image_type(b"<?php echo 1;") is None
+    assert uploads.sniff_image_type(b"") is None
+
+
+def test_spoofed_content_type_rejected():
+    """A non-image sent with an image content type is refused"""
+    with patch.object(db, "supabase", None):
+        response = client.post(
+            "/deposer/step3",
+            data={"listing_id": "abc"},
+            files={"photos": ("photo.jpg", b"<html>not an image</html>", "image/jpeg")},
+            follow_redirects=False,
+        )
+    assert response.status_code == 400
+    assert "image" in response.json()["detail"]
+
+
+def test_real_type_used_despite_client_content_type():
+    """A real PNG sent as application/octet-stream is accepted"""
+    with patch.object(db, "supabase", None):
+        response = client.post(
+            "/deposer/step3",
+            data={"listing_id": "abc"},
+            files={"photos": ("photo.png", PNG, "application/octet-stream")},
+            follow_redirects=False,
+        )
+    assert response.status_code == 303
+    assert response.headers["location"].startswith("/deposer/step4")
+
+
+def test_oversize_photo_rejected():
+    """A photo above the per-file limit gets a 413"""
+    with patch.object(db, "supabase", None), \
+         patch.object(config, "MAX_PHOTO_SIZE_BYTES", 50):
+        response = client.post(
+            "/deposer/step3",
+            data={"listing_id": "abc"},
+            files={"photos": ("photo.jpg", JPEG, "image/jpeg")},
+            follow_redirects=False,
+        )
+    assert response.status_code == 413
+
+
+def test_oversize_request_rejected_before_parsing():
+    """The middleware refuses bodies above the request limit without calling the route"""
+    body = b"x" * (config.MAX_UPLOAD_REQUEST_BYTES + 1)
+    with patch.object(uploads, "inspect_photo") as inspect:
+        response = client.post(
+            "/deposer/step3",
+            content=body,
+            headers={"Content-Type": "multipart/form-data; boundary=xyz"},
+        )
+    assert response.status_code == 413
+    inspect.assert_not_called()
+
+
+def test_streamed_request_limit():
+    """A chunked body without Content-Length is cut off once it crosses the limit"""
+    limit = config.MAX_UPLOAD_REQUEST_BYTES
+
+    def chunks():
+        for _ in range(limit // (1024 * 1024) + 2):
+            yield b"x" * (1024 * 1024)
+
+    response = client.post(
+        "/deposer/step3",
+        content=chunks(),
+        headers={"Content-Type": "multipart/form-data; boundary=xyz"},
+    )
+    assert response.status_code == 413
+
+
+def test_large_photo_streamed_from_disk():
+    """Above the spool threshold the storage client gets a file handle, not bytes"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=10)
+    spooled.write(JPEG)
+    photo = UploadFile(file=spooled, filename="photo.jpg", size=len(JPEG))
+    mock_supabase = MagicMock()
+    bucket = mock_supabase.storage.from_.return_value
+    bucket.get_public_url.return_value = "https://cdn/photo.jpg"
+    sent = {}
+
+    def capture(path, content, file_options):
+        sent["content"] = content if isinstance(content, bytes) else content.read()
+        sent["type"] = type(content)
+
+    bucket.upload.side_effect = capture
+
+    with patch.object(uploads.storage, "upload_derivatives", return_value={"variants": [], "placeholder": None}):
+        stored = uploads.store_photo(mock_supabase, "bucket", "abc/photo.jpg", photo, "image/jpeg", 10)
+
+    assert stored["url"] == "https://cdn/photo.jpg"
+    assert sent["type"] is io.FileIO
+    assert sent["content"] == JPEG
+
+    small = UploadFile(file=io.BytesIO(JPEG), filename="photo.jpg", size=len(JPEG))
+    with patch.object(uploads.storage, "upload_derivatives", return_value={"variants": [], "placeholder": None}):
+        uploads.store_photo(mock_supabase, "bucket", "abc/photo.jpg", small, "image/jpeg", 1024)
+    assert sent["type"] is bytes
+    assert sent["content"] == JPEG
+
+
+if __name__ == "__main__":
+    print("Running upload tests...")
+    test_sniff_image_type()
+    print("✓ Magic bytes sniffing")
+    test_spoofed_content_type_rejected()
+    print("✓ Spoofed content type rejected")
+    test_real_type_used_despite_client_content_type()
+    print("✓ Real type used")
+    test_oversize_photo_rejected()
+    print("✓ Oversize photo rejected with 413")
+    test_oversize_request_rejected_before_parsing()
+    print("✓ Oversize request rejected before parsing")
+    test_streamed_request_limit()
+    print("✓ Chunked request cut off at the limit")
+    test_large_photo_streamed_from_disk()
+    print("✓ Large photo streamed from disk")
+    print("\n✅ All tests passed!")
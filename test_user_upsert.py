@@ -0,0 +1,75 @@
+"""
+Test single-request user resolution with the email -> user cache
+"""
+from unittest.mock import MagicMock, patch
+from app import db
+
+USER = {"id": "user-1", "email": "vendeur@example.fr", "phone": None, "name": None}
+
+
+def mock_users_table(*rows):
+    mock_supabase = MagicMock()
+    upsert = mock_supabase.table.return_value.upsert
+    upsert.return_value.execute.side_effect = [MagicMock(data=[row]) for row in rows]
+    return mock_supabase, upsert
+
+
+def test_upsert_single_request():
+    """A new email is resolved with one upsert on the email column, never a select + insert"""
+    db._users_cache.invalidate()
+    mock_supabase, upsert = mock_users_table(USER)
+    with patch.object(db, "supabase", mock_supabase):
+        user = db.get_or_create_user("vendeur@example.fr")
+
+    assert user["id"] == "user-1"
+    upsert.assert_called_once_with({"email": "vendeur@example.fr"}, on_conflict="email")
+    mock_supabase.table.return_value.select.assert_not_called()
+    mock_supabase.table.return_value.insert.assert_not_called()
+
+
+def test_repeated_calls_hit_cache():
+    """The same email is served from the cache afterwards"""
+    db._users_cache.invalidate()
+    mock_supabase, upsert = mock_users_table(USER)
+    with patch.object(db, "supabase", mock_supabase):
+        for _ in range(5):
+            assert db.get_or_create_user("vendeur@example.fr")["id"] == "user-1"
+
+    assert upsert.call_count == 1
+    assert db.get_user_cache_stats()["hits"] >= 4
+
+
+def test_new_phone_updates_user():
+    """A phone not yet stored goes to the database, then is cached too"""
+    db._users_cache.invalidate()
+    updated = {**USER, "phone": "+33600000000"}
+    mock_supabase, upsert = mock_users_table(USER, updated)
+    with patch.object(db, "supabase", mock_supabase):
+        db.get_or_create_user("vendeur@example.fr")
+        user = db.get_or_create_user("vendeur@example.fr", "+33600000000")
+        again = db.get_or_create_user("vendeur@example.fr", "+33600000000")
+
+    assert user["phone"] == again["phone"] == "+33600000000"
+    assert upsert.call_count == 2
+    upsert.assert_called_with({"email": "vendeur@example.fr", "phone": "+33600000000"}, on_conflict="email")
+
+
+def test_cached_user_not_mutated():
+    db._users_cache.invalidate()
+    mock_supabase, _ = mock_users_table(USER)
+    with patch.object(db, "supabase", mock_supabase):
+        db.get_or_create_user("vendeur@example.fr")["id"] = "tampered"
+        assert db.get_or_create_user("vendeur@example.fr")["id"] == "user-1"
+
+
+if __name__ == "__main__":
+    print("Running user upsert tests...")
+    test_upsert_single_request()
+    print("✓ One upsert per new email")
+    test_repeated_calls_hit_cache()
+    print("✓ Repeated calls hit the cache")
+    test_new_phone_updates_user()
+    print("✓ New phone updates the user")
+    test_cached_user_not_mutated()
+    print("✓ Cached user not mutated")
+    print("\n✅ All tests passed!")
@@ -0,0 +1,219 @@
+"""
+Test the signed cookie wizard draft and the single database write at step 5
+"""
+import re
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app import clients, config, db, drafts
+from app.sqlite_backend import SQLiteClient
+
+STEP1 = {"listing_type": "part", "category": "Pompage", "title": "Pompe à lobes"}
+STEP2 = {"condition": "Neuf", "year": "2020", "manufacturer": "Vogelsang",
+         "summary": "Pompe révisée", "description": "Pompe à lobes révisée en 2024."}
+STEP4 = {"price_type": "fixed", "price_amount": "1500", "location": "Bretagne, FR"}
+STEP5 = {"contact_email": "vendeur@example.fr", "contact_phone": "+33600000000", "consent_public_contact": "on"}
+
+
+def test_encode_decode_roundtrip():
+    draft = {"id": "abc", "title": "Épurateur", "photos": []}
+    assert drafts.decode(drafts.encode(draft)) == draft
+
+
+def test_tampered_or_expired_draft_rejected():
+    value = drafts.encode({"id": "abc", "user_id": "u1"})
+    payload, signature = value.rsplit(".", 1)
+    forged = drafts.encode({"id": "abc", "user_id": "admin"}).rsplit(".", 1)[0]
+    assert drafts.decode(f"{forged}.{signature}") is None
+    assert drafts.decode("garbage") is None
+    assert drafts.decode(None) is None
+
+    with patch.object(drafts.time, "time", return_value=time.time() + config.DRAFT_MAX_AGE + 1):
+        assert drafts.decode(value) is None
+
+
+def test_large_draft_split_and_bounded():
+    """Drafts above one cookie are chunked; above the bound they are refused"""
+    client = TestClient(app)
+    with patch.object(db, "get_or_create_user", return_value={"id": "user-1"}):
+        client.post("/deposer/step1", data=STEP1, follow_redirects=False)
+    listing_id = drafts.decode(client.cookies[drafts.COOKIE_NAME])["id"]
+
+    # Random-ish text barely compresses, so it needs several cookies
+    description = " ".join(f"{i * 7919 % 100003:x}" for i in range(1500))
+    response = client.post("/deposer/step2", data={**STEP2, "listing_id": listing_id, "description": description},
+                           follow_redirects=False)
+    assert response.status_code == 303
+    assert f"{drafts.COOKIE_NAME}_1" in response.cookies
+    assert all(len(value) <= drafts.CHUNK_SIZE for value in response.cookies.values())
+    assert client.get(f"/deposer/step5?listing_id={listing_id}").status_code == 200
+
+    too_long = " ".join(f"{i * 7919 % 1000003:x}" for i in range(6000))
+    response = client.post("/deposer/step2", data={**STEP2, "listing_id": listing_id, "description": too_long},
+                           follow_redirects=False)
+    assert response.status_code == 400
+
+
+def test_wizard_writes_once_at_step5():
+    """Steps 1-4 don't touch the listings table; step 5 inserts the listing once"""
+    client = TestClient(app)
+    mock_supabase = MagicMock()
+    with patch.object(db, "supabase", mock_supabase), \
+         patch.object(db, "get_or_create_user", return_value={"id": "user-1"}), \
+         patch.object(db, "save_listing", return_value={"id": "x"}) as create, \
+         patch.object(db, "update_listing") as update, \
+         patch.object(db, "get_listing") as get_listing, \
+         patch.object(db, "has_completed_payment", return_value=False), \
+         patch.object(db, "delete_listing_media") as delete_media, \
+         patch.object(db, "add_media_bulk") as bulk, \
+         patch.object(db, "publish_listing") as publish, \
+         patch.object(config, "STRIPE_SECRET_KEY", ""):
+        response = client.post("/deposer/step1", data=STEP1, follow_redirects=False)
+        assert response.status_code == 303
+        listing_id = response.headers["location"].split("listing_id=")[1]
+
+        assert client.get(f"/deposer/step2?listing_id={listing_id}").status_code == 200
+        client.post("/deposer/step2", data={**STEP2, "listing_id": listing_id}, follow_redirects=False)
+        page = client.get(f"/deposer/step4?listing_id={listing_id}")
+        assert page.status_code == 200
+        client.post("/deposer/step4", data={**STEP4, "listing_id": listing_id}, follow_redirects=False)
+
+        recap = client.get(f"/deposer/step5?listing_id={listing_id}")
+        assert "Pompe à lobes" in recap.text
+        assert "1 500 €" in recap.text
+        mock_supabase.table.assert_not_called()
+        create.assert_not_called()
+
+        response = client.post("/deposer/step5", data={**STEP5, "listing_id": listing_id}, follow_redirects=False)
+
+    assert response.status_code == 303
+    create.assert_called_once()
+    user_id, data = create.call_args.args
+    assert user_id == "user-1"
+    assert data["id"] == listing_id
+    assert data["title"] == "Pompe à lobes"
+    assert data["manufacturer"] == "Vogelsang"
+    assert data["price_amount"] == 150000
+    assert data["contact_email"] == "vendeur@example.fr"
+    update.assert_not_called()
+    get_listing.assert_not_called()
+    delete_media.assert_called_once_with(listing_id)
+    bulk.assert_called_once_with([])
+    publish.assert_called_once_with(listing_id)
+    # The published draft is forgotten
+    assert drafts.COOKIE_NAME not in client.cookies
+
+
+def test_step4_price_type_attributes_rendered_apart():
+    """The saved price type re-checks its radio without gluing `checked` to the next attribute"""
+    client = TestClient(app)
+    with patch.object(db, "supabase", None):
+        response = client.post("/deposer/step1", data=STEP1, follow_redirects=False)
+        listing_id = response.headers["location"].split("listing_id=")[1]
+        client.post("/deposer/step2", data={**STEP2, "listing_id": listing_id}, follow_redirects=False)
+        for price_type in ("quote", "fixed"):
+            client.post("/deposer/step4", data={**STEP4, "price_type": price_type, "listing_id": listing_id},
+                        follow_redirects=False)
+            page = client.get(f"/deposer/step4?listing_id={listing_id}").text
+
+            assert "checkedonchange" not in page
+            checked = re.search(r'value="(\w+)"\s+checked\s+onchange="togglePriceInput\(\)"', page)
+            assert checked and checked.group(1) == price_type
+
+
+def _fill_steps_1_to_4(client):
+    """Run the wizard up to step 5 and return the draft's listing ID"""
+    # Users cached by earlier tests live in another database
+    db._users_cache.invalidate()
+    response = client.post("/deposer/step1", data=STEP1, follow_redirects=False)
+    listing_id = response.headers["location"].split("listing_id=")[1]
+    client.post("/deposer/step2", data={**STEP2, "listing_id": listing_id}, follow_redirects=False)
+    client.post("/deposer/step4", data={**STEP4, "listing_id": listing_id}, follow_redirects=False)
+    return listing_id
+
+
+def test_step5_retry_after_payment_error():
+    """After a failed Stripe call, submitting step 5 again reuses the listing row"""
+    client = TestClient(app)
+    local = SQLiteClient(":memory:", tempfile.mkdtemp())
+    checkout = MagicMock(side_effect=[
+        RuntimeError("Stripe unavailable"),
+        SimpleNamespace(id="cs_test_1", url="https://checkout.stripe.com/c/cs_test_1"),
+    ])
+    with patch.object(db, "supabase", local), \
+         patch.object(config, "STRIPE_SECRET_KEY", "sk_test"), \
+         patch.object(clients, "create_checkout_session", checkout):
+        listing_id = _fill_steps_1_to_4(client)
+
+        failed = client.post("/deposer/step5", data={**STEP5, "listing_id": listing_id}, follow_redirects=False)
+        retried = client.post("/deposer/step5", data={**STEP5, "listing_id": listing_id}, follow_redirects=False)
+        listings = local.table("listings").select("id, status").execute().data
+        payments = local.table("payments").select("listing_id").execute().data
+    local.close()
+
+    assert failed.status_code == 500
+    assert retried.status_code == 303
+    assert retried.headers["location"] == "https://checkout.stripe.com/c/cs_test_1"
+    assert listings == [{"id": listing_id, "status": "draft"}]
+    assert payments == [{"listing_id": listing_id}]
+
+
+def test_step5_after_payment_keeps_the_listing():
+    """Once the listing is paid for, resubmitting step 5 neither overwrites it nor opens a new checkout"""
+    client = TestClient(app)
+    local = SQLiteClient(":memory:", tempfile.mkdtemp())
+    checkout = MagicMock(return_value=SimpleNamespace(id="cs_test_1", url="https://checkout.stripe.com/c/cs_test_1"))
+    with patch.object(db, "supabase", local), \
+         patch.object(config, "STRIPE_SECRET_KEY", "sk_test"), \
+         patch.object(clients, "create_checkout_session", checkout):
+        listing_id = _fill_steps_1_to_4(client)
+        assert client.post("/deposer/step5", data={**STEP5, "listing_id": listing_id}, follow_redirects=False).status_code == 303
+        # Paid; the webhook publishes the listing, the seller never comes back to /payment/success
+        db.update_payment_status("cs_test_1", "completed")
+        db.publish_listing(listing_id)
+
+        response = client.post("/deposer/step5", data={**STEP5, "listing_id": listing_id}, follow_redirects=False)
+        listing = local.table("listings").select("status").eq("id", listing_id).execute().data[0]
+    local.close()
+
+    assert response.status_code == 303
+    assert response.headers["location"] == f"/annonces/{listing_id}"
+    assert drafts.COOKIE_NAME not in client.cookies
+    checkout.assert_called_once()
+    assert listing["status"] == "published"
+
+
+def test_steps_without_draft_redirect_to_step1():
+    client = TestClient(app)
+    response = client.get("/deposer/step3?listing_id=abc", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "/deposer/step1"
+
+    # A draft for another listing (e.g. an old tab) is ignored
+    client.cookies.set(drafts.COOKIE_NAME, drafts.encode({"id": "other", "user_id": "u1", "photos": []}))
+    response = client.get("/deposer/step4?listing_id=abc", follow_redirects=False)
+    assert response.status_code == 302
+
+
+if __name__ == "__main__":
+    print("Running wizard draft tests...")
+    test_encode_decode_roundtrip()
+    print("✓ Encode/decode roundtrip")
+    test_tampered_or_expired_draft_rejected()
+    print("✓ Tampered or expired drafts rejected")
+    test_large_draft_split_and_bounded()
+    print("✓ Large drafts split and bounded")
+    test_wizard_writes_once_at_step5()
+    print("✓ One database write at step 5")
+    test_step4_price_type_attributes_rendered_apart()
+    print("✓ Step 4 price type attributes rendered apart")
+    test_step5_retry_after_payment_error()
+    print("✓ Step 5 retried after a payment error")
+    test_step5_after_payment_keeps_the_listing()
+    print("✓ Step 5 after payment keeps the listing")
+    test_steps_without_draft_redirect_to_step1()
+    print("✓ Missing draft redirects to step 1")
+    print("\n✅ All tests passed!")